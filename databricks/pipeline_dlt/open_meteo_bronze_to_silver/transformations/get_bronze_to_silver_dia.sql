@@ -2,6 +2,8 @@
 -- SILVER: clima_diario
 -- Depende do bronze: open_meteo.bronze.clima_diario
 -- Aplica conversão de tipos, normalização
+-- O bronze já vem tipado; as medidas FLOAT viram DOUBLE arredondado a 4
+-- casas, que devolve o valor decimal da API (25.3 e não 25.299999237)
 -- ===========================================================
 
 CREATE OR REFRESH STREAMING LIVE TABLE open_meteo.silver.clima_diario
@@ -12,7 +14,7 @@ AS
 WITH bronze AS (
 
   SELECT
-      CAST(data AS DATE) AS data,
+      data,
       CAST(codigo_ibge AS BIGINT) AS codigo_ibge,
       UPPER(municipio) AS municipio,
 
@@ -46,20 +48,20 @@ WITH bronze AS (
         WHEN 'Tocantins' THEN 'TO'
       END AS uf,
 
-      CAST(latitude AS DOUBLE) AS latitude,
-      CAST(longitude AS DOUBLE) AS longitude,
+      latitude,
+      longitude,
 
-      CAST(temp_max_c AS DOUBLE) AS temp_max_c,
-      CAST(temp_min_c AS DOUBLE) AS temp_min_c,
-      CAST(sensacao_termica_max_c AS DOUBLE) AS sensacao_termica_max_c,
-      CAST(sensacao_termica_min_c AS DOUBLE) AS sensacao_termica_min_c,
-      CAST(precipitacao_total_mm AS DOUBLE) AS precipitacao_total_mm,
-      CAST(chuva_mm AS DOUBLE) AS chuva_mm,
-      CAST(neve_mm AS DOUBLE) AS neve_mm,
-      CAST(vento_velocidade_max_kmh AS DOUBLE) AS vento_velocidade_max_kmh,
-      CAST(rajadas_vento_max_kmh AS DOUBLE) AS rajadas_vento_max_kmh,
+      ROUND(CAST(temp_max_c AS DOUBLE), 4) AS temp_max_c,
+      ROUND(CAST(temp_min_c AS DOUBLE), 4) AS temp_min_c,
+      ROUND(CAST(sensacao_termica_max_c AS DOUBLE), 4) AS sensacao_termica_max_c,
+      ROUND(CAST(sensacao_termica_min_c AS DOUBLE), 4) AS sensacao_termica_min_c,
+      ROUND(CAST(precipitacao_total_mm AS DOUBLE), 4) AS precipitacao_total_mm,
+      ROUND(CAST(chuva_mm AS DOUBLE), 4) AS chuva_mm,
+      ROUND(CAST(neve_mm AS DOUBLE), 4) AS neve_mm,
+      ROUND(CAST(vento_velocidade_max_kmh AS DOUBLE), 4) AS vento_velocidade_max_kmh,
+      ROUND(CAST(rajadas_vento_max_kmh AS DOUBLE), 4) AS rajadas_vento_max_kmh,
       CAST(vento_direcao_dominante_graus AS DOUBLE) AS vento_direcao_dominante_graus,
-      CAST(radiacao_solar_mj_m2 AS DOUBLE) AS radiacao_solar_mj_m2,
+      ROUND(CAST(radiacao_solar_mj_m2 AS DOUBLE), 4) AS radiacao_solar_mj_m2,
 
       CAST(codigo_tempo_wmo AS INT) AS codigo_tempo_wmo,
       ingested_at
@@ -2,6 +2,8 @@
 -- SILVER: clima_horario
 -- Depende de open_meteo.bronze.clima_horario
 -- Conversão de tipos, de-para UF, normalização
+-- O bronze já vem tipado; as medidas FLOAT viram DOUBLE arredondado a 4
+-- casas, que devolve o valor decimal da API (25.3 e não 25.299999237)
 -- ===========================================================
 
 CREATE OR REFRESH STREAMING LIVE TABLE open_meteo.silver.clima_horario
@@ -45,13 +47,13 @@ WITH bronze AS (
         WHEN 'Tocantins' THEN 'TO'
       END AS uf,
 
-      CAST(latitude AS DOUBLE) AS latitude,
-      CAST(longitude AS DOUBLE) AS longitude,
+      latitude,
+      longitude,
 
-      CAST(temperatura_c AS DOUBLE) AS temperatura_c,
+      ROUND(CAST(temperatura_c AS DOUBLE), 4) AS temperatura_c,
       CAST(umidade_relativa AS DOUBLE) AS umidade_relativa,
-      CAST(precipitacao_mm AS DOUBLE) AS precipitacao_mm,
-      CAST(velocidade_vento_ms AS DOUBLE) AS velocidade_vento_ms,
+      ROUND(CAST(precipitacao_mm AS DOUBLE), 4) AS precipitacao_mm,
+      ROUND(CAST(velocidade_vento_ms AS DOUBLE), 4) AS velocidade_vento_ms,
 
       ingested_at
   FROM STREAM(open_meteo.bronze.clima_horario)
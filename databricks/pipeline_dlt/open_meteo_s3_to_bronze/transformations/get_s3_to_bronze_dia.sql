@@ -2,39 +2,42 @@ CREATE OR REFRESH STREAMING LIVE TABLE open_meteo.bronze.clima_diario
 COMMENT "Bronze — clima diario a partir de raw s3"
 TBLPROPERTIES ("quality" = "bronze")
 AS
+-- Os parquets já chegam tipados (src/processa_dados.py:SCHEMA_DIARIO): sem CAST.
+-- Os schemaHints fixam esses tipos no schema guardado pelo Auto Loader.
 SELECT
-    CAST(data AS STRING) AS data,
-    CAST(codigo_ibge AS STRING) AS codigo_ibge,
-    CAST(nome AS STRING) AS municipio,
-    CAST(nome_uf AS STRING) AS uf,
-    CAST(latitude AS STRING) AS latitude,
-    CAST(longitude AS STRING) AS longitude,
+    data,
+    codigo_ibge,
+    nome AS municipio,
+    nome_uf AS uf,
+    latitude,
+    longitude,
 
-    CAST(temp_max_c AS STRING) AS temp_max_c,
-    CAST(temp_min_c AS STRING) AS temp_min_c,
+    temp_max_c,
+    temp_min_c,
 
-    CAST(sensacao_termica_max_c AS STRING) AS sensacao_termica_max_c,
-    CAST(sensacao_termica_min_c AS STRING) AS sensacao_termica_min_c,
+    sensacao_termica_max_c,
+    sensacao_termica_min_c,
 
-    CAST(precipitacao_total_mm AS STRING) AS precipitacao_total_mm,
-    CAST(chuva_mm AS STRING) AS chuva_mm,
-    CAST(neve_mm AS STRING) AS neve_mm,
+    precipitacao_total_mm,
+    chuva_mm,
+    neve_mm,
 
-    CAST(vento_velocidade_max_kmh AS STRING) AS vento_velocidade_max_kmh,
-    CAST(rajadas_vento_max_kmh AS STRING) AS rajadas_vento_max_kmh,
-    CAST(vento_direcao_dominante_graus AS STRING) AS vento_direcao_dominante_graus,
+    vento_velocidade_max_kmh,
+    rajadas_vento_max_kmh,
+    vento_direcao_dominante_graus,
 
-    CAST(radiacao_solar_mj_m2 AS STRING) AS radiacao_solar_mj_m2,
+    radiacao_solar_mj_m2,
 
-    CAST(codigo_tempo_wmo AS STRING) AS codigo_tempo_wmo,
+    codigo_tempo_wmo,
     current_timestamp()               AS ingested_at
 FROM cloud_files(
   "${input_path_diario}",
   "parquet",
   map(
-    "header", "true",
     "cloudFiles.inferColumnTypes", "true",
     "cloudFiles.schemaEvolutionMode", "addNewColumns",
+    "cloudFiles.schemaHints",
+      "data DATE, codigo_ibge INT, latitude DOUBLE, longitude DOUBLE, vento_direcao_dominante_graus SMALLINT, codigo_tempo_wmo SMALLINT",
     "pathGlobFilter", "*.parquet"
   )
-);    
\ No newline at end of file
+);
@@ -2,26 +2,31 @@ CREATE OR REFRESH STREAMING LIVE TABLE open_meteo.bronze.clima_horario
 COMMENT "Bronze — clima horario a partir de raw s3"
 TBLPROPERTIES ("quality" = "bronze")
 AS
+-- Os parquets já chegam tipados (src/processa_dados.py:SCHEMA_HORARIO): sem CAST.
+-- data_hora é a hora local sem fuso (TIMESTAMP_NTZ); fonte = archive ou forecast.
 SELECT
-    CAST(data_hora AS STRING)           AS data_hora,
-    CAST(municipio AS STRING)           AS municipio,
-    CAST(uf AS STRING)                  AS uf,
+    data_hora,
+    codigo_ibge,
+    municipio,
+    uf,
 
-    CAST(latitude AS STRING)            AS latitude,
-    CAST(longitude AS STRING)           AS longitude,
+    latitude,
+    longitude,
 
-    CAST(temperatura_c AS STRING)       AS temperatura_c,
-    CAST(umidade_relativa AS STRING)    AS umidade_relativa,
-    CAST(precipitacao_mm AS STRING)     AS precipitacao_mm,
-    CAST(velocidade_vento_ms AS STRING) AS velocidade_vento_ms,
+    temperatura_c,
+    umidade_relativa,
+    precipitacao_mm,
+    velocidade_vento_ms,
+    fonte,
     current_timestamp()               AS ingested_at
 FROM cloud_files(
   "${input_path_horario}",
   "parquet",
   map(
-    "header", "true",
     "cloudFiles.inferColumnTypes", "true",
     "cloudFiles.schemaEvolutionMode", "addNewColumns",
+    "cloudFiles.schemaHints",
+      "data_hora TIMESTAMP_NTZ, codigo_ibge INT, latitude DOUBLE, longitude DOUBLE, umidade_relativa SMALLINT",
     "pathGlobFilter", "*.parquet"
   )
-);    
\ No newline at end of file
+);
@@ -5,15 +5,21 @@ from pathlib import Path
 from datetime import datetime, timedelta, date
 from dateutil.tz import gettz
 import argparse
-import pandas as pd
-from tqdm import tqdm
-import os
+import threading
 
 # --- Suas libs locais ---
-from src.recupera_dados_api_dia import get_clima_diario_por_data
-from src.recupera_dados_api_hora import get_clima_horario_por_data
-from src.processa_dados import processar_clima
-from src.upload_s3 import upload_para_s3
+from src.coleta import (
+    janelas, sufixo_shard, TAMANHO_LOTE, JANELA_MAX_DIAS, MUNICIPIOS_POR_GRUPO,
+)
+from src.pipeline import coletar_e_enviar, estimar_orcamento
+from src.incremental import coleta_incremental, TIPO as TIPO_INCREMENTAL
+from src.upload_s3 import upload_para_s3, upload_lote_s3
+from src.concorrencia import configurar_limite_por_host, LIMITE_POR_HOST
+from src.cache import configurar_cache
+from src.formato import configurar_formato, FORMATOS, JSON
+from src.grade import configurar_grade, RESOLUCAO_GRADE
+from src.escrita import configurar_escrita, COMPRESSAO, LINHAS_POR_GRUPO
+from src import cota, estado, metricas, municipios, perfil, shards
 
 
 TIMEZONE = "America/Sao_Paulo"
@@ -78,108 +84,81 @@ def _datas_pendentes(base_dir: Path):
     return dias
 
 
-# ============================================================
-# COLETA DIÁRIA
-# ============================================================
-def coleta_diaria(base_dir: Path, dia: date):
-    dt_str = dia.strftime("%Y-%m-%d")
-    path_lista = base_dir / "data" / "lista_municipios" / "lista_mun.csv"
-    path_ext_raw_diario = base_dir / "data" / "raw" / "diario"
-
-    df_cidades = pd.read_csv(path_lista, sep=";")
-    print(f"📅 (DIÁRIO) Coletando {dt_str} para {len(df_cidades)} municípios")
-
-    dados = []
-    falhas = 0
-
-    for _, row in tqdm(df_cidades.iterrows(), total=df_cidades.shape[0]):
-        try:
-            clima = get_clima_diario_por_data(row["latitude"], row["longitude"], dt_str)
-            df_clima = processar_clima(clima, row)
-            dados.append(df_clima)
-        except Exception as e:
-            falhas += 1
-            print(f"Falha em {row['nome']} ({row['nome_uf']}): {e}")
-
-    if not dados:
-        print("❌ Nenhum dado diário coletado.")
-        return None
-
-    df_final = pd.concat(dados, ignore_index=True)
-
-    os.makedirs(path_ext_raw_diario, exist_ok=True)
-    saida = path_ext_raw_diario / f"dados_climaticos_diarios_{dia.strftime('%Y%m%d')}.parquet"
-
-    df_final.to_parquet(saida, index=False, engine="pyarrow", compression="snappy")
-
-    print(f"✅ Diário salvo em: {saida}")
-    if falhas:
-        print(f"Atenção: {falhas} município(s) falharam (diário).")
-
-    return saida
-
-
-# ============================================================
-# COLETA HORÁRIA
-# ============================================================
-def coleta_horaria(base_dir: Path, dia: date):
-    dt_str = dia.strftime("%Y-%m-%d")
-    dt_file = dia.strftime("%Y%m%d")
-
-    path_lista = base_dir / "data" / "lista_municipios" / "lista_mun.csv"
-    path_ext_raw_horario = base_dir / "data" / "raw" / "horario"
-
-    df_cidades = pd.read_csv(path_lista, sep=";")
-    print(f"⏱️ (HORÁRIO) Coletando {dt_str} para {len(df_cidades)} municípios")
-
-    dados = []
-    falhas = 0
-
-    for _, row in tqdm(df_cidades.iterrows(), total=df_cidades.shape[0]):
-        try:
-            df_hora = get_clima_horario_por_data(row["latitude"], row["longitude"], dt_str, TIMEZONE)
-            df_hora["municipio"] = row["nome"]
-            df_hora["uf"] = row["nome_uf"]
-            df_hora["latitude"] = row["latitude"]
-            df_hora["longitude"] = row["longitude"]
-            dados.append(df_hora)
-        except Exception as e:
-            falhas += 1
-            print(f"Falha em {row['nome']}: {e}")
-
-    if not dados:
-        print("❌ Nenhum dado horário coletado.")
-        return None
-
-    df_final = pd.concat(dados, ignore_index=True)
-
-    # renomeia
-    rename_cols = {
-        "time": "data_hora",
-        "temperature_2m": "temperatura_c",
-        "relative_humidity_2m": "umidade_relativa",
-        "precipitation": "precipitacao_mm",
-        "wind_speed_10m": "velocidade_vento_ms",
-    }
-    df_final.rename(columns=rename_cols, inplace=True)
-
-    colunas = [
-        "data_hora", "municipio", "uf", "latitude", "longitude",
-        "temperatura_c", "umidade_relativa", "precipitacao_mm",
-        "velocidade_vento_ms"
-    ]
-    df_final = df_final[[c for c in colunas if c in df_final.columns]]
-
-    os.makedirs(path_ext_raw_horario, exist_ok=True)
-    saida = path_ext_raw_horario / f"dados_climaticos_horarios_{dt_file}.parquet"
-
-    df_final.to_parquet(saida, index=False, engine="pyarrow", compression="snappy")
-
-    print(f"✅ Horário salvo em: {saida}")
-    if falhas:
-        print(f"Atenção: {falhas} município(s) falharam (horário).")
-
-    return saida
+def _datas_de(texto: str) -> date:
+    return datetime.strptime(texto, "%Y-%m-%d").date()
+
+
+def _tipos(modo: str):
+    return [t for t in ("diario", "horario") if modo in (t, "ambos")]
+
+
+# ---------- RETOMADA (ledger por município) ----------
+def _plano_retomada(ledger, tipo: str, codigos, desde: date, ate: date, janela_dias: int):
+    """
+    Agrupa as lacunas do ledger em períodos (ini, fim, pendentes): datas
+    consecutivas com o mesmo conjunto de municípios pendentes viram uma única
+    coleta por período, limitada a janela_dias.
+    """
+    plano = []
+    for dia, pendentes in sorted(estado.lacunas(ledger, tipo, codigos, desde, ate).items()):
+        if plano:
+            ini, fim, anteriores = plano[-1]
+            if (dia == fim + timedelta(days=1) and pendentes == anteriores
+                    and (dia - ini).days < janela_dias):
+                plano[-1] = (ini, dia, anteriores)
+                continue
+        plano.append((dia, dia, pendentes))
+    return plano
+
+
+# ---------- SHARDS ----------
+def _consolidar_shards(base_dir: Path, tipos, n: int, datas, ledger, enviar):
+    """
+    Consolida as datas pendentes em ordem. Para na primeira data em que algum
+    shard ainda não reportou, para o STATE nunca pular uma data.
+    """
+    for dia in sorted(datas):
+        faltando = [t for t in tipos if shards.marcadores(base_dir, t, dia, n) is None]
+        if faltando:
+            print(f"⏳ {dia}: aguardando shards de {', '.join(faltando)} ({n} esperados)")
+            return
+
+        for tipo in tipos:
+            _, caminho = shards.consolidar(base_dir, tipo, dia, n, ledger)
+            if caminho is None:
+                print(f"❌ ({tipo}) {dia}: nenhum shard teve dados.")
+                continue
+            print(f"🧩 ({tipo}) {dia}: {n} shards consolidados em {caminho}")
+            enviar(caminho, tipo, dia)
+
+        if any(estado.tem_adiados(ledger, t, dia) for t in tipos):
+            # os shards recoletam a data na próxima execução
+            for tipo in tipos:
+                shards.limpar(base_dir, tipo, dia, n)
+            print(f"⏸️  {dia}: municípios adiados; STATE não avança")
+            return
+
+        last_run = _carregar_last_run(base_dir)
+        if last_run is None or dia > last_run:
+            _salvar_last_run(base_dir, dia)
+            print(f"📌 STATE atualizado para {dia}")
+        for tipo in tipos:
+            shards.limpar(base_dir, tipo, dia, n)
+
+
+# ---------- COTA DA API ----------
+def _configurar_cota(args, base_dir: Path):
+    """Liga a cota da CLI; cada shard fica com 1/N dela e seu próprio arquivo de estado."""
+    if args.sem_cota:
+        cota.configurar_cota(None)
+        return
+    n = args.shard[1] if args.shard else 1
+    limites = {"minuto": args.cota_minuto, "hora": args.cota_hora, "dia": args.cota_dia}
+    cota.configurar_cota(
+        {janela: limite / n for janela, limite in limites.items() if limite},
+        espera_maxima=args.espera_maxima_cota,
+        caminho=base_dir / "state" / f"cota{sufixo_shard(args.shard)}.json",
+    )
 
 
 # ============================================================
@@ -187,82 +166,291 @@ def coleta_horaria(base_dir: Path, dia: date):
 # ============================================================
 def parse_args():
     p = argparse.ArgumentParser(description="Coleta Open-Meteo – diário/horário/ambos (incremental)")
-    p.add_argument("--modo", choices=["diario", "horario", "ambos"], default="ambos")
-    return p.parse_args()
+    p.add_argument("--modo", choices=["diario", "horario", "ambos", "horario-incremental"], default="ambos",
+                   help="horario-incremental: só as horas novas desde a última execução, do forecast, "
+                        "em data/incremental/horario/date=YYYY-MM-DD/ (para rodar várias vezes ao dia)")
+    municipios.adicionar_argumentos(p)
+    p.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE,
+                   help="Quantidade de municípios por chamada à API (1 = sem lote)")
+    p.add_argument("--concorrencia", type=int, default=1,
+                   help="Lotes buscados em paralelo (1 = execução serial)")
+    p.add_argument("--limite-por-host", type=int, default=LIMITE_POR_HOST,
+                   help="Máximo de requisições simultâneas para um mesmo host da API")
+    p.add_argument("--janela-dias", type=int, default=JANELA_MAX_DIAS,
+                   help="Dias pendentes buscados por chamada à API (catch-up)")
+    p.add_argument("--workers-montagem", type=int, default=2,
+                   help="Threads do estágio de montagem (parse JSON → colunas)")
+    p.add_argument("--workers-gravacao", type=int, default=1,
+                   help="Threads do estágio de gravação dos parquets")
+    p.add_argument("--workers-upload", type=int, default=2,
+                   help="Threads do estágio de upload para o S3")
+    p.add_argument("--municipios-por-grupo", type=int, default=MUNICIPIOS_POR_GRUPO,
+                   help="Municípios acumulados em memória antes de gravar um row group no parquet")
+    p.add_argument("--compressao", choices=["snappy", "zstd"], default=COMPRESSAO,
+                   help="Compressão dos parquets (zstd = arquivos menores, mais CPU)")
+    p.add_argument("--linhas-por-grupo", type=int, default=LINHAS_POR_GRUPO,
+                   help="Linhas por row group no parquet final (ordenado por codigo_ibge e tempo)")
+    p.add_argument("--resolucao-grade", type=float, default=RESOLUCAO_GRADE,
+                   help="Resolução (graus) da grade do modelo: municípios na mesma célula "
+                        "são buscados uma só vez, no centro da célula (0 = desliga, padrão; "
+                        "0.1 = ERA5-Land)")
+    p.add_argument("--buscas-separadas", action="store_true",
+                   help="No modo ambos, busca diário e horário em chamadas separadas "
+                        "(padrão: uma chamada por lote traz os dois)")
+    p.add_argument("--formato", choices=FORMATOS, default=JSON,
+                   help="Formato das respostas da API: flatbuffers decodifica direto em arrays "
+                        "NumPy (requer openmeteo-sdk; sem ele, volta para JSON)")
+    p.add_argument("--sem-cache", action="store_true",
+                   help="Ignora o cache local de respostas da API (data/cache)")
+    p.add_argument("--retomar", action="store_true",
+                   help="Recoleta só os municípios ausentes/com falha no ledger (state/ledger.sqlite) "
+                        "e mescla no parquet do dia")
+    p.add_argument("--desde", type=_datas_de, default=None,
+                   help="Com --retomar: primeira data a verificar (YYYY-MM-DD). "
+                        "Padrão: primeira data registrada no ledger")
+    p.add_argument("--shard", type=shards.interpretar_shard, default=None,
+                   help="Coleta só a parte i de N dos municípios (codigo_ibge %% N == i-1) e "
+                        "grava em data/shards/, sem upload nem STATE. Ex.: --shard 1/4")
+    p.add_argument("--consolidar-shards", type=int, default=None, metavar="N",
+                   help="Junta os N shards de cada data pendente no parquet final, envia ao S3 "
+                        "e avança o STATE só quando todos os shards reportaram sucesso")
+    p.add_argument("--cota-minuto", type=int, default=cota.COTA_GRATUITA["minuto"],
+                   help="Chamadas ponderadas por minuto permitidas pela API (0 = sem limite)")
+    p.add_argument("--cota-hora", type=int, default=cota.COTA_GRATUITA["hora"],
+                   help="Chamadas ponderadas por hora (0 = sem limite)")
+    p.add_argument("--cota-dia", type=int, default=cota.COTA_GRATUITA["dia"],
+                   help="Chamadas ponderadas por dia (0 = sem limite)")
+    p.add_argument("--espera-maxima-cota", type=float, default=cota.ESPERA_MAXIMA,
+                   help="Segundos que uma chamada pode esperar pela cota; acima disso o "
+                        "restante da execução fica adiado para a próxima janela")
+    p.add_argument("--sem-cota", action="store_true",
+                   help="Desliga o controle de cota (plano pago ou servidor local)")
+    p.add_argument("--orcamento", action="store_true",
+                   help="Só estima as chamadas da execução contra a cota disponível e sai")
+    p.add_argument("--metricas-json", type=Path, default=None,
+                   help="Relatório JSON de métricas da execução (padrão: state/metricas/execucao.json)")
+    p.add_argument("--metricas-prom", type=Path, default=None,
+                   help="Arquivo texto Prometheus para o textfile collector "
+                        "(padrão: state/metricas/open_meteo.prom)")
+    perfil.adicionar_argumentos(p)
+    args = p.parse_args()
+    if args.shard and (args.retomar or args.consolidar_shards):
+        p.error("--shard não combina com --retomar nem com --consolidar-shards")
+    if args.consolidar_shards is not None and (args.consolidar_shards < 1 or args.retomar):
+        p.error("--consolidar-shards precisa de N >= 1 e não combina com --retomar")
+    if args.modo == "horario-incremental" and (args.retomar or args.shard or args.consolidar_shards
+                                              or args.orcamento):
+        p.error("--modo horario-incremental não combina com --retomar, --shard, "
+                "--consolidar-shards nem --orcamento")
+    return args
 
 
 def main():
     args = parse_args()
     base_dir = _resolve_base_dir()
+    pasta_metricas = base_dir / "state" / "metricas"
+    metricas.resetar()
+    sucesso = False
+    try:
+        with perfil.perfilar(args, base_dir):
+            _executar(args, base_dir)
+        sucesso = True
+    finally:
+        cota.salvar()
+        rel = metricas.finalizar_execucao(
+            sucesso,
+            args.metricas_json or pasta_metricas / "execucao.json",
+            args.metricas_prom or pasta_metricas / "open_meteo.prom",
+        )
+        print(f"📊 Métricas: {metricas.resumo(rel)}")
+
+
+def _executar(args, base_dir: Path):
+    configurar_limite_por_host(args.limite_por_host)
+    configurar_grade(args.resolucao_grade)
+    configurar_escrita(args.compressao, args.linhas_por_grupo)
+    configurar_cache(base_dir / "data" / "cache" / "respostas_api.sqlite",
+                     habilitado=not args.sem_cache)
+    configurar_formato(args.formato)
+    ledger = estado.conectar(base_dir)
+    _configurar_cota(args, base_dir)
 
     print("📁 BASE_DIR:", base_dir)
 
-    datas = _datas_pendentes(base_dir)
+    df_cidades = municipios.selecionar(args, base_dir)
+    # seleção parcial: mescla nos parquets do dia e deixa o STATE para a coleta completa
+    parcial = bool(args.uf or args.ibge or args.bbox)
+    if args.shard:
+        df_cidades = shards.filtrar_municipios(df_cidades, args.shard)
+        print(f"🧩 Shard {args.shard[0]}/{args.shard[1]}: {len(df_cidades)} municípios")
+
+    if args.modo == "horario-incremental":
+        def _enviar_incremental(caminho, dia):
+            print(f"⬆️  Enviando {TIPO_INCREMENTAL} {dia} → {caminho.name}")
+            upload_para_s3(caminho_local=caminho, tipo=TIPO_INCREMENTAL,
+                           data_referencia=dia.strftime("%Y-%m-%d"))
+
+        # STATE e ledger por data não mudam: o progresso fica nas marcas por município
+        coleta_incremental(base_dir, df_cidades, ledger, args.tamanho_lote, args.concorrencia,
+                           enviar=_enviar_incremental)
+        print("✅ Processo concluído com sucesso!")
+        return
+
+    tipos = _tipos(args.modo)
+
+    # plano[tipo] = [(ini, fim, df_cidades_do_periodo)]
+    plano = {}
+    mesclar = args.retomar or parcial
+    if args.retomar:
+        d1 = _d1()
+        codigos = df_cidades["codigo_ibge"]
+        for tipo in tipos:
+            desde = args.desde or estado.primeira_data(ledger, tipo) or d1
+            plano[tipo] = [
+                (ini, fim, df_cidades[df_cidades["codigo_ibge"].isin(pendentes)])
+                for ini, fim, pendentes in _plano_retomada(
+                    ledger, tipo, codigos, desde, d1, args.janela_dias
+                )
+            ]
+            for ini, fim, df in plano[tipo]:
+                print(f"🔁 ({tipo}) {ini} → {fim}: {len(df)} município(s) pendente(s)")
+        tem_trabalho = any(plano.values()) or any(
+            estado.uploads_pendentes(ledger, tipo) for tipo in tipos
+        )
+        datas = [d1] if tem_trabalho else []
+    else:
+        datas = _datas_pendentes(base_dir)
+        if datas:
+            print("📅 Datas a processar:", [str(d) for d in datas])
+        # execução anterior deixou adiados (cota, archive atrasado): busca só o que falta e mescla
+        retomar_adiados = bool(datas) and not args.shard and any(
+            estado.tem_adiados(ledger, tipo, min(datas), max(datas)) for tipo in tipos
+        )
+        if retomar_adiados:
+            print("⏸️  Execução anterior deixou municípios adiados: buscando só os pendentes")
+        for tipo in tipos:
+            if retomar_adiados:
+                plano[tipo] = [
+                    (ini, fim, df_cidades[df_cidades["codigo_ibge"].isin(pendentes)])
+                    for ini, fim, pendentes in _plano_retomada(
+                        ledger, tipo, df_cidades["codigo_ibge"], min(datas), max(datas),
+                        args.janela_dias,
+                    )
+                ]
+                mesclar = True
+                for ini, fim, df in plano[tipo]:
+                    print(f"🔁 ({tipo}) {ini} → {fim}: {len(df)} município(s) pendente(s)")
+                continue
+            plano[tipo] = [
+                (ini, fim, df_cidades)
+                for ini, fim in janelas(min(datas), max(datas), args.janela_dias)
+            ] if datas else []
 
     if not datas:
         print("Nenhuma data pendente. Nada a fazer.")
         return
 
-    print("📅 Datas a processar:", [str(d) for d in datas])
-
-    # ----------------------------
-    # NOVO: armazenar parquets antes do upload
-    # ----------------------------
-    arquivos_diarios_gerados = []
-    arquivos_horarios_gerados = []
-
-    # =======================================================
-    # PARTE 1 — COLETA (gera todos os parquets primeiro)
     # =======================================================
-    for dia in datas:
-        print(f"\n==============================")
-        print(f"GERANDO PARQUETS PARA {dia}")
-        print(f"==============================")
-
-        # DIÁRIO
-        if args.modo in ("diario", "ambos"):
-            p1 = coleta_diaria(base_dir, dia)
-            if p1:
-                arquivos_diarios_gerados.append((p1, dia))
-
-        # HORÁRIO
-        if args.modo in ("horario", "ambos"):
-            p2 = coleta_horaria(base_dir, dia)
-            if p2:
-                arquivos_horarios_gerados.append((p2, dia))
-
+    # PIPELINE — busca → montagem → gravação → upload
+    # Estágios ligados por filas limitadas: o upload de um período roda
+    # enquanto o período seguinte ainda está sendo coletado. Datas
+    # pendentes são buscadas em períodos (uma chamada por lote de
+    # municípios cobre a janela inteira).
     # =======================================================
-    # PARTE 2 — UPLOAD (somente depois de gerar tudo)
-    # =======================================================
-    print("\n==============================")
-    print("INICIANDO UPLOAD PARA S3…")
-    print("==============================")
-
-    # Upload dos diários
-    for caminho, dia in arquivos_diarios_gerados:
-        print(f"⬆️  Enviando diário {dia} → {caminho.name}")
-        upload_para_s3(
+    tarefas = sorted(
+        ((tipo, ini, fim, df) for tipo in tipos for ini, fim, df in plano[tipo]),
+        key=lambda t: (t[1], tipos.index(t[0])),
+    )
+    if not args.consolidar_shards:
+        estimar_orcamento(tarefas, args.tamanho_lote, combinar=not args.buscas_separadas)
+        if args.orcamento:
+            return
+
+    def _enviar(caminho, tipo, dia):
+        print(f"⬆️  Enviando {tipo} {dia} → {caminho.name}")
+        s3_key = upload_para_s3(
             caminho_local=caminho,
-            tipo="diario",
+            tipo=tipo,
             data_referencia=dia.strftime("%Y-%m-%d")
         )
+        estado.registrar_upload(ledger, tipo, dia, s3_key)
+        return s3_key
 
-    # Upload dos horários
-    for caminho, dia in arquivos_horarios_gerados:
-        print(f"⬆️  Enviando horário {dia} → {caminho.name}")
-        upload_para_s3(
-            caminho_local=caminho,
-            tipo="horario",
-            data_referencia=dia.strftime("%Y-%m-%d")
-        )
+    if args.consolidar_shards:
+        _consolidar_shards(base_dir, tipos, args.consolidar_shards, datas, ledger, _enviar)
+        print("✅ Processo concluído com sucesso!")
+        return
 
-    # =======================================================
-    # PARTE 3 — Atualiza o STATE
-    # =======================================================
-    ultimo_processado = max(datas)
-    _salvar_last_run(base_dir, ultimo_processado)
+    # STATE: só avança até a última data cujos tipos foram todos gravados e
+    # enviados, sem pular nenhuma data anterior.
+    concluidos = {}
+    lock_state = threading.Lock()
+    pendentes_state = sorted(set(datas)) if not args.retomar else []
+    # datas sem nada a buscar para um tipo (já completas no ledger) contam como concluídas
+    for tipo in tipos:
+        cobertas = {ini + timedelta(days=i) for ini, fim, _ in plano[tipo]
+                    for i in range((fim - ini).days + 1)}
+        for dia in pendentes_state:
+            if dia not in cobertas:
+                concluidos.setdefault(dia, set()).add(tipo)
+
+    def _ao_concluir(tipo, dia, caminho):
+        if estado.tem_adiados(ledger, tipo, dia):
+            return  # STATE para antes desta data; a próxima execução busca o restante
+        if caminho is None and estado.tem_falhas(ledger, tipo, dia):
+            print(f"⚠️ ({tipo}) {dia} sem arquivo e com falhas: STATE não avança")
+            return
+        with lock_state:
+            concluidos.setdefault(dia, set()).add(tipo)
+            avancou = None
+            while pendentes_state and concluidos.get(pendentes_state[0], set()) >= set(tipos):
+                avancou = pendentes_state.pop(0)
+            if avancou is not None:
+                last_run = _carregar_last_run(base_dir)
+                if last_run is None or avancou > last_run:
+                    _salvar_last_run(base_dir, avancou)
+                    print(f"📌 STATE atualizado para {avancou}")
+
+    # shard: só grava em data/shards/; ledger, upload e STATE ficam com a consolidação
+    coletar_e_enviar(
+        base_dir, tarefas, enviar=None if args.shard else _enviar,
+        ledger=None if args.shard else ledger,
+        tamanho_lote=args.tamanho_lote, concorrencia=args.concorrencia,
+        workers_montagem=args.workers_montagem, workers_gravacao=args.workers_gravacao,
+        workers_upload=args.workers_upload, municipios_por_grupo=args.municipios_por_grupo,
+        mesclar=mesclar, ao_concluir=None if args.shard or parcial else _ao_concluir,
+        shard=args.shard, combinar=not args.buscas_separadas,
+    )
+
+    # no modo retomada, reenvia também arquivos coletados mas não enviados
+    if args.retomar:
+        sobras = [
+            (caminho, tipo, dia.strftime("%Y-%m-%d"))
+            for tipo in tipos
+            for dia, caminho in sorted(estado.uploads_pendentes(ledger, tipo).items())
+            if caminho.exists()
+        ]
+        if sobras:
+            manifesto = upload_lote_s3(sobras, workers=args.workers_upload)
+            for item, (_, tipo, dia) in zip(manifesto, sobras):
+                estado.registrar_upload(ledger, tipo, _datas_de(dia), item["s3_uri"])
+            enviados = sum(item["status"] == "enviado" for item in manifesto)
+            print(f"⬆️  Reenvio: {enviados} enviado(s), {len(manifesto) - enviados} já idêntico(s) no S3")
+
+        if parcial:
+            print("✅ Processo concluído com sucesso!")
+            return
+
+        # retomada verifica todas as datas até D-1 (ou até a véspera do primeiro adiamento)
+        ultimo_processado = max(datas)
+        primeira_adiada = estado.primeira_data_adiada(ledger, tipos)
+        if primeira_adiada is not None:
+            ultimo_processado = min(ultimo_processado, primeira_adiada - timedelta(days=1))
+        last_run = _carregar_last_run(base_dir)
+        if last_run is None or ultimo_processado > last_run:
+            _salvar_last_run(base_dir, ultimo_processado)
+            print(f"\n📌 STATE atualizado para {ultimo_processado}")
 
-    print(f"\n📌 STATE atualizado para {ultimo_processado}")
     print("✅ Processo concluído com sucesso!")
 
 
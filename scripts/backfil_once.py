@@ -8,26 +8,24 @@ ROOT = Path(__file__).resolve().parents[1]  # raiz do projeto
 sys.path.append(str(ROOT))
 
 import os
-import time
-import requests
-import pandas as pd
-from datetime import datetime, timedelta, date
-from dateutil.tz import gettz
-from tqdm import tqdm
+import argparse
+from datetime import datetime, date
 
 # funções do seu projeto
-from src.processa_dados import processar_clima
-from src.upload_s3 import upload_para_s3 
-
-# ======== CONFIG ONE-OFF ========
+from src.coleta import janelas, TAMANHO_LOTE, MUNICIPIOS_POR_GRUPO
+from src.pipeline import coletar_e_enviar, estimar_orcamento
+from src.upload_s3 import upload_para_s3
+from src.concorrencia import configurar_limite_por_host, LIMITE_POR_HOST
+from src.cache import configurar_cache
+from src.formato import configurar_formato, FORMATOS, JSON
+from src.grade import configurar_grade, RESOLUCAO_GRADE
+from src.escrita import configurar_escrita, COMPRESSAO, LINHAS_POR_GRUPO
+from src import cota, estado, municipios, perfil
+
+# ======== CONFIG ONE-OFF (padrões; sobrescreva pela CLI) ========
 DATA_INI = date(2025, 11,5)
 DATA_FIM = date(2025, 11,11)
-TIMEZONE = "America/Sao_Paulo"
-HTTP_TIMEOUT = 30
-RETRIES = 2
-SLEEP_BETWEEN_CALLS = 0.02
-PARQUET_COMPRESSION = "snappy"
-PARQUET_ENGINE = "pyarrow"
+JANELA_DIAS = 31   # dias pedidos por chamada à API
 BUCKET = os.getenv("S3_BUCKET")
 
 # ================================
@@ -38,204 +36,133 @@ def base_dir() -> Path:
         here = Path(__file__).resolve().parents[2]
     return here
 
-def daterange(dini: date, dfim: date):
-    cur = dini
-    while cur <= dfim:
-        yield cur
-        cur += timedelta(days=1)
-
-def load_cidades(path: Path) -> pd.DataFrame:
-    if not path.exists():
-        raise FileNotFoundError(f"Não encontrei lista de municípios: {path}")
-    return pd.read_csv(path, sep=";")
-
-def fetch_daily_archive(lat: float, lon: float, dia: date, tz: str) -> pd.DataFrame:
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": dia.strftime("%Y-%m-%d"),
-        "end_date": dia.strftime("%Y-%m-%d"),
-        "daily": (
-            "temperature_2m_max,temperature_2m_min,"
-            "apparent_temperature_max,apparent_temperature_min,"
-            "precipitation_sum,rain_sum,snowfall_sum,"
-            "windspeed_10m_max,windgusts_10m_max,winddirection_10m_dominant,"
-            "shortwave_radiation_sum,weathercode"
-        ),
-        "timezone": tz,
-    }
-    r = requests.get("https://archive-api.open-meteo.com/v1/archive",
-                     params=params, timeout=HTTP_TIMEOUT)
-    r.raise_for_status()
-    js = r.json()
-    return pd.DataFrame(js.get("daily", {}))
-
-def fetch_hourly_archive(lat: float, lon: float, dia: date, tz: str) -> pd.DataFrame:
-    params_a = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": dia.strftime("%Y-%m-%d"),
-        "end_date": dia.strftime("%Y-%m-%d"),
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m",
-        "timezone": tz,
-    }
-    r = requests.get("https://archive-api.open-meteo.com/v1/archive",
-                     params=params_a, timeout=HTTP_TIMEOUT)
-    if r.status_code == 200:
-        js = r.json()
-        if js.get("hourly"):
-            return pd.DataFrame(js["hourly"])
-
-    # fallback raro
-    params_f = {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m",
-        "past_days": 1,
-        "timezone": tz,
-    }
-    r2 = requests.get("https://api.open-meteo.com/v1/forecast",
-                      params=params_f, timeout=HTTP_TIMEOUT)
-    r2.raise_for_status()
-    df = pd.DataFrame(r2.json().get("hourly", {}))
-    if "time" in df.columns:
-        target = dia.strftime("%Y-%m-%d")
-        df = df[df["time"].str.startswith(target)]
-    return df
-
-def save_parquet(df: pd.DataFrame, path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    for col in df.columns:
-        if df[col].dtype == "object":
-            df[col] = df[col].astype("string")
-    df.to_parquet(path, index=False, engine=PARQUET_ENGINE, compression=PARQUET_COMPRESSION)
+def _data(valor: str) -> date:
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Backfill Open-Meteo por período (uma chamada por lote de municípios cobre vários dias)"
+    )
+    p.add_argument("--data-ini", type=_data, default=DATA_INI, help="YYYY-MM-DD")
+    p.add_argument("--data-fim", type=_data, default=DATA_FIM, help="YYYY-MM-DD (inclusive)")
+    p.add_argument("--modo", choices=["diario", "horario", "ambos"], default="ambos")
+    municipios.adicionar_argumentos(p)
+    p.add_argument("--janela-dias", type=int, default=JANELA_DIAS,
+                   help="Dias pedidos por chamada à API")
+    p.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE,
+                   help="Quantidade de municípios por chamada à API")
+    p.add_argument("--concorrencia", type=int, default=1,
+                   help="Lotes buscados em paralelo")
+    p.add_argument("--limite-por-host", type=int, default=LIMITE_POR_HOST,
+                   help="Máximo de requisições simultâneas para um mesmo host da API")
+    p.add_argument("--workers-montagem", type=int, default=2,
+                   help="Threads do estágio de montagem (parse JSON → colunas)")
+    p.add_argument("--workers-upload", type=int, default=2,
+                   help="Threads do estágio de upload para o S3")
+    p.add_argument("--municipios-por-grupo", type=int, default=MUNICIPIOS_POR_GRUPO,
+                   help="Municípios acumulados em memória antes de gravar um row group no parquet")
+    p.add_argument("--sem-upload", action="store_true", help="Não envia os parquets ao S3")
+    p.add_argument("--base-dir", type=Path, default=None,
+                   help="Raiz do projeto (data/ e state/). Padrão: detectada a partir do script")
+    p.add_argument("--compressao", choices=["snappy", "zstd"], default=COMPRESSAO,
+                   help="Compressão dos parquets (zstd = arquivos menores, mais CPU)")
+    p.add_argument("--linhas-por-grupo", type=int, default=LINHAS_POR_GRUPO,
+                   help="Linhas por row group no parquet final (ordenado por codigo_ibge e tempo)")
+    p.add_argument("--resolucao-grade", type=float, default=RESOLUCAO_GRADE,
+                   help="Resolução (graus) da grade do modelo: municípios na mesma célula "
+                        "são buscados uma só vez, no centro da célula (0 = desliga, padrão; "
+                        "0.1 = ERA5-Land)")
+    p.add_argument("--buscas-separadas", action="store_true",
+                   help="No modo ambos, busca diário e horário em chamadas separadas "
+                        "(padrão: uma chamada por lote traz os dois)")
+    p.add_argument("--formato", choices=FORMATOS, default=JSON,
+                   help="Formato das respostas da API: flatbuffers decodifica direto em arrays "
+                        "NumPy (requer openmeteo-sdk; sem ele, volta para JSON)")
+    p.add_argument("--sem-cache", action="store_true",
+                   help="Ignora o cache local de respostas da API (data/cache)")
+    p.add_argument("--cota-minuto", type=int, default=cota.COTA_GRATUITA["minuto"],
+                   help="Chamadas ponderadas por minuto permitidas pela API (0 = sem limite)")
+    p.add_argument("--cota-hora", type=int, default=cota.COTA_GRATUITA["hora"],
+                   help="Chamadas ponderadas por hora (0 = sem limite)")
+    p.add_argument("--cota-dia", type=int, default=cota.COTA_GRATUITA["dia"],
+                   help="Chamadas ponderadas por dia (0 = sem limite)")
+    p.add_argument("--espera-maxima-cota", type=float, default=cota.ESPERA_MAXIMA,
+                   help="Segundos que uma chamada pode esperar pela cota antes de adiar o restante")
+    p.add_argument("--sem-cota", action="store_true",
+                   help="Desliga o controle de cota (plano pago ou servidor local)")
+    p.add_argument("--orcamento", action="store_true",
+                   help="Só estima as chamadas do backfill contra a cota disponível e sai")
+    perfil.adicionar_argumentos(p)
+    return p.parse_args()
 
 def main():
-    root = base_dir()
-    path_lista = root / "data" / "lista_municipios" / "lista_mun.csv"
-
-    # pastas locais
-    path_raw = root / "data" / "raw"
-    path_raw_diario = path_raw / "diario"
-    path_raw_horario = path_raw / "horario"
-
-    df_cidades = load_cidades(path_lista)
-    print(f"📦 Backfill {DATA_INI} → {DATA_FIM} | cidades={len(df_cidades)}")
+    args = parse_args()
+    if args.data_fim < args.data_ini:
+        raise SystemExit("--data-fim deve ser maior ou igual a --data-ini")
+
+    root = args.base_dir or base_dir()
+    with perfil.perfilar(args, root):
+        _backfill(args, root)
+
+
+def _backfill(args, root: Path):
+    configurar_limite_por_host(args.limite_por_host)
+    configurar_grade(args.resolucao_grade)
+    configurar_escrita(args.compressao, args.linhas_por_grupo)
+    configurar_cache(root / "data" / "cache" / "respostas_api.sqlite",
+                     habilitado=not args.sem_cache)
+    configurar_formato(args.formato)
+    ledger = estado.conectar(root)
+    cota.configurar_cota(
+        None if args.sem_cota else
+        {"minuto": args.cota_minuto, "hora": args.cota_hora, "dia": args.cota_dia},
+        espera_maxima=args.espera_maxima_cota,
+        caminho=root / "state" / "cota.json",
+    )
+
+    df_cidades = municipios.selecionar(args, root)
+    print(f"📦 Backfill {args.data_ini} → {args.data_fim} | cidades={len(df_cidades)}")
     print("BASE_DIR:", root)
 
-    for dia in daterange(DATA_INI, DATA_FIM):
-        dt_str = dia.strftime("%Y%m%d")
-        dt_iso = dia.strftime("%Y-%m-%d")
-
-        print(f"\n=== {dt_str} ({dt_iso}) ===")
-
-        # ------------------ DIÁRIO ------------------
-        dados_d, falhas_d = [], 0
-
-        for _, row in tqdm(df_cidades.iterrows(), total=df_cidades.shape[0], desc=f"DIARIO {dt_str}"):
-            ok = False
-            for attempt in range(RETRIES + 1):
-                try:
-                    dfd = fetch_daily_archive(float(row["latitude"]), float(row["longitude"]), dia, TIMEZONE)
-                    if dfd is not None and not dfd.empty:
-                        try:
-                            payload = {"daily": dfd.to_dict(orient="list")}
-                            dfdp = processar_clima(payload, row)
-                        except Exception:
-                            dfdp = dfd.copy()
-                            dfdp["nome"] = row["nome"]
-                            dfdp["nome_uf"] = row["nome_uf"]
-                            dfdp["latitude"] = row["latitude"]
-                            dfdp["longitude"] = row["longitude"]
-                        if dfdp is not None and not dfdp.empty:
-                            dados_d.append(dfdp)
-                    ok = True
-                    break
-                except Exception as e:
-                    if attempt >= RETRIES:
-                        falhas_d += 1
-                        print(f"Falha DIARIO {row.get('nome')} ({row.get('nome_uf')}): {e}")
-                    else:
-                        time.sleep(1)
-            time.sleep(SLEEP_BETWEEN_CALLS)
-
-        out_d = None
-        if dados_d:
-            df_out_d = pd.concat(dados_d, ignore_index=True)
-            out_d = path_raw_diario / f"dados_climaticos_diarios_{dt_str}.parquet"
-            save_parquet(df_out_d, out_d)
-            print(f"✅ Diário salvo (Parquet): {out_d}")
-        else:
-            print("⚠️ Diário vazio nesse dia.")
-
-        # ------------------ UPLOAD DIÁRIO ------------------
-        if out_d:
-            print("📤 Upload S3 (diario)...")
-            upload_para_s3(
-                caminho_local=out_d,
-                tipo="diario",
-                data_referencia=dt_iso,
-                bucket=BUCKET
-            )
-
-        # ------------------ HORÁRIO ------------------
-        dados_h, falhas_h = [], 0
-
-        for _, row in tqdm(df_cidades.iterrows(), total=df_cidades.shape[0], desc=f"HORARIO {dt_str}"):
-            ok = False
-            for attempt in range(RETRIES + 1):
-                try:
-                    dfh = fetch_hourly_archive(float(row["latitude"]), float(row["longitude"]), dia, TIMEZONE)
-                    if dfh is not None and not dfh.empty:
-                        dfh["nome"] = row["nome"]
-                        dfh["uf"] = row["nome_uf"]
-                        dfh["latitude"] = row["latitude"]
-                        dfh["longitude"] = row["longitude"]
-
-                        dfh.rename(columns={
-                            "time": "data_hora",
-                            "temperature_2m": "temperatura_c",
-                            "relative_humidity_2m": "umidade_relativa",
-                            "precipitation": "precipitacao_mm",
-                            "wind_speed_10m": "velocidade_vento_ms",
-                            "nome": "municipio",
-                        }, inplace=True)
-
-                        ordered = [
-                            "data_hora", "municipio", "uf", "latitude", "longitude",
-                            "temperatura_c", "umidade_relativa", "precipitacao_mm", "velocidade_vento_ms",
-                        ]
-
-                        dfh = dfh[[c for c in ordered if c in dfh.columns]]
-                        dados_h.append(dfh)
-                    ok = True
-                    break
-                except Exception as e:
-                    if attempt >= RETRIES:
-                        falhas_h += 1
-                        print(f"Falha HORARIO {row.get('nome')} ({row.get('nome_uf')}): {e}")
-                    else:
-                        time.sleep(1)
-            time.sleep(SLEEP_BETWEEN_CALLS)
-
-        out_h = None
-        if dados_h:
-            df_out_h = pd.concat(dados_h, ignore_index=True)
-            out_h = path_raw_horario / f"dados_climaticos_horarios_{dt_str}.parquet"
-            save_parquet(df_out_h, out_h)
-            print(f"✅ Horário salvo (Parquet): {out_h}")
-        else:
-            print("⚠️ Horário vazio nesse dia.")
-
-        # ------------------ UPLOAD HORÁRIO ------------------
-        if out_h:
-            print("📤 Upload S3 (horario)...")
-            upload_para_s3(
-                caminho_local=out_h,
-                tipo="horario",  # <- pois sua pasta local é "horario"
-                data_referencia=dt_iso,
-                bucket=BUCKET     
-            )
+    tipos = [t for t in ("diario", "horario") if args.modo in (t, "ambos")]
+    tarefas = [
+        (tipo, ini, fim, df_cidades)
+        for ini, fim in janelas(args.data_ini, args.data_fim, args.janela_dias)
+        for tipo in tipos
+    ]
+    estimar_orcamento(tarefas, args.tamanho_lote, combinar=not args.buscas_separadas)
+    if args.orcamento:
+        return
+
+    def _enviar(caminho, tipo, dia):
+        print(f"📤 Upload S3 ({tipo}) {dia}...")
+        s3_key = upload_para_s3(
+            caminho_local=caminho,
+            tipo=tipo,
+            data_referencia=dia.strftime("%Y-%m-%d"),
+            bucket=BUCKET
+        )
+        estado.registrar_upload(ledger, tipo, dia, s3_key)
+        return s3_key
+
+    # o upload de uma janela roda enquanto a seguinte é coletada
+    try:
+        gerados = coletar_e_enviar(
+            root, tarefas, enviar=None if args.sem_upload else _enviar, ledger=ledger,
+            tamanho_lote=args.tamanho_lote, concorrencia=args.concorrencia,
+            workers_montagem=args.workers_montagem, workers_upload=args.workers_upload,
+            municipios_por_grupo=args.municipios_por_grupo, combinar=not args.buscas_separadas,
+            # seleção parcial (--uf/--ibge/--bbox): preserva os outros municípios do parquet do dia
+            mesclar=bool(args.uf or args.ibge or args.bbox),
+        )
+    finally:
+        cota.salvar()
+    for tipo in tipos:
+        if not gerados.get(tipo):
+            print(f"⚠️ {tipo.capitalize()} vazio no período.")
+    if any(estado.tem_adiados(ledger, t, args.data_ini, args.data_fim) for t in tipos):
+        print(f"⏸️  Cota esgotada: complete depois com "
+              f"python main.py --retomar --desde {args.data_ini}")
 
     print("\n🎉 Backfill concluído com sucesso!\n")
 
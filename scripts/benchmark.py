@@ -0,0 +1,231 @@
+# scripts/benchmark.py
+"""
+Benchmark ponta a ponta da coleta contra o Open-Meteo falso
+(scripts/fake_open_meteo.py), sem rede nem cache.
+
+Roda a coleta diária, a horária e o backfill para 100, 1.000 e 5.570
+municípios (primeiras linhas de lista_mun_tot.csv). Cada cenário roda num
+processo filho, para medir CPU e pico de memória isolados. Reporta
+requisições/s, tempo de parede, CPU, pico de memória, bytes recebidos pela
+rede e o tempo gasto decodificando as respostas. Com --formatos json
+flatbuffers, cada cenário roda nos dois formatos de resposta.
+
+Uso:
+  python scripts/benchmark.py
+  python scripts/benchmark.py --municipios 100 1000 --cenarios diario horario --saida bench.json
+  python scripts/benchmark.py --referencia bench.json --tolerancia 0.25   # sai com erro se piorar
+  python scripts/benchmark.py --municipios 1000 --formatos json flatbuffers
+"""
+from __future__ import annotations
+
+# --- garantir que 'src' seja importável ---
+from pathlib import Path
+import sys
+ROOT = Path(__file__).resolve().parents[1]  # raiz do projeto
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "scripts"))
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+import fake_open_meteo
+from src.formato import FORMATOS, JSON
+
+
+CENARIOS = ("diario", "horario", "backfill")
+MUNICIPIOS = (100, 1000, 5570)
+DATA_REFERENCIA = date(2024, 1, 15)  # antiga: sempre servida pelo archive
+DIAS_BACKFILL = 7
+COLUNAS_CIDADES = ["codigo_ibge", "nome", "nome_uf", "latitude", "longitude"]
+
+
+# ============================================================
+# PROCESSO FILHO (um cenário)
+# ============================================================
+def _pico_memoria_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024  # bytes no macOS, KB no Linux
+
+
+def _cpu_s() -> float:
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _executar_cenario(cfg: dict) -> dict:
+    from src.cache import configurar_cache
+    from src.concorrencia import configurar_limite_por_host
+    from src.coleta import coleta_periodo
+    from src.formato import configurar_formato
+    from src import metricas
+
+    base_dir = Path(cfg["base_dir"])
+    configurar_cache(habilitado=False)
+    configurar_limite_por_host(cfg["limite_por_host"])
+    if configurar_formato(cfg["formato"]) != cfg["formato"]:
+        raise SystemExit(f"formato {cfg['formato']} indisponível")
+
+    cpu0, t0 = _cpu_s(), time.perf_counter()
+    if cfg["cenario"] in ("diario", "horario"):
+        coleta_periodo(base_dir, cfg["cenario"], DATA_REFERENCIA, DATA_REFERENCIA,
+                       cfg["tamanho_lote"], cfg["concorrencia"])
+    else:
+        import backfil_once
+        fim = DATA_REFERENCIA + timedelta(days=cfg["dias_backfill"] - 1)
+        sys.argv = [
+            "backfil_once.py", "--base-dir", str(base_dir),
+            "--data-ini", DATA_REFERENCIA.isoformat(), "--data-fim", fim.isoformat(),
+            "--tamanho-lote", str(cfg["tamanho_lote"]), "--concorrencia", str(cfg["concorrencia"]),
+            "--limite-por-host", str(cfg["limite_por_host"]), "--sem-upload", "--sem-cache", "--sem-cota",
+            "--formato", cfg["formato"],
+        ]
+        backfil_once.main()
+    parede = time.perf_counter() - t0
+    cpu = _cpu_s() - cpu0
+
+    import pyarrow.parquet as pq
+    linhas = sum(pq.ParquetFile(f).metadata.num_rows for f in (base_dir / "data" / "raw").rglob("*.parquet"))
+    decodificacao = sum(h["soma"] for h in metricas.relatorio()["histogramas"]
+                        if h["nome"] == "decodificacao_segundos")
+    return {"parede_s": parede, "cpu_s": cpu, "pico_memoria_mb": _pico_memoria_mb(), "linhas": linhas,
+            "decodificacao_s": decodificacao}
+
+
+# ============================================================
+# PROCESSO PAI
+# ============================================================
+def _preparar_base(n: int) -> Path:
+    """Diretório temporário com lista_mun.csv = primeiros n municípios de lista_mun_tot.csv."""
+    todos = pd.read_csv(ROOT / "data" / "lista_municipios" / "lista_mun_tot.csv", sep=";")
+    if n > len(todos):
+        raise SystemExit(f"lista_mun_tot.csv tem só {len(todos)} municípios")
+    base = Path(tempfile.mkdtemp(prefix=f"bench_{n}_"))
+    pasta = base / "data" / "lista_municipios"
+    pasta.mkdir(parents=True)
+    todos[COLUNAS_CIDADES].head(n).to_csv(pasta / "lista_mun.csv", sep=";", index=False)
+    return base
+
+
+def _rodar(servidor, cenario: str, n: int, formato: str, args) -> dict:
+    base = _preparar_base(n)
+    cfg = {
+        "cenario": cenario, "formato": formato, "base_dir": str(base), "tamanho_lote": args.tamanho_lote,
+        "concorrencia": args.concorrencia, "limite_por_host": args.limite_por_host,
+        "dias_backfill": args.dias_backfill,
+    }
+    env = {**os.environ, **servidor.variaveis_ambiente()}
+    antes = servidor.estatisticas.resumo()
+    try:
+        proc = subprocess.run([sys.executable, __file__, "--_filho", json.dumps(cfg)],
+                              env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+    depois = servidor.estatisticas.resumo()
+
+    linha = [l for l in proc.stdout.splitlines() if l.startswith("RESULTADO ")]
+    if proc.returncode != 0 or not linha:
+        print(proc.stdout[-2000:], proc.stderr[-2000:], sep="\n")
+        raise SystemExit(f"❌ Cenário {cenario} ({n} municípios, {formato}) falhou")
+
+    r = json.loads(linha[-1][len("RESULTADO "):])
+    r["requisicoes"] = depois["requisicoes"] - antes["requisicoes"]
+    r["bytes_recebidos"] = depois["bytes_enviados"] - antes["bytes_enviados"]
+    r["requisicoes_por_s"] = r["requisicoes"] / r["parede_s"] if r["parede_s"] else 0.0
+    return {"cenario": cenario, "municipios": n, "formato": formato, **r}
+
+
+def _comparar(resultados: list, referencia: Path, tolerancia: float) -> list:
+    """Cenários que pioraram mais que `tolerancia` em tempo de parede, CPU ou memória."""
+    def _chave(r):
+        return r["cenario"], r["municipios"], r.get("formato", "json")
+
+    ref = {_chave(r): r for r in json.loads(referencia.read_text())["resultados"]}
+    regressoes = []
+    for r in resultados:
+        antigo = ref.get(_chave(r))
+        if antigo is None:
+            continue
+        for metrica in ("parede_s", "cpu_s", "pico_memoria_mb"):
+            if antigo[metrica] and r[metrica] > antigo[metrica] * (1 + tolerancia):
+                regressoes.append(f"{r['cenario']} × {r['municipios']} ({_chave(r)[2]}): {metrica} "
+                                  f"{antigo[metrica]:.2f} → {r[metrica]:.2f}")
+    return regressoes
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark da coleta contra um Open-Meteo local")
+    p.add_argument("--municipios", type=int, nargs="+", default=list(MUNICIPIOS))
+    p.add_argument("--cenarios", nargs="+", choices=CENARIOS, default=list(CENARIOS))
+    p.add_argument("--formatos", nargs="+", choices=FORMATOS, default=[JSON],
+                   help="Formatos de resposta da API a comparar (flatbuffers requer openmeteo-sdk)")
+    p.add_argument("--dias-backfill", type=int, default=DIAS_BACKFILL)
+    p.add_argument("--tamanho-lote", type=int, default=50)
+    p.add_argument("--concorrencia", type=int, default=4)
+    p.add_argument("--limite-por-host", type=int, default=4)
+    p.add_argument("--latencia-ms", type=float, default=50.0, help="Latência simulada do servidor")
+    p.add_argument("--jitter-ms", type=float, default=20.0)
+    p.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 5xx")
+    p.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429")
+    p.add_argument("--saida", type=Path, default=None, help="Grava os resultados em JSON")
+    p.add_argument("--referencia", type=Path, default=None,
+                   help="JSON de uma execução anterior para comparar")
+    p.add_argument("--tolerancia", type=float, default=0.25,
+                   help="Piora relativa aceita antes de acusar regressão (0.25 = 25%%)")
+    p.add_argument("--_filho", help=argparse.SUPPRESS)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args._filho:
+        print("RESULTADO " + json.dumps(_executar_cenario(json.loads(args._filho))))
+        return
+
+    servidor = fake_open_meteo.iniciar_servidor(
+        latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms,
+        taxa_erro=args.taxa_erro, taxa_429=args.taxa_429,
+    )
+    print(f"🌦️  Open-Meteo falso em {servidor.url_base} "
+          f"(latência {args.latencia_ms:g}±{args.jitter_ms:g} ms, 5xx {args.taxa_erro:.0%}, 429 {args.taxa_429:.0%})")
+
+    resultados = []
+    print(f"{'cenário':<9} {'munic.':>6} {'formato':<11} {'req':>6} {'req/s':>7} {'parede s':>9} "
+          f"{'CPU s':>7} {'pico MB':>8} {'rede MB':>8} {'decod s':>8} {'linhas':>9}")
+    for n in args.municipios:
+        for cenario in args.cenarios:
+            for formato in args.formatos:
+                r = _rodar(servidor, cenario, n, formato, args)
+                resultados.append(r)
+                print(f"{cenario:<9} {n:>6} {formato:<11} {r['requisicoes']:>6} {r['requisicoes_por_s']:>7.1f} "
+                      f"{r['parede_s']:>9.2f} {r['cpu_s']:>7.2f} {r['pico_memoria_mb']:>8.0f} "
+                      f"{r['bytes_recebidos'] / 1024 ** 2:>8.2f} {r['decodificacao_s']:>8.2f} {r['linhas']:>9}")
+    servidor.shutdown()
+
+    if args.saida:
+        args.saida.write_text(json.dumps({
+            "parametros": {k: (str(v) if isinstance(v, Path) else v)
+                           for k, v in vars(args).items() if k != "_filho"},
+            "resultados": resultados,
+        }, indent=2, ensure_ascii=False))
+        print(f"💾 Resultados salvos em {args.saida}")
+
+    if args.referencia:
+        regressoes = _comparar(resultados, args.referencia, args.tolerancia)
+        for r in regressoes:
+            print(f"⚠️  Regressão: {r}")
+        if regressoes:
+            raise SystemExit(1)
+        print(f"✅ Sem regressões acima de {args.tolerancia:.0%} em relação a {args.referencia}")
+
+
+if __name__ == "__main__":
+    main()
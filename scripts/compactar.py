@@ -0,0 +1,74 @@
+# scripts/compactar.py
+"""
+Compacta os parquets diários de meses fechados em um arquivo por mês
+(src/compactacao.py) e envia os mensais e o manifesto para
+raw/clima_mensal/{tipo}/ no S3.
+
+Uso:
+  python scripts/compactar.py                       # meses fechados até o STATE
+  python scripts/compactar.py --ate 2025-06-30 --modo diario --sem-upload
+  python scripts/compactar.py --forcar --compressao zstd
+"""
+from __future__ import annotations
+
+# --- garantir que 'src' seja importável ---
+from pathlib import Path
+import sys
+ROOT = Path(__file__).resolve().parents[1]  # raiz do projeto
+sys.path.append(str(ROOT))
+
+import argparse
+from datetime import date, datetime, timedelta
+
+from src.compactacao import compactar
+from src.escrita import configurar_escrita, COMPRESSAO
+from src.upload_s3 import upload_chave_s3
+
+
+def _data(valor: str) -> date:
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+
+def _limite_padrao(base_dir: Path) -> date:
+    """Último dia já fechado pela coleta: o STATE (state/last_run.txt) ou, sem ele, ontem."""
+    state = base_dir / "state" / "last_run.txt"
+    if state.exists():
+        try:
+            return _data(state.read_text().strip())
+        except ValueError:
+            pass
+    return date.today() - timedelta(days=1)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Compactação mensal dos parquets diários")
+    p.add_argument("--modo", choices=["diario", "horario", "ambos"], default="ambos")
+    p.add_argument("--ate", type=_data, default=None,
+                   help="Compacta só meses cujo último dia é <= esta data (YYYY-MM-DD). "
+                        "Padrão: state/last_run.txt")
+    p.add_argument("--forcar", action="store_true",
+                   help="Refaz também os meses cujo mensal já está em dia")
+    p.add_argument("--compressao", choices=["snappy", "zstd"], default=COMPRESSAO,
+                   help="Compressão dos arquivos mensais")
+    p.add_argument("--sem-upload", action="store_true", help="Não envia mensais e manifesto ao S3")
+    p.add_argument("--base-dir", type=Path, default=ROOT,
+                   help="Raiz do projeto (data/ e state/)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    configurar_escrita(args.compressao)
+    ate = args.ate or _limite_padrao(args.base_dir)
+    print(f"🗜️  Compactando meses fechados até {ate} em {args.base_dir / 'data' / 'raw'}")
+
+    for tipo in [t for t in ("diario", "horario") if args.modo in (t, "ambos")]:
+        feitos = compactar(args.base_dir, tipo, ate, forcar=args.forcar,
+                           enviar=None if args.sem_upload else upload_chave_s3)
+        if not feitos:
+            print(f"⏭️  ({tipo}) Nenhum mês novo ou alterado para compactar.")
+    print("✅ Compactação concluída.")
+
+
+if __name__ == "__main__":
+    main()
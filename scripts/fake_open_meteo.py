@@ -0,0 +1,391 @@
+# scripts/fake_open_meteo.py
+"""
+Servidor local que imita os endpoints archive e forecast do Open-Meteo, para
+testar e medir a coleta sem depender da API real.
+
+Os dados são determinísticos (mesmo local + mesmo instante → mesmo valor) e
+o servidor pode simular latência, erros 5xx e 429 com Retry-After. Com
+format=flatbuffers responde no formato binário da API (precisa do
+openmeteo-sdk; sem ele, responde em JSON).
+
+Uso:
+  python scripts/fake_open_meteo.py --porta 8099 --latencia-ms 80 --taxa-429 0.02
+
+  OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8099/v1/archive \\
+  OPEN_METEO_FORECAST_URL=http://127.0.0.1:8099/v1/forecast \\
+  python main.py --sem-cache --sem-cota
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+try:  # só para format=flatbuffers (vem com o openmeteo-sdk)
+    import flatbuffers
+except ImportError:
+    flatbuffers = None
+
+
+ATRASO_ARCHIVE_DIAS = 5  # o archive só tem dados até hoje - N dias
+DIAS_FORECAST = 7
+UTC_OFFSET = -3 * 3600   # America/Sao_Paulo
+
+
+# ============================================================
+# DADOS SINTÉTICOS
+# ============================================================
+def _ruido(lat: float, lon: float, var: str, dias: np.ndarray, horas: np.ndarray) -> np.ndarray:
+    """Pseudoaleatório em [0, 1) que depende só de (local, variável, instante)."""
+    semente = (zlib.crc32(var.encode()) % 997) * 0.013 + lat * 12.9898 + lon * 78.233
+    x = np.sin(dias * 0.731 + horas * 3.117 + semente) * 43758.5453
+    return x - np.floor(x)
+
+
+def _serie(var: str, lat: float, lon: float, dias: np.ndarray, horas: np.ndarray) -> list:
+    """Valores plausíveis de `var` para os instantes (dia ordinal, hora)."""
+    r = _ruido(lat, lon, var, dias, horas)
+    ciclo_dia = np.sin(2 * np.pi * (horas - 9) / 24)
+    ciclo_ano = np.cos(2 * np.pi * (dias % 365) / 365)
+    temperatura = 27 - 0.35 * abs(lat) + 5 * ciclo_dia + 3 * ciclo_ano * np.sign(-lat) + 2 * r - 1
+
+    if var.startswith("temperature_2m"):
+        valores = temperatura + (4 if var.endswith("_max") else -4 if var.endswith("_min") else 0)
+    elif var.startswith("apparent_temperature"):
+        valores = temperatura + 1.5 + (4 if var.endswith("_max") else -4)
+    elif var in ("precipitation", "precipitation_sum", "rain_sum"):
+        valores = np.maximum(0.0, r * 20 - 14)
+    elif var == "snowfall_sum":
+        valores = np.zeros_like(r)
+    elif var in ("wind_speed_10m", "windspeed_10m_max"):
+        valores = 5 + 10 * r
+    elif var == "windgusts_10m_max":
+        valores = 9 + 18 * r
+    elif var == "winddirection_10m_dominant":
+        valores = np.floor(r * 360)
+    elif var == "shortwave_radiation_sum":
+        valores = 15 + 8 * r
+    elif var == "weathercode":
+        valores = np.array([0, 1, 2, 3, 61, 63, 80])[(r * 7).astype(int)]
+    elif var == "relative_humidity_2m":
+        valores = np.clip(np.round(70 - 20 * ciclo_dia + 10 * r), 0, 100)
+    else:
+        valores = 10 * r
+
+    if var in ("winddirection_10m_dominant", "weathercode", "relative_humidity_2m"):
+        return valores.astype(int).tolist()
+    return np.round(valores, 1).tolist()
+
+
+def _bloco(lat: float, lon: float, dias: list[date], variaveis: list[str], horaria: bool) -> dict:
+    ordinais = np.array([d.toordinal() for d in dias], dtype=np.float64)
+    if horaria:
+        tempos = [f"{d.isoformat()}T{h:02d}:00" for d in dias for h in range(24)]
+        dias_v, horas_v = np.repeat(ordinais, 24), np.tile(np.arange(24.0), len(dias))
+    else:
+        tempos = [d.isoformat() for d in dias]
+        dias_v, horas_v = ordinais, np.full(len(dias), 12.0)
+
+    bloco = {"time": tempos}
+    for var in variaveis:
+        bloco[var] = _serie(var, lat, lon, dias_v, horas_v)
+    return bloco
+
+
+def _local(lat: float, lon: float, dias: list[date], blocos: dict, timezone: str,
+           horas: tuple | None = None) -> dict:
+    """
+    Resposta de um local no formato do Open-Meteo. blocos: {"daily"/"hourly":
+    variáveis}. horas: (start_hour, end_hour) recorta o bloco horário.
+    """
+    local = {
+        "latitude": round(lat, 4),
+        "longitude": round(lon, 4),
+        "generationtime_ms": 0.1,
+        "utc_offset_seconds": UTC_OFFSET,
+        "timezone": timezone,
+        "timezone_abbreviation": "-03",
+        "elevation": 100.0,
+    }
+    for chave, variaveis in blocos.items():
+        local[f"{chave}_units"] = {"time": "iso8601", **{v: "" for v in variaveis}}
+        local[chave] = _bloco(lat, lon, dias, variaveis, chave == "hourly")
+    if horas and "hourly" in local:
+        tempos = local["hourly"]["time"]
+        idx = [i for i, t in enumerate(tempos) if horas[0] <= t <= horas[1]]
+        local["hourly"] = {var: [valores[i] for i in idx] for var, valores in local["hourly"].items()}
+    return local
+
+
+def _flatbuffers(locais: list, blocos: dict) -> bytes:
+    """
+    Os mesmos locais no formato format=flatbuffers: uma mensagem
+    WeatherApiResponse por local, cada uma prefixada pelo tamanho. O
+    openmeteo-sdk só traz os leitores, então as tabelas são montadas campo a
+    campo (os slots vêm dos leitores do SDK).
+    """
+    mensagens = []
+    for local in locais:
+        b = flatbuffers.Builder(1024)
+        tz = b.CreateString(local["timezone"])
+        tabelas = {}
+        for chave, variaveis in blocos.items():
+            bloco = local[chave]
+            intervalo = 3600 if chave == "hourly" else 86400
+            inicio = int(np.datetime64(bloco["time"][0], "s").astype(np.int64)) - local["utc_offset_seconds"]
+            vars_ = []
+            for var in variaveis:
+                valores = b.CreateNumpyVector(np.asarray(bloco[var], dtype=np.float32))
+                b.StartObject(13)                                   # VariableWithValues
+                b.PrependUOffsetTRelativeSlot(3, valores, 0)        # values
+                vars_.append(b.EndObject())
+            b.StartVector(4, len(vars_), 4)
+            for v in reversed(vars_):
+                b.PrependUOffsetTRelative(v)
+            vetor = b.EndVector()
+            b.StartObject(4)                                        # VariablesWithTime
+            b.PrependInt64Slot(0, inicio, 0)                        # time
+            b.PrependInt64Slot(1, inicio + intervalo * len(bloco["time"]), 0)  # time_end
+            b.PrependInt32Slot(2, intervalo, 0)                     # interval
+            b.PrependUOffsetTRelativeSlot(3, vetor, 0)              # variables
+            tabelas[chave] = b.EndObject()
+        b.StartObject(15)                                           # WeatherApiResponse
+        b.PrependFloat32Slot(0, local["latitude"], 0.0)
+        b.PrependFloat32Slot(1, local["longitude"], 0.0)
+        b.PrependFloat32Slot(2, local["elevation"], 0.0)
+        b.PrependFloat32Slot(3, local["generationtime_ms"], 0.0)
+        b.PrependInt32Slot(6, local["utc_offset_seconds"], 0)
+        b.PrependUOffsetTRelativeSlot(7, tz, 0)
+        for slot, chave in ((10, "daily"), (11, "hourly")):
+            if chave in tabelas:
+                b.PrependUOffsetTRelativeSlot(slot, tabelas[chave], 0)
+        b.FinishSizePrefixed(b.EndObject())
+        mensagens.append(bytes(b.Output()))
+    return b"".join(mensagens)
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+class Estatisticas:
+    """Contadores do servidor (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.locais = 0
+        self.bytes_enviados = 0
+        self.por_status = Counter()
+        self.por_endpoint = Counter()
+
+    def registrar(self, endpoint: str, status: int, locais: int, n_bytes: int):
+        with self._lock:
+            self.requisicoes += 1
+            self.locais += locais
+            self.bytes_enviados += n_bytes
+            self.por_status[status] += 1
+            self.por_endpoint[endpoint] += 1
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {
+                "requisicoes": self.requisicoes,
+                "locais": self.locais,
+                "bytes_enviados": self.bytes_enviados,
+                "por_status": {str(k): v for k, v in self.por_status.items()},
+                "por_endpoint": dict(self.por_endpoint),
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como a API real
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, endpoint: str, status: int, corpo: dict | list | bytes, locais: int = 0,
+                   cabecalhos: dict | None = None):
+        binario = isinstance(corpo, bytes)
+        dados = corpo if binario else json.dumps(corpo, separators=(",", ":")).encode()
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            dados = gzip.compress(dados, compresslevel=1)
+            cabecalhos = {**(cabecalhos or {}), "Content-Encoding": "gzip"}
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if binario else "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        # antes de escrever: quem recebeu a resposta já a vê nas estatísticas
+        self.server.estatisticas.registrar(endpoint, status, locais, len(dados))
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        cfg = self.server.config
+        partes = urlsplit(self.path)
+        endpoint = partes.path.rstrip("/").rsplit("/", 1)[-1]
+        if endpoint not in ("archive", "forecast"):
+            return self._responder(endpoint, 404, {"error": True, "reason": "Not Found"})
+
+        atraso = cfg["latencia_ms"] + random.uniform(-1, 1) * cfg["jitter_ms"]
+        if atraso > 0:
+            time.sleep(atraso / 1000)
+
+        sorteio = self.server.sortear()
+        if sorteio < cfg["taxa_429"]:
+            return self._responder(endpoint, 429,
+                                   {"error": True, "reason": "Too many concurrent requests"},
+                                   cabecalhos={"Retry-After": str(cfg["retry_after"])})
+        if sorteio < cfg["taxa_429"] + cfg["taxa_erro"]:
+            return self._responder(endpoint, random.choice((500, 502, 503)),
+                                   {"error": True, "reason": "Simulated failure"})
+
+        try:
+            corpo, locais = self._gerar(endpoint, parse_qs(partes.query))
+        except ValueError as e:
+            return self._responder(endpoint, 400, {"error": True, "reason": str(e)})
+        self._responder(endpoint, 200, corpo, locais)
+
+    def _gerar(self, endpoint: str, qs: dict):
+        def param(nome, padrao=None):
+            return qs[nome][0] if nome in qs else padrao
+
+        lats = [float(v) for v in param("latitude", "").split(",") if v]
+        lons = [float(v) for v in param("longitude", "").split(",") if v]
+        if not lats or len(lats) != len(lons):
+            raise ValueError("Parameter 'latitude' and 'longitude' must have the same number of elements")
+
+        # a API aceita daily e hourly juntos: a resposta traz os dois blocos
+        blocos = {
+            chave: [v for v in param(chave, "").split(",") if v]
+            for chave in ("daily", "hourly") if param(chave)
+        }
+        if not any(blocos.values()):
+            raise ValueError("Parameter 'hourly' or 'daily' is required")
+
+        hoje = date.today()
+        horas = None
+        if endpoint == "forecast" and param("start_hour"):
+            # forecast por intervalo de horas (YYYY-MM-DDTHH:MM, inclusive)
+            horas = (param("start_hour"), param("end_hour", param("start_hour")))
+            ini, fim = date.fromisoformat(horas[0][:10]), date.fromisoformat(horas[1][:10])
+            if ini < hoje - timedelta(days=92) or ini > fim:
+                raise ValueError(f"Parameter 'start_hour' is out of allowed range from "
+                                 f"{hoje - timedelta(days=92)} to {hoje + timedelta(days=15)}")
+        elif endpoint == "archive":
+            try:
+                ini = date.fromisoformat(param("start_date"))
+                fim = date.fromisoformat(param("end_date"))
+            except (TypeError, ValueError):
+                raise ValueError("Parameter 'start_date' and 'end_date' are required (YYYY-MM-DD)")
+            limite = hoje - timedelta(days=self.server.config["atraso_archive_dias"])
+            if fim > limite or ini > fim:
+                raise ValueError(f"Parameter 'end_date' is out of allowed range from 1940-01-01 to {limite}")
+        elif param("start_date"):
+            # o forecast também aceita um período explícito (até 92 dias atrás)
+            ini = date.fromisoformat(param("start_date"))
+            fim = date.fromisoformat(param("end_date", param("start_date")))
+            if ini < hoje - timedelta(days=92) or ini > fim:
+                raise ValueError(f"Parameter 'start_date' is out of allowed range from "
+                                 f"{hoje - timedelta(days=92)} to {hoje + timedelta(days=15)}")
+        else:
+            ini = hoje - timedelta(days=int(param("past_days", 0)))
+            fim = hoje + timedelta(days=int(param("forecast_days", DIAS_FORECAST)) - 1)
+
+        dias = [ini + timedelta(days=i) for i in range((fim - ini).days + 1)]
+        tz = param("timezone", "GMT")
+        locais = [_local(la, lo, dias, blocos, tz, horas) for la, lo in zip(lats, lons)]
+        if param("format") == "flatbuffers" and flatbuffers is not None:
+            return _flatbuffers(locais, blocos), len(locais)
+        return (locais if len(locais) > 1 else locais[0]), len(locais)
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, endereco, config: dict):
+        super().__init__(endereco, _Handler)
+        self.config = config
+        self.estatisticas = Estatisticas()
+        self._aleatorio = random.Random(config["semente"])
+        self._lock = threading.Lock()
+
+    def sortear(self) -> float:
+        with self._lock:
+            return self._aleatorio.random()
+
+    @property
+    def url_base(self) -> str:
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def variaveis_ambiente(self) -> dict:
+        """Variáveis que fazem src/recupera_dados_api_* usarem este servidor."""
+        return {
+            "OPEN_METEO_ARCHIVE_URL": f"{self.url_base}/v1/archive",
+            "OPEN_METEO_FORECAST_URL": f"{self.url_base}/v1/forecast",
+        }
+
+
+def iniciar_servidor(host: str = "127.0.0.1", porta: int = 0, latencia_ms: float = 0.0,
+                     jitter_ms: float = 0.0, taxa_erro: float = 0.0, taxa_429: float = 0.0,
+                     retry_after: int = 1, atraso_archive_dias: int = ATRASO_ARCHIVE_DIAS,
+                     semente: int = 0) -> ServidorFalso:
+    """Sobe o servidor numa thread daemon (porta=0 → porta livre) e o devolve."""
+    servidor = ServidorFalso((host, porta), {
+        "latencia_ms": latencia_ms,
+        "jitter_ms": jitter_ms,
+        "taxa_erro": taxa_erro,
+        "taxa_429": taxa_429,
+        "retry_after": retry_after,
+        "atraso_archive_dias": atraso_archive_dias,
+        "semente": semente,
+    })
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Servidor local que imita o Open-Meteo (archive + forecast)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--porta", type=int, default=8099)
+    p.add_argument("--latencia-ms", type=float, default=0.0, help="Latência média por requisição")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Variação (±) da latência")
+    p.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500/502/503")
+    p.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429")
+    p.add_argument("--retry-after", type=int, default=1, help="Retry-After (s) enviado nos 429")
+    p.add_argument("--atraso-archive-dias", type=int, default=ATRASO_ARCHIVE_DIAS,
+                   help="Dias recentes que o archive ainda não tem (vão para o forecast)")
+    p.add_argument("--semente", type=int, default=0, help="Semente do sorteio de erros")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    servidor = iniciar_servidor(args.host, args.porta, args.latencia_ms, args.jitter_ms,
+                                args.taxa_erro, args.taxa_429, args.retry_after,
+                                args.atraso_archive_dias, args.semente)
+    print(f"🌦️  Open-Meteo falso em {servidor.url_base}")
+    for nome, valor in servidor.variaveis_ambiente().items():
+        print(f"   export {nome}={valor}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n📊", json.dumps(servidor.estatisticas.resumo(), ensure_ascii=False))
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# scripts/gold_local.py
+"""
+Calcula localmente as tabelas gold de gold_metricas_clima.sql
+(src/gold.py) a partir de data/raw/, só para as datas novas ou alteradas.
+
+Uso:
+  python scripts/gold_local.py                          # diário + horário, incremental
+  python scripts/gold_local.py --modo diario --desde 2025-01-01 --ate 2025-01-31
+  python scripts/gold_local.py --forcar                 # refaz todas as datas
+"""
+from __future__ import annotations
+
+# --- garantir que 'src' seja importável ---
+from pathlib import Path
+import sys
+ROOT = Path(__file__).resolve().parents[1]  # raiz do projeto
+sys.path.append(str(ROOT))
+
+import argparse
+import time
+from datetime import date, datetime
+
+from src.escrita import configurar_escrita, COMPRESSAO
+from src.gold import atualizar, pasta_gold
+
+
+def _data(valor: str) -> date:
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Tabelas gold calculadas localmente")
+    p.add_argument("--modo", choices=["diario", "horario", "ambos"], default="ambos")
+    p.add_argument("--desde", type=_data, default=None, help="Só datas >= YYYY-MM-DD")
+    p.add_argument("--ate", type=_data, default=None, help="Só datas <= YYYY-MM-DD")
+    p.add_argument("--forcar", action="store_true",
+                   help="Refaz também as datas já processadas com o diário inalterado")
+    p.add_argument("--compressao", choices=["snappy", "zstd"], default=COMPRESSAO,
+                   help="Compressão dos parquets gold")
+    p.add_argument("--base-dir", type=Path, default=ROOT,
+                   help="Raiz do projeto (data/raw/ e data/gold/)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    configurar_escrita(args.compressao)
+    print(f"🥇 Gold local: {args.base_dir / 'data' / 'raw'} → {pasta_gold(args.base_dir)}")
+
+    for tipo in [t for t in ("diario", "horario") if args.modo in (t, "ambos")]:
+        t0 = time.perf_counter()
+        feitos = atualizar(args.base_dir, tipo, args.desde, args.ate, forcar=args.forcar)
+        if feitos:
+            print(f"✅ ({tipo}) {len(feitos)} data(s) em {time.perf_counter() - t0:.1f}s")
+        else:
+            print(f"⏭️  ({tipo}) Nenhuma data nova ou alterada.")
+
+
+if __name__ == "__main__":
+    main()
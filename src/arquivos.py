@@ -0,0 +1,46 @@
+# src/arquivos.py
+"""
+Gravação atômica dos arquivos pequenos do projeto (JSON de estado,
+manifestos, sidecars, marcadores de shard, textfile do Prometheus, cache
+.npz do cadastro).
+
+O conteúdo vai para `.<nome>.tmp` na mesma pasta e só vira o nome final com
+os.replace, que é atômico no mesmo sistema de arquivos: quem lê (outra
+execução, um shard, o node_exporter, o upload) vê o arquivo antigo ou o
+novo, nunca um pela metade. Se a gravação falha, o temporário é apagado e o
+arquivo anterior fica intacto.
+"""
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def gravacao_atomica(destino: Path, sufixo: str = ".tmp", sincronizar: bool = False):
+    """
+    Devolve o caminho temporário ao lado de `destino`; ao sair do bloco sem
+    erro, ele substitui `destino`. sufixo: termine com a extensão que a
+    biblioteca exige (np.savez acrescenta .npz). sincronizar: fsync antes do
+    rename (arquivos grandes, que não podem sumir numa queda de energia).
+    """
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(f".{destino.name}{sufixo}")
+    try:
+        yield tmp
+        if sincronizar:
+            with open(tmp, "rb+") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp, destino)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def gravar_texto(destino: Path, texto: str) -> Path:
+    """Grava `texto` em `destino` com rename atômico."""
+    with gravacao_atomica(destino) as tmp:
+        tmp.write_text(texto)
+    return destino
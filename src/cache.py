@@ -0,0 +1,154 @@
+# src/cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from dateutil.tz import gettz
+
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[1] / "data" / "cache" / "respostas_api.sqlite"
+TTL_FORECAST = 3 * 3600          # respostas do forecast mudam a cada rodada do modelo
+TTL_ARCHIVE_RECENTE = 12 * 3600  # archive dos últimos dias ainda pode ser revisado
+DIAS_RECENTES = 5
+TAMANHO_MAXIMO = 2 * 1024 ** 3   # 2 GiB; acima disso remove os menos acessados
+CHECAR_TAMANHO_A_CADA = 200      # gravações entre verificações de tamanho
+
+_config = {"caminho": CAMINHO_PADRAO, "habilitado": True, "tamanho_maximo": TAMANHO_MAXIMO}
+_conexao = None
+_lock = threading.Lock()
+_gravacoes = 0
+
+
+def configurar_cache(caminho=None, habilitado: bool = True, tamanho_maximo: int = TAMANHO_MAXIMO):
+    """Troca o arquivo do cache, liga/desliga e define o tamanho máximo em bytes."""
+    global _conexao
+    with _lock:
+        if _conexao is not None:
+            _conexao.close()
+            _conexao = None
+        _config["caminho"] = Path(caminho) if caminho else CAMINHO_PADRAO
+        _config["habilitado"] = habilitado
+        _config["tamanho_maximo"] = tamanho_maximo
+
+
+def cache_habilitado() -> bool:
+    return _config["habilitado"]
+
+
+def _db() -> sqlite3.Connection:
+    # chamado com _lock adquirido
+    global _conexao
+    if _conexao is None:
+        caminho = _config["caminho"]
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(caminho), check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave      TEXT PRIMARY KEY,
+                url        TEXT NOT NULL,
+                conteudo   BLOB NOT NULL,
+                tamanho    INTEGER NOT NULL,
+                criado_em  REAL NOT NULL,
+                expira_em  REAL,
+                acesso_em  REAL NOT NULL
+            )
+            """
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS ix_respostas_acesso ON respostas (acesso_em)")
+        _conexao = con
+    return _conexao
+
+
+def chave(url: str, params: dict | None) -> str:
+    """
+    Chave determinística: endpoint + todos os parâmetros (coordenadas,
+    período, lista de variáveis, timezone...), independente da ordem.
+    """
+    bruto = json.dumps([url, sorted((params or {}).items())], default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def ttl_archive(dia_fim_str: str, tz_name: str = "America/Sao_Paulo") -> float | None:
+    """Archive de datas antigas não expira; o dos últimos dias expira em horas."""
+    hoje = datetime.now(gettz(tz_name)).date()
+    fim = date.fromisoformat(dia_fim_str)
+    if fim >= hoje - timedelta(days=DIAS_RECENTES):
+        return TTL_ARCHIVE_RECENTE
+    return None
+
+
+def ler(url: str, params: dict | None) -> bytes | None:
+    """Devolve o corpo da resposta em cache (ou None se ausente/expirado)."""
+    if not cache_habilitado():
+        return None
+    k = chave(url, params)
+    agora = time.time()
+    with _lock:
+        con = _db()
+        linha = con.execute(
+            "SELECT conteudo, expira_em FROM respostas WHERE chave = ?", (k,)
+        ).fetchone()
+        if linha is None:
+            return None
+        conteudo, expira_em = linha
+        if expira_em is not None and expira_em < agora:
+            con.execute("DELETE FROM respostas WHERE chave = ?", (k,))
+            con.commit()
+            return None
+        con.execute("UPDATE respostas SET acesso_em = ? WHERE chave = ?", (agora, k))
+        con.commit()
+    return zlib.decompress(conteudo)
+
+
+def gravar(url: str, params: dict | None, corpo: bytes, ttl: float | None = None):
+    """Guarda o corpo de uma resposta 200. ttl=None → nunca expira."""
+    global _gravacoes
+    if not cache_habilitado():
+        return
+    agora = time.time()
+    comprimido = zlib.compress(corpo, 6)
+    with _lock:
+        con = _db()
+        con.execute(
+            "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chave(url, params), url, comprimido, len(comprimido), agora,
+             agora + ttl if ttl is not None else None, agora),
+        )
+        con.commit()
+        _gravacoes += 1
+        if _gravacoes % CHECAR_TAMANHO_A_CADA == 0:
+            _aplicar_limite(con)
+
+
+def _aplicar_limite(con: sqlite3.Connection):
+    """Remove expirados e, se ainda acima do limite, os menos acessados (LRU)."""
+    con.execute("DELETE FROM respostas WHERE expira_em IS NOT NULL AND expira_em < ?", (time.time(),))
+    total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+    excesso = total - _config["tamanho_maximo"]
+    if excesso > 0:
+        removidos = 0
+        for k, tamanho in con.execute(
+            "SELECT chave, tamanho FROM respostas ORDER BY acesso_em"
+        ).fetchall():
+            if removidos >= excesso:
+                break
+            con.execute("DELETE FROM respostas WHERE chave = ?", (k,))
+            removidos += tamanho
+    con.commit()
+
+
+def limpar_cache():
+    """Aplica expiração e limite de tamanho imediatamente."""
+    if not cache_habilitado():
+        return
+    with _lock:
+        _aplicar_limite(_db())
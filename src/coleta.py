@@ -0,0 +1,417 @@
+# src/coleta.py
+"""
+Motor de coleta compartilhado por main.py e scripts/backfil_once.py.
+
+Busca um período inteiro por lote de municípios (uma chamada cobre todos os
+dias) e depois reparte o resultado nos arquivos diários
+dados_climaticos_{diarios,horarios}_YYYYMMDD.parquet.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import defaultdict
+from functools import partial
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from tqdm import tqdm
+
+from src.recupera_dados_api_dia import get_clima_diario_por_lote, VARIAVEIS_DIARIAS
+from src.recupera_dados_api_hora import get_clima_horario_por_lote, VARIAVEIS_HORARIAS
+from src.recupera_dados_api_combinado import get_clima_combinado_por_lote
+from src.processa_dados import (
+    AcumuladorColunar, COLUNAS_TRADUZIDAS, ATRIBUTOS_DIARIOS, ATRIBUTOS_HORARIOS,
+    SCHEMA_DIARIO, SCHEMA_HORARIO,
+)
+from src.concorrencia import iterar_em_paralelo
+from src.escrita import EscritorParquetDiario
+from src import arquivos, cota, estado, grade, metricas, municipios, resumo, roteamento
+
+
+TIMEZONE = "America/Sao_Paulo"
+TAMANHO_LOTE = 50      # coordenadas por chamada à API
+JANELA_MAX_DIAS = 31   # dias por chamada (limita o tamanho da resposta)
+MUNICIPIOS_POR_GRUPO = 1000  # municípios acumulados em memória antes de gravar um row group
+COMBINADO = "ambos"    # busca diário + horário na mesma chamada
+
+COLUNAS_HORARIAS = {
+    "time": "data_hora",
+    "temperature_2m": "temperatura_c",
+    "relative_humidity_2m": "umidade_relativa",
+    "precipitation": "precipitacao_mm",
+    "wind_speed_10m": "velocidade_vento_ms",
+}
+
+ORDEM_HORARIA = SCHEMA_HORARIO.names
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+def carregar_cidades(base_dir: Path, lista: str = municipios.LISTA_PADRAO) -> pd.DataFrame:
+    """Municípios de data/lista_municipios/<lista> (cadastro em cache, src.municipios)."""
+    return municipios.carregar(base_dir, lista).para_dataframe()
+
+
+def lotes(df: pd.DataFrame, tamanho: int):
+    """
+    Divide o DataFrame de municípios em blocos com até `tamanho` células da
+    grade (src.grade); municípios da mesma célula ficam no mesmo bloco.
+    """
+    tamanho = max(1, int(tamanho))
+    pos, n_celulas = grade.posicoes(df["latitude"], df["longitude"])
+    for ini in range(0, n_celulas, tamanho):
+        yield df[(pos >= ini) & (pos < ini + tamanho)]
+
+
+def contar_lotes(df: pd.DataFrame, tamanho: int) -> int:
+    """Quantos blocos lotes(df, tamanho) vai gerar."""
+    _, n_celulas = grade.posicoes(df["latitude"], df["longitude"])
+    return -(-n_celulas // max(1, int(tamanho)))
+
+
+def janelas(dia_ini: date, dia_fim: date, max_dias: int = JANELA_MAX_DIAS):
+    """Quebra dia_ini → dia_fim (inclusive) em períodos de até max_dias."""
+    max_dias = max(1, int(max_dias))
+    ini = dia_ini
+    while ini <= dia_fim:
+        fim = min(dia_fim, ini + timedelta(days=max_dias - 1))
+        yield ini, fim
+        ini = fim + timedelta(days=1)
+
+
+def _n_dias(dia_ini: date, dia_fim: date) -> int:
+    return (dia_fim - dia_ini).days + 1
+
+
+def _descricao_periodo(dia_ini: date, dia_fim: date) -> str:
+    if dia_ini == dia_fim:
+        return dia_ini.strftime("%Y-%m-%d")
+    return f"{dia_ini:%Y-%m-%d} → {dia_fim:%Y-%m-%d}"
+
+
+# ============================================================
+# ETAPAS POR LOTE (usadas em série aqui e em paralelo por src.pipeline)
+# ============================================================
+def _blocos_diarios(coords, ini_str, fim_str):
+    erro = roteamento.exigir_archive(ini_str, fim_str, TIMEZONE)
+    if erro is not None:
+        return [erro] * len(coords)  # o archive recusaria o lote e cada chamada individual
+    respostas = get_clima_diario_por_lote(coords, ini_str, dia_fim_str=fim_str)
+    return [r if isinstance(r, Exception) else r["daily"] for r in respostas]
+
+
+def _blocos_horarios(coords, ini_str, fim_str):
+    return get_clima_horario_por_lote(coords, ini_str, TIMEZONE, dia_fim_str=fim_str)
+
+
+# Tudo que muda entre a coleta diária e a horária.
+ESPECIFICACOES = {
+    "diario": {
+        "rotulo": "DIÁRIO",
+        "pasta": "diario",
+        "prefixo": "dados_climaticos_diarios",
+        "renomear": COLUNAS_TRADUZIDAS,
+        "atributos": ATRIBUTOS_DIARIOS,
+        "passos_por_dia": 1,
+        "variaveis": VARIAVEIS_DIARIAS,
+        "schema": SCHEMA_DIARIO,
+        "ordenar_por": ["codigo_ibge", "data"],
+        "buscar": _blocos_diarios,
+        "datas": lambda t: t["data"].cast(pa.string()),
+    },
+    "horario": {
+        "rotulo": "HORÁRIO",
+        "pasta": "horario",
+        "prefixo": "dados_climaticos_horarios",
+        "renomear": COLUNAS_HORARIAS,
+        "atributos": ATRIBUTOS_HORARIOS,
+        "passos_por_dia": 24,
+        "variaveis": VARIAVEIS_HORARIAS,
+        "schema": SCHEMA_HORARIO,
+        "ordenar_por": ["codigo_ibge", "data_hora"],
+        "buscar": _blocos_horarios,
+        "datas": lambda t: pc.strftime(t["data_hora"], format="%Y-%m-%d"),
+    },
+}
+
+
+def buscar_lote(tipo: str, bloco: pd.DataFrame, dia_ini: date, dia_fim: date) -> list:
+    """
+    Etapa de rede: um bloco de municípios → lista de blocos da API (ou
+    Exceptions), alinhada com o bloco. Cada célula da grade é buscada uma vez
+    e a resposta é repetida para os municípios que caem nela. Com a cota
+    esgotada, todo o bloco recebe a CotaEsgotada (fica adiado).
+    """
+    coords = list(zip(bloco["latitude"], bloco["longitude"]))
+    unicas, indice = grade.agrupar(coords)
+    try:
+        respostas = ESPECIFICACOES[tipo]["buscar"](
+            unicas, dia_ini.strftime("%Y-%m-%d"), dia_fim.strftime("%Y-%m-%d")
+        )
+    except cota.CotaEsgotada as e:
+        return [e] * len(bloco)
+    return [respostas[i] for i in indice]
+
+
+def buscar_lote_combinado(bloco: pd.DataFrame, dia_ini: date, dia_fim: date) -> tuple[list, list]:
+    """
+    Como buscar_lote, mas diário e horário na mesma chamada: devolve
+    (respostas diárias, respostas horárias), ambas alinhadas com o bloco.
+    """
+    coords = list(zip(bloco["latitude"], bloco["longitude"]))
+    unicas, indice = grade.agrupar(coords)
+    try:
+        diarios, horarios = get_clima_combinado_por_lote(
+            unicas, dia_ini.strftime("%Y-%m-%d"), TIMEZONE, dia_fim.strftime("%Y-%m-%d")
+        )
+    except cota.CotaEsgotada as e:
+        return [e] * len(bloco), [e] * len(bloco)
+    return [diarios[i] for i in indice], [horarios[i] for i in indice]
+
+
+def estimar_chamadas(tipo: str, df: pd.DataFrame, dia_ini: date, dia_fim: date,
+                     tamanho_lote: int = TAMANHO_LOTE) -> tuple[int, float]:
+    """
+    (requisições, chamadas ponderadas da cota) que a coleta do período vai
+    gastar no archive, sem contar retentativas e fallbacks. tipo=COMBINADO
+    estima a busca conjunta de diário + horário.
+    """
+    if df.empty:
+        return 0, 0.0
+    _, n_celulas = grade.posicoes(df["latitude"], df["longitude"])
+    tipos = list(ESPECIFICACOES) if tipo == COMBINADO else [tipo]
+    n_variaveis = sum(len(ESPECIFICACOES[t]["variaveis"].split(",")) for t in tipos)
+    return (contar_lotes(df, tamanho_lote),
+            cota.custo_chamada(n_celulas, n_variaveis, _n_dias(dia_ini, dia_fim)))
+
+
+def montar_lote(tipo: str, bloco: pd.DataFrame, respostas: list, n_dias: int):
+    """
+    Etapa de parse: respostas de um lote → (tabela Arrow ou None, erros por
+    codigo_ibge).
+    """
+    esp = ESPECIFICACOES[tipo]
+    dados = AcumuladorColunar(esp["renomear"], esp["atributos"],
+                              capacidade=len(bloco) * n_dias * esp["passos_por_dia"])
+    erros = {}
+    adiados = 0
+    for (_, row), resposta in zip(bloco.iterrows(), respostas):
+        motivo = _motivo_adiado(resposta)
+        if motivo is not None:
+            erros[int(row["codigo_ibge"])] = motivo
+            adiados += 1
+            continue
+        try:
+            if isinstance(resposta, Exception):
+                raise resposta
+            dados.adicionar(resposta, row)
+        except Exception as e:
+            erros[int(row["codigo_ibge"])] = str(e)
+            print(f"Falha em {row['nome']} ({row['nome_uf']}): {e}")
+
+    metricas.contar("municipios_total", len(bloco) - len(erros), tipo=tipo, resultado="ok")
+    if len(erros) > adiados:
+        metricas.contar("municipios_total", len(erros) - adiados, tipo=tipo, resultado="falha")
+    if adiados:
+        metricas.contar("municipios_total", adiados, tipo=tipo, resultado="adiado")
+    if not len(dados):
+        return None, erros
+    return dados.para_tabela(esp["schema"]), erros
+
+
+def _motivo_adiado(resposta) -> str | None:
+    """Cota esgotada ou data ainda fora do archive: adia em vez de falhar."""
+    if isinstance(resposta, cota.CotaEsgotada):
+        return estado.MOTIVO_ADIADO
+    if isinstance(resposta, roteamento.ArchiveIndisponivel):
+        return estado.MOTIVO_ARCHIVE
+    return None
+
+
+def pasta_saida(base_dir: Path, tipo: str, shard: tuple | None = None) -> Path:
+    """data/raw/<tipo> para o arquivo canônico; data/shards/<tipo> para shards."""
+    return base_dir / "data" / ("shards" if shard else "raw") / ESPECIFICACOES[tipo]["pasta"]
+
+
+def sufixo_shard(shard: tuple | None) -> str:
+    return f".shard-{shard[0]}-de-{shard[1]}" if shard else ""
+
+
+class GravacaoPeriodo:
+    """
+    Etapa de escrita de um (tipo, período): junta as tabelas dos lotes até
+    `municipios_por_grupo` municípios, grava um row group por dia e, no
+    final, publica os parquets e registra o ledger. Thread-safe.
+
+    shard: (i, n) grava em data/shards/ com um marcador .json por dia (lido
+    pela consolidação em src/shards.py) em vez de registrar o ledger.
+    """
+
+    def __init__(self, base_dir: Path, tipo: str, dia_ini: date, dia_fim: date, codigos,
+                 mesclar: bool = False, municipios_por_grupo: int = MUNICIPIOS_POR_GRUPO,
+                 shard: tuple | None = None):
+        esp = ESPECIFICACOES[tipo]
+        self.tipo = tipo
+        self.dia_ini = dia_ini
+        self.dia_fim = dia_fim
+        self.codigos = list(codigos)
+        self.shard = shard
+        self.municipios_por_grupo = max(1, int(municipios_por_grupo))
+        self.escritor = EscritorParquetDiario(
+            pasta_saida(base_dir, tipo, shard), esp["prefixo"],
+            mesclar_excluindo=set(self.codigos) if mesclar else None,
+            schema=esp["schema"], ordenar_por=esp["ordenar_por"],
+            sufixo=sufixo_shard(shard),
+            # o resumo do dia sai com o arquivo canônico (shards: na consolidação)
+            resumir=None if shard else partial(resumo.ResumoDia, tipo),
+        )
+        self.erros = {}
+        self.ok_por_dia = defaultdict(set)
+        self._tabelas = []
+        self._municipios = 0
+        self._lock = threading.Lock()
+
+    def adicionar(self, tabela: pa.Table | None, erros: dict, n_municipios: int):
+        with self._lock:
+            self.erros.update(erros)
+            if tabela is not None and tabela.num_rows:
+                self._tabelas.append(tabela)
+            self._municipios += n_municipios
+            if self._municipios >= self.municipios_por_grupo:
+                self._descarregar()
+
+    def _descarregar(self):
+        if self._tabelas:
+            tabela = pa.concat_tables(self._tabelas, promote_options="permissive")
+            datas = ESPECIFICACOES[self.tipo]["datas"](tabela)
+            self.escritor.escrever(tabela, datas)
+
+            codigos_linha = tabela["codigo_ibge"].to_numpy()
+            datas_linha = datas.to_numpy(zero_copy_only=False)
+            for dia_str in np.unique(datas_linha):
+                self.ok_por_dia[dia_str].update(codigos_linha[datas_linha == dia_str].tolist())
+        self._tabelas = []
+        self._municipios = 0
+
+    def finalizar(self, ledger=None) -> dict:
+        """Grava o resto, publica os arquivos e registra o ledger. Devolve {date: caminho}."""
+        with self._lock:
+            try:
+                self._descarregar()
+                caminhos = self.escritor.fechar()
+            except BaseException:
+                self.escritor.abortar()
+                raise
+        if self.shard:
+            self._gravar_marcadores(caminhos)
+        else:
+            _registrar_ledger(ledger, self.tipo, self.dia_ini, self.dia_fim, self.codigos,
+                              self.ok_por_dia, self.erros, caminhos)
+
+        rotulo = ESPECIFICACOES[self.tipo]["rotulo"]
+        if not caminhos:
+            print(f"❌ Nenhum dado {rotulo.lower()} coletado.")
+        for saida in caminhos.values():
+            print(f"✅ {rotulo.capitalize()} salvo em: {saida}")
+        adiados = sum(erro in estado.MOTIVOS_ADIADO for erro in self.erros.values())
+        if len(self.erros) > adiados:
+            print(f"Atenção: {len(self.erros) - adiados} município(s) falharam ({rotulo.lower()}).")
+        if adiados:
+            print(f"⏸️  {adiados} município(s) adiados para a próxima execução ({rotulo.lower()}).")
+        return caminhos
+
+    def abortar(self):
+        with self._lock:
+            self.escritor.abortar()
+
+    def _gravar_marcadores(self, caminhos: dict):
+        """Um .json por dia ao lado do parquet do shard: sinaliza que o shard terminou a data."""
+        dia = self.dia_ini
+        while dia <= self.dia_fim:
+            ok = self.ok_por_dia.get(dia.strftime("%Y-%m-%d"), set())
+            marcador = self.escritor.caminho(dia).with_suffix(".json")
+            conteudo = {
+                "tipo": self.tipo,
+                "data": dia.strftime("%Y-%m-%d"),
+                "shard": f"{self.shard[0]}/{self.shard[1]}",
+                "parquet": caminhos[dia].name if dia in caminhos else None,
+                "ok": sorted(int(c) for c in ok),
+                "falhas": {
+                    str(int(c)): self.erros.get(int(c), "sem dados para a data")
+                    for c in self.codigos if int(c) not in ok
+                },
+                "concluido_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            arquivos.gravar_texto(marcador, json.dumps(conteudo, ensure_ascii=False))
+            dia += timedelta(days=1)
+
+
+def _registrar_ledger(ledger, tipo: str, dia_ini: date, dia_fim: date, codigos,
+                      ok_por_dia: dict, erros: dict, caminhos: dict):
+    """Registra no ledger o status de cada município em cada data do período."""
+    if ledger is None:
+        return
+    dia = dia_ini
+    while dia <= dia_fim:
+        ok = ok_por_dia.get(dia.strftime("%Y-%m-%d"), set())
+        falhas = {
+            int(c): erros.get(int(c), "sem dados para a data")
+            for c in codigos if int(c) not in ok
+        }
+        estado.registrar_coleta(ledger, tipo, dia, ok, falhas, caminhos.get(dia))
+        dia += timedelta(days=1)
+
+
+# ============================================================
+# COLETA (SÉRIE)
+# ============================================================
+def coleta_periodo(base_dir: Path, tipo: str, dia_ini: date, dia_fim: date,
+                   tamanho_lote: int = TAMANHO_LOTE, concorrencia: int = 1,
+                   df_cidades: pd.DataFrame | None = None,
+                   ledger=None, mesclar: bool = False,
+                   municipios_por_grupo: int = MUNICIPIOS_POR_GRUPO) -> dict:
+    """
+    Coleta `tipo` ("diario" ou "horario") de dia_ini a dia_fim com uma
+    chamada por lote de municípios e grava um parquet por dia. Devolve
+    {date: caminho}.
+
+    ledger: conexão de src.estado para registrar o status por município.
+    mesclar: preserva o parquet existente do dia (modo retomada).
+    municipios_por_grupo: a cada N municípios grava um row group e libera memória.
+    """
+    if df_cidades is None:
+        df_cidades = carregar_cidades(base_dir)
+
+    print(f"{'📅' if tipo == 'diario' else '⏱️'} ({ESPECIFICACOES[tipo]['rotulo']}) "
+          f"Coletando {_descricao_periodo(dia_ini, dia_fim)} para {len(df_cidades)} municípios")
+
+    grade.imprimir_resumo(df_cidades, tamanho_lote)
+    n_dias = _n_dias(dia_ini, dia_fim)
+    gravacao = GravacaoPeriodo(base_dir, tipo, dia_ini, dia_fim, df_cidades["codigo_ibge"],
+                               mesclar, municipios_por_grupo)
+
+    def _busca(bloco):
+        with metricas.medir("busca"):
+            return buscar_lote(tipo, bloco, dia_ini, dia_fim)
+
+    try:
+        with tqdm(total=df_cidades.shape[0]) as barra:
+            for bloco, respostas in iterar_em_paralelo(_busca, lotes(df_cidades, tamanho_lote),
+                                                       concorrencia):
+                with metricas.medir("montagem"):
+                    tabela, erros = montar_lote(tipo, bloco, respostas, n_dias)
+                with metricas.medir("gravacao"):
+                    gravacao.adicionar(tabela, erros, len(bloco))
+                barra.update(len(bloco))
+    except BaseException:
+        gravacao.abortar()
+        raise
+
+    with metricas.medir("gravacao"):
+        return gravacao.finalizar(ledger)
@@ -0,0 +1,186 @@
+# src/compactacao.py
+"""
+Compactação dos parquets diários em arquivos mensais (scripts/compactar.py).
+
+Cada mês fechado (último dia <= a data limite, em geral o STATE) vira um
+arquivo data/raw/<tipo>/mensal/dados_climaticos_<tipo>_YYYYMM.parquet, com
+um row group por dia, ordenado por codigo_ibge e tempo. Os diários ficam
+onde estão (o ledger e a retomada continuam usando-os): o manifesto
+data/raw/<tipo>/mensal/manifesto.json diz quais diários cada mensal
+substitui, com tamanho e data de modificação de cada um.
+
+Reexecutar é seguro. Um mês cujos diários não mudaram é pulado. Se algum
+diário mudou (retomada, backfill), o mês é refeito. Até lá,
+arquivos_vigentes() já trata o mensal como vencido e devolve os diários.
+Arquivos e manifesto são gravados em temporários e publicados com rename
+atômico.
+"""
+from __future__ import annotations
+
+import json
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from src import arquivos, escrita
+from src.coleta import ESPECIFICACOES, pasta_saida
+from src.escrita import alinhar_schema
+from src.upload_s3 import chave_s3
+
+
+PASTA_MENSAL = "mensal"
+MANIFESTO = "manifesto.json"
+PREFIXO_S3 = "raw/clima_mensal"   # raw/clima_mensal/{tipo}/mes=YYYY-MM/{arquivo}
+VERSAO_MANIFESTO = 1
+
+
+def pasta_mensal(base_dir: Path, tipo: str) -> Path:
+    return pasta_saida(base_dir, tipo) / PASTA_MENSAL
+
+
+def chave_s3_mensal(caminho: Path, tipo: str, mes: str) -> str:
+    return f"{PREFIXO_S3}/{tipo}/mes={mes}/{Path(caminho).name}"
+
+
+def arquivos_diarios(base_dir: Path, tipo: str) -> dict:
+    """{date: caminho} dos parquets diários publicados de `tipo`."""
+    prefixo = ESPECIFICACOES[tipo]["prefixo"]
+    padrao = re.compile(rf"{re.escape(prefixo)}_(\d{{8}})\.parquet")
+    diarios = {}
+    for caminho in pasta_saida(base_dir, tipo).glob(f"{prefixo}_*.parquet"):
+        achado = padrao.fullmatch(caminho.name)
+        if achado:
+            diarios[datetime.strptime(achado.group(1), "%Y%m%d").date()] = caminho
+    return dict(sorted(diarios.items()))
+
+
+def _assinatura(caminho: Path) -> dict:
+    info = caminho.stat()
+    return {"arquivo": caminho.name, "bytes": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def _ultimo_dia(mes: str) -> date:
+    ano, m = (int(p) for p in mes.split("-"))
+    return (date(ano + m // 12, m % 12 + 1, 1)) - timedelta(days=1)
+
+
+def meses_fechados(diarios: dict, ate: date) -> dict:
+    """{"YYYY-MM": [(date, caminho)]} dos meses com último dia <= ate."""
+    meses = {}
+    for dia, caminho in diarios.items():
+        meses.setdefault(dia.strftime("%Y-%m"), []).append((dia, caminho))
+    return {mes: arquivos for mes, arquivos in meses.items() if _ultimo_dia(mes) <= ate}
+
+
+# ============================================================
+# MANIFESTO
+# ============================================================
+def ler_manifesto(base_dir: Path, tipo: str) -> dict:
+    caminho = pasta_mensal(base_dir, tipo) / MANIFESTO
+    if caminho.exists():
+        return json.loads(caminho.read_text())
+    return {"versao": VERSAO_MANIFESTO, "tipo": tipo, "meses": {}}
+
+
+def _gravar_manifesto(base_dir: Path, tipo: str, manifesto: dict) -> Path:
+    manifesto["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return arquivos.gravar_texto(pasta_mensal(base_dir, tipo) / MANIFESTO,
+                                 json.dumps(manifesto, indent=2, ensure_ascii=False))
+
+
+def _mes_vigente(base_dir: Path, tipo: str, mes: str, entrada: dict, diarios: dict) -> bool:
+    """O mensal existe e os diários do mês são exatamente os que ele substitui, sem mudanças."""
+    if not (pasta_mensal(base_dir, tipo) / entrada["arquivo"]).exists():
+        return False
+    atuais = [_assinatura(c) for d, c in diarios.items() if d.strftime("%Y-%m") == mes]
+    return atuais == entrada["substitui"]
+
+
+def arquivos_vigentes(base_dir: Path, tipo: str) -> list[Path]:
+    """
+    Conjunto mínimo de arquivos com todos os dados de `tipo`: os mensais
+    vigentes mais os diários que nenhum deles substitui.
+    """
+    diarios = arquivos_diarios(base_dir, tipo)
+    cobertos, vigentes = set(), []
+    for mes, entrada in sorted(ler_manifesto(base_dir, tipo)["meses"].items()):
+        if _mes_vigente(base_dir, tipo, mes, entrada, diarios):
+            vigentes.append(pasta_mensal(base_dir, tipo) / entrada["arquivo"])
+            cobertos.add(mes)
+    vigentes += [c for d, c in diarios.items() if d.strftime("%Y-%m") not in cobertos]
+    return vigentes
+
+
+# ============================================================
+# COMPACTAÇÃO
+# ============================================================
+def compactar_mes(base_dir: Path, tipo: str, mes: str, diarios: list) -> tuple[Path, int]:
+    """
+    Junta os diários [(date, caminho)] do mês num parquet com um row group
+    por dia (ordenado por codigo_ibge e tempo). Devolve (caminho, linhas).
+    """
+    esp = ESPECIFICACOES[tipo]
+    destino = pasta_mensal(base_dir, tipo) / f"{esp['prefixo']}_{mes.replace('-', '')}.parquet"
+    schema = esp["schema"]
+    ordem = [(c, "ascending") for c in esp["ordenar_por"]]
+    linhas = 0
+    with arquivos.gravacao_atomica(destino, sincronizar=True) as tmp:
+        with pq.ParquetWriter(
+            str(tmp), schema, compression=escrita.COMPRESSAO,
+            sorting_columns=[pq.SortingColumn(schema.names.index(c)) for c in esp["ordenar_por"]],
+        ) as escritor:
+            for _, caminho in sorted(diarios):
+                dia = alinhar_schema(pq.read_table(caminho), schema).sort_by(ordem)
+                if dia.num_rows:
+                    # um row group por dia: o filtro por data lê só o grupo do dia
+                    escritor.write_table(dia, row_group_size=dia.num_rows)
+                    linhas += dia.num_rows
+    return destino, linhas
+
+
+def compactar(base_dir: Path, tipo: str, ate: date, forcar: bool = False, enviar=None) -> list:
+    """
+    Compacta os meses fechados até `ate` que ainda não têm mensal vigente
+    (todos, com forcar). enviar(caminho, chave) sobe o mensal e o manifesto
+    para o S3. Devolve os meses (re)compactados.
+    """
+    diarios = arquivos_diarios(base_dir, tipo)
+    manifesto = ler_manifesto(base_dir, tipo)
+    feitos = []
+    for mes, diarios_mes in meses_fechados(diarios, ate).items():
+        entrada = manifesto["meses"].get(mes)
+        if not forcar and entrada and _mes_vigente(base_dir, tipo, mes, entrada, diarios):
+            if enviar is not None and not entrada.get("s3_key"):
+                entrada["s3_key"] = enviar(pasta_mensal(base_dir, tipo) / entrada["arquivo"],
+                                           chave_s3_mensal(entrada["arquivo"], tipo, mes))
+                _gravar_manifesto(base_dir, tipo, manifesto)
+            continue
+
+        fontes = [_assinatura(c) for _, c in diarios_mes]
+        caminho, linhas = compactar_mes(base_dir, tipo, mes, diarios_mes)
+        if [_assinatura(c) for _, c in diarios_mes] != fontes:
+            # um diário mudou durante a compactação: fica para a próxima execução
+            print(f"⚠️  ({tipo}) {mes}: diários alterados durante a compactação; mês não publicado")
+            continue
+        manifesto["meses"][mes] = {
+            "arquivo": caminho.name,
+            "dias": len(diarios_mes),
+            "linhas": linhas,
+            "bytes": caminho.stat().st_size,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "substitui": fontes,
+            "substitui_s3": [chave_s3(c, tipo, d.strftime("%Y-%m-%d")) for d, c in diarios_mes],
+            "s3_key": None,
+        }
+        _gravar_manifesto(base_dir, tipo, manifesto)
+        print(f"🗜️  ({tipo}) {mes}: {len(diarios_mes)} diários → {caminho.name} ({linhas} linhas)")
+        if enviar is not None:
+            manifesto["meses"][mes]["s3_key"] = enviar(caminho, chave_s3_mensal(caminho, tipo, mes))
+            _gravar_manifesto(base_dir, tipo, manifesto)
+        feitos.append(mes)
+
+    if enviar is not None and manifesto["meses"]:
+        enviar(_gravar_manifesto(base_dir, tipo, manifesto), f"{PREFIXO_S3}/{tipo}/{MANIFESTO}")
+    return feitos
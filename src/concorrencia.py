@@ -0,0 +1,81 @@
+# src/concorrencia.py
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+LIMITE_POR_HOST = 4  # requisições simultâneas permitidas por host
+
+_semaforos = {}
+_lock = threading.Lock()
+
+
+def configurar_limite_por_host(limite: int):
+    """Define quantas requisições podem estar em voo ao mesmo tempo por host."""
+    global LIMITE_POR_HOST
+    with _lock:
+        LIMITE_POR_HOST = max(1, int(limite))
+        _semaforos.clear()
+
+
+def _semaforo(host: str) -> threading.BoundedSemaphore:
+    with _lock:
+        sem = _semaforos.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(LIMITE_POR_HOST)
+            _semaforos[host] = sem
+        return sem
+
+
+@contextmanager
+def slot_host(url: str):
+    """
+    Ocupa uma vaga do host de `url` enquanto a requisição estiver em voo.
+    Bloqueia se o host já estiver no limite.
+    """
+    sem = _semaforo(urlsplit(url).netloc)
+    with sem:
+        yield
+
+
+def iterar_em_paralelo(func, itens, concorrencia: int = 1):
+    """
+    Versão streaming de mapear_em_paralelo: gera (item, resultado) na ordem
+    de `itens`, mantendo no máximo 2 × concorrencia itens em andamento, de
+    modo que a memória não cresce com o total de itens.
+    """
+    if concorrencia <= 1:
+        for item in itens:
+            yield item, func(item)
+        return
+
+    pendentes = deque()
+    limite = 2 * concorrencia
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        for item in itens:
+            pendentes.append((item, pool.submit(func, item)))
+            if len(pendentes) >= limite:
+                anterior, futuro = pendentes.popleft()
+                yield anterior, futuro.result()
+        while pendentes:
+            anterior, futuro = pendentes.popleft()
+            yield anterior, futuro.result()
+
+
+def mapear_em_paralelo(func, itens, concorrencia: int = 1, ao_concluir=None) -> list:
+    """
+    Aplica func a cada item usando até `concorrencia` threads e devolve os
+    resultados na mesma ordem de `itens`. Com concorrencia <= 1 roda em série.
+
+    ao_concluir(item) é chamado (na thread principal) quando cada item termina,
+    útil para atualizar barras de progresso.
+    """
+    resultados = []
+    for item, resultado in iterar_em_paralelo(func, itens, concorrencia):
+        resultados.append(resultado)
+        if ao_concluir:
+            ao_concluir(item)
+    return resultados
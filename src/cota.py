@@ -0,0 +1,225 @@
+# src/cota.py
+"""
+Cota de chamadas da API Open-Meteo: um balde de fichas (token bucket) por
+janela (minuto, hora, dia), compartilhado por todos os fetchers via
+src.transporte.
+
+A Open-Meteo conta chamadas "ponderadas": cada coordenada de um lote é uma
+chamada, multiplicada por max(1, variáveis/10) e por max(1, dias/14). Cada
+balde começa cheio com o limite da janela e é reabastecido continuamente a
+limite/duração fichas por segundo. Uma requisição reserva seu custo em todos
+os baldes e espera o que faltar; se a espera passar de `espera_maxima`, a
+cota está esgotada: levanta CotaEsgotada e o resto da execução é adiado
+(status "adiado" no ledger, retomado na próxima execução).
+
+As fichas são persistidas em state/cota.json, então uma execução nova não
+"esquece" o que a anterior já consumiu na janela do dia.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from src import arquivos, metricas
+
+
+JANELAS = {"minuto": 60, "hora": 3600, "dia": 86400}     # duração de cada janela (s)
+COTA_GRATUITA = {"minuto": 600, "hora": 5000, "dia": 10000}
+ESPERA_MAXIMA = 300.0       # segundos que uma chamada pode esperar antes de ser adiada
+INTERVALO_GRAVACAO = 10.0   # segundos entre gravações do estado dos baldes
+DIAS_FORECAST = 7           # forecast_days padrão da API
+
+_baldes = {}       # janela → {"limite", "fichas", "atualizado"}; vazio = sem controle de cota
+_espera_maxima = ESPERA_MAXIMA
+_caminho = None
+_gravado_em = 0.0
+_esgotada = None   # motivo, depois que a cota esgotou nesta execução
+_lock = threading.Lock()
+
+
+class CotaEsgotada(Exception):
+    """A chamada teria de esperar mais que a espera máxima: fica para a próxima janela."""
+
+
+def configurar_cota(limites: dict | None = None, espera_maxima: float = ESPERA_MAXIMA,
+                    caminho: Path | None = None):
+    """
+    Liga o controle de cota. limites: {janela: chamadas} (None ou 0 desliga a
+    janela; limites=None desliga tudo). caminho: arquivo onde as fichas são
+    persistidas entre execuções.
+    """
+    global _espera_maxima, _caminho, _gravado_em, _esgotada
+    with _lock:
+        _baldes.clear()
+        _espera_maxima = max(0.0, float(espera_maxima))
+        _caminho = Path(caminho) if caminho else None
+        _gravado_em = 0.0
+        _esgotada = None
+        agora = time.time()
+        salvos = _ler_estado(_caminho)
+        for janela, limite in (limites or {}).items():
+            if not limite:
+                continue
+            if janela not in JANELAS:
+                raise ValueError(f"Janela de cota desconhecida: {janela!r}")
+            balde = {"limite": float(limite), "fichas": float(limite), "atualizado": agora}
+            anterior = salvos.get(janela)
+            if anterior and anterior.get("limite") == float(limite):
+                balde["fichas"] = float(anterior["fichas"])
+                balde["atualizado"] = float(anterior["atualizado"])
+            _baldes[janela] = balde
+        _reabastecer(agora)
+
+
+def ativa() -> bool:
+    return bool(_baldes)
+
+
+def _ler_estado(caminho: Path | None) -> dict:
+    if caminho is None or not caminho.exists():
+        return {}
+    try:
+        return json.loads(caminho.read_text()).get("janelas", {})
+    except (ValueError, OSError):
+        return {}  # arquivo corrompido: recomeça com os baldes cheios
+
+
+def _reabastecer(agora: float):
+    for janela, balde in _baldes.items():
+        taxa = balde["limite"] / JANELAS[janela]
+        decorrido = max(0.0, agora - balde["atualizado"])
+        balde["fichas"] = min(balde["limite"], balde["fichas"] + decorrido * taxa)
+        balde["atualizado"] = agora
+
+
+# ============================================================
+# CUSTO DAS CHAMADAS
+# ============================================================
+def custo_chamada(n_locais: int, n_variaveis: int, n_dias: int) -> float:
+    """Chamadas ponderadas que a Open-Meteo conta para uma requisição."""
+    return max(1, n_locais) * max(1.0, n_variaveis / 10) * max(1.0, n_dias / 14)
+
+
+def custo(params: dict | None) -> float:
+    """custo_chamada a partir dos parâmetros de uma requisição da API."""
+    params = params or {}
+    n_locais = len(str(params.get("latitude", "")).split(","))
+    n_variaveis = sum(
+        len(str(params[chave]).split(",")) for chave in ("daily", "hourly", "current") if params.get(chave)
+    )
+    if params.get("start_hour"):
+        ini = date.fromisoformat(params["start_hour"][:10])
+        fim = date.fromisoformat((params.get("end_hour") or params["start_hour"])[:10])
+        n_dias = (fim - ini).days + 1
+    elif params.get("start_date"):
+        ini = date.fromisoformat(params["start_date"])
+        fim = date.fromisoformat(params.get("end_date") or params["start_date"])
+        n_dias = (fim - ini).days + 1
+    else:
+        n_dias = int(params.get("past_days", 0)) + int(params.get("forecast_days", DIAS_FORECAST))
+    return custo_chamada(n_locais, n_variaveis, n_dias)
+
+
+# ============================================================
+# RESERVA
+# ============================================================
+def adquirir(valor: float):
+    """
+    Reserva `valor` fichas em todas as janelas, esperando o reabastecimento
+    se preciso. Levanta CotaEsgotada se a espera passar da espera máxima (e
+    a partir daí em toda chamada desta execução).
+    """
+    global _esgotada
+    if not _baldes:
+        return
+    with _lock:
+        if _esgotada:
+            raise CotaEsgotada(_esgotada)
+        agora = time.time()
+        _reabastecer(agora)
+        espera, janela_critica = 0.0, None
+        for janela, balde in _baldes.items():
+            # uma requisição maior que a janela inteira espera só pela janela cheia
+            falta = min(valor, balde["limite"]) - balde["fichas"]
+            espera_janela = falta * JANELAS[janela] / balde["limite"]
+            if espera_janela > espera:
+                espera, janela_critica = espera_janela, janela
+        if espera > _espera_maxima:
+            _esgotada = (f"cota por {janela_critica} esgotada (libera em ~{espera / 60:.0f} min); "
+                         f"restante adiado para a próxima janela")
+            metricas.contar("cota_esgotada_total", janela=janela_critica)
+            _gravar(agora, forcar=True)
+            print(f"⏸️  {_esgotada}")
+            raise CotaEsgotada(_esgotada)
+        # reserva já (as fichas podem ficar negativas): quem chega depois espera mais
+        for balde in _baldes.values():
+            balde["fichas"] -= min(valor, balde["limite"])
+        _gravar(agora)
+    metricas.contar("cota_chamadas_total", valor)
+    if espera > 0:
+        metricas.contar("cota_espera_segundos_total", espera)
+        time.sleep(espera)
+
+
+def disponivel() -> dict:
+    """{janela: (fichas disponíveis agora, limite)}."""
+    with _lock:
+        _reabastecer(time.time())
+        return {janela: (max(0.0, b["fichas"]), b["limite"]) for janela, b in _baldes.items()}
+
+
+# ============================================================
+# PERSISTÊNCIA
+# ============================================================
+def _gravar(agora: float, forcar: bool = False):
+    global _gravado_em
+    if _caminho is None or (not forcar and agora - _gravado_em < INTERVALO_GRAVACAO):
+        return
+    arquivos.gravar_texto(_caminho, json.dumps({"janelas": _baldes}, indent=2))
+    _gravado_em = agora
+
+
+def salvar():
+    """Grava o estado dos baldes (chamado no fim da execução)."""
+    with _lock:
+        if _baldes:
+            agora = time.time()
+            _reabastecer(agora)
+            _gravar(agora, forcar=True)
+
+
+# ============================================================
+# ORÇAMENTO
+# ============================================================
+def imprimir_orcamento(requisicoes: int, chamadas: float, detalhes: dict | None = None) -> bool:
+    """
+    Mostra o custo estimado da execução contra a cota disponível. Devolve
+    False se a estimativa não cabe na cota (parte do trabalho será adiada).
+    """
+    partes = ", ".join(f"{nome} {valor:,.0f}" for nome, valor in (detalhes or {}).items())
+    print(f"💰 Orçamento: {requisicoes} requisições ≈ {chamadas:,.0f} chamadas de cota"
+          + (f" ({partes})" if partes else "") + " — sem contar retentativas e fallbacks")
+    if not _baldes:
+        print("💰 Controle de cota desligado.")
+        return True
+
+    cabe = True
+    tempo_minimo = 0.0
+    for janela, (fichas, limite) in disponivel().items():
+        print(f"💰 Cota por {janela}: {fichas:,.0f} de {limite:,.0f} disponíveis")
+        falta = chamadas - fichas
+        if falta <= 0:
+            continue
+        if janela == "dia":
+            # esperar a janela do dia passaria da espera máxima: o excedente é adiado
+            cabe = False
+            print(f"⚠️  ~{falta:,.0f} chamadas excedem a cota do dia: "
+                  f"municípios restantes ficam adiados para a próxima janela")
+            continue
+        tempo_minimo = max(tempo_minimo, falta * JANELAS[janela] / limite)
+    if tempo_minimo:
+        print(f"💰 Ritmo da cota: pelo menos {tempo_minimo / 60:.0f} min de execução")
+    return cabe
@@ -0,0 +1,292 @@
+# src/escrita.py
+
+import os
+from bisect import bisect_right
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.resumo import gravar as gravar_resumo
+
+
+COMPRESSAO = "snappy"        # "zstd" gera arquivos menores com custo de CPU maior
+LINHAS_POR_GRUPO = 64 * 1024  # linhas por row group no arquivo final (ordenado)
+LINHAS_POR_LEITURA = 4096     # row group do temporário ordenado: o que a intercalação lê por vez
+
+
+def configurar_escrita(compressao: str | None = None, linhas_por_grupo: int | None = None):
+    """Ajusta compressão e tamanho de row group dos parquets publicados."""
+    global COMPRESSAO, LINHAS_POR_GRUPO
+    if compressao:
+        COMPRESSAO = compressao
+    if linhas_por_grupo:
+        LINHAS_POR_GRUPO = max(1, int(linhas_por_grupo))
+
+
+def alinhar_schema(tabela: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Ajusta `tabela` ao schema do arquivo: mesma ordem de colunas, tipos
+    convertidos e colunas ausentes preenchidas com nulo (colunas extras
+    são descartadas).
+    """
+    colunas = []
+    for campo in schema:
+        if campo.name in tabela.column_names:
+            col = tabela[campo.name]
+            if col.type != campo.type:
+                col = col.cast(campo.type, safe=False)
+            colunas.append(col)
+        else:
+            colunas.append(pa.nulls(tabela.num_rows, type=campo.type))
+    return pa.Table.from_arrays(colunas, schema=schema)
+
+
+def _dicionarios_compactos(tabela: pa.Table) -> pa.Table:
+    """
+    Recodifica as colunas de dicionário só com os valores presentes: depois
+    de concat/sort, cada chunk carrega o dicionário inteiro, que seria
+    repetido em todo row group.
+    """
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_dictionary(campo.type):
+            col = tabela.column(i).cast(campo.type.value_type).combine_chunks()
+            tabela = tabela.set_column(i, campo, pc.dictionary_encode(col).cast(campo.type))
+    return tabela
+
+
+class EscritorParquetDiario:
+    """
+    Escreve uma partição parquet por dia em modo streaming: cada chamada a
+    `escrever` vira um row group no arquivo do dia, então a memória fica
+    limitada ao bloco atual.
+
+    Os arquivos são escritos como `.<nome>.tmp` e só viram o nome final em
+    `fechar()` (fsync + rename atômico). Uma execução interrompida nunca deixa
+    um parquet truncado com o nome que o Auto Loader lê.
+
+    Com `mesclar_excluindo` (conjunto de codigo_ibge), o parquet já existente
+    do dia é copiado para o novo arquivo sem as linhas desses municípios.
+
+    `sufixo` vai antes da extensão (ex.: ".shard-1-de-4").
+
+    Com `schema`, todo row group é gravado nesse schema. Com `ordenar_por`
+    (ex.: ["codigo_ibge", "data"]), cada bloco é ordenado e gravado no
+    temporário como uma sequência de row groups de LINHAS_POR_LEITURA linhas.
+    Ao fechar, as sequências são intercaladas (k-way merge) em row groups de
+    `linhas_por_grupo` linhas, com a compressão final. A intercalação guarda
+    um row group de cada sequência: a memória cresce com o número de blocos
+    do dia, não com o tamanho do dia.
+
+    Com `resumir` (fábrica de src.resumo.ResumoDia), cada row group publicado
+    é somado ao resumo do dia, gravado como sidecar JSON ao lado do parquet
+    (src/resumo.py), depois dele.
+    """
+
+    def __init__(self, pasta: Path, prefixo: str, compressao: str | None = None,
+                 mesclar_excluindo=None, schema: pa.Schema | None = None,
+                 ordenar_por: list | None = None, linhas_por_grupo: int | None = None,
+                 sufixo: str = "", resumir=None):
+        self.pasta = Path(pasta)
+        self.prefixo = prefixo
+        self.sufixo = sufixo
+        self.compressao = compressao or COMPRESSAO
+        self.mesclar_excluindo = mesclar_excluindo
+        self.schema = schema
+        self.ordenar_por = list(ordenar_por or [])
+        self.linhas_por_grupo = linhas_por_grupo or LINHAS_POR_GRUPO
+        self.resumir = resumir
+        self._escritores = {}  # date → (ParquetWriter, tmp, destino)
+        self._sequencias = {}  # date → row groups de cada bloco ordenado, em ordem
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        if tipo_exc is not None:
+            self.abortar()
+        return False
+
+    def caminho(self, dia: date) -> Path:
+        return self.pasta / f"{self.prefixo}_{dia.strftime('%Y%m%d')}{self.sufixo}.parquet"
+
+    def _abrir(self, dia: date, schema: pa.Schema):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        destino = self.caminho(dia)
+        tmp = destino.with_name(f".{destino.name}.tmp")
+        # com ordenação, o temporário é regravado em fechar(): compressão leve aqui
+        escritor = pq.ParquetWriter(str(tmp), schema,
+                                    compression="snappy" if self.ordenar_por else self.compressao)
+        self._escritores[dia] = (escritor, tmp, destino)
+        self._sequencias[dia] = []
+
+        if self.mesclar_excluindo is not None and destino.exists():
+            # um row group do arquivo antigo por vez, cada um vira uma sequência ordenada
+            antigo = pq.ParquetFile(destino)
+            excluir = None
+            if "codigo_ibge" in antigo.schema_arrow.names:
+                excluir = pa.array(sorted(int(c) for c in self.mesclar_excluindo),
+                                   type=antigo.schema_arrow.field("codigo_ibge").type)
+            for i in range(antigo.num_row_groups):
+                grupo = antigo.read_row_group(i)
+                if excluir is not None:
+                    grupo = grupo.filter(pc.invert(pc.is_in(grupo["codigo_ibge"], value_set=excluir)))
+                if grupo.num_rows:
+                    self._gravar_bloco(dia, alinhar_schema(grupo, schema))
+        return escritor
+
+    def _gravar_bloco(self, dia: date, tabela: pa.Table):
+        escritor = self._escritores[dia][0]
+        if not self.ordenar_por:
+            escritor.write_table(tabela)
+            return
+        colunas = [c for c in self.ordenar_por if c in tabela.column_names]
+        if colunas:
+            tabela = tabela.sort_by([(c, "ascending") for c in colunas])
+        escritor.write_table(tabela, row_group_size=LINHAS_POR_LEITURA)
+        self._sequencias[dia].append(-(-tabela.num_rows // LINHAS_POR_LEITURA))
+
+    def escrever(self, tabela: pa.Table, datas: pa.Array):
+        """Grava `tabela` repartida por dia (`datas` = YYYY-MM-DD de cada linha)."""
+        for dia_str in sorted(pc.unique(datas).to_pylist()):
+            dia = date.fromisoformat(dia_str)
+            parte = tabela.filter(pc.equal(datas, dia_str))
+            if dia in self._escritores:
+                escritor = self._escritores[dia][0]
+            else:
+                escritor = self._abrir(dia, self.schema or parte.schema)
+            if parte.schema != escritor.schema:
+                parte = alinhar_schema(parte, escritor.schema)
+            self._gravar_bloco(dia, parte)
+
+    def fechar(self) -> dict:
+        """Fecha os arquivos e publica cada um com rename atômico. Devolve {date: caminho}."""
+        caminhos = {}
+        for dia, (escritor, tmp, destino) in sorted(self._escritores.items()):
+            escritor.close()
+            resumo = self.resumir() if self.resumir is not None else None
+            if self.ordenar_por:
+                self._ordenar(tmp, self._sequencias[dia], resumo)
+            elif resumo is not None:
+                for lote in pq.ParquetFile(tmp).iter_batches(batch_size=self.linhas_por_grupo):
+                    resumo.adicionar(pa.Table.from_batches([lote]))
+            with open(tmp, "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp, destino)
+            if resumo is not None:
+                gravar_resumo(destino, resumo.resultado())
+            caminhos[dia] = destino
+        self._escritores = {}
+        self._sequencias = {}
+        return caminhos
+
+    def _ordenar(self, tmp: Path, sequencias: list, resumo=None):
+        """Regrava o temporário intercalando suas sequências ordenadas, com a compressão final."""
+        arquivo = pq.ParquetFile(tmp)
+        schema = arquivo.schema_arrow
+        colunas = [c for c in self.ordenar_por if c in schema.names]
+        ordenado = tmp.with_name(tmp.name + ".ord")
+        try:
+            with pq.ParquetWriter(
+                str(ordenado), schema, compression=self.compressao,
+                sorting_columns=[pq.SortingColumn(schema.names.index(c)) for c in colunas],
+            ) as escritor:
+                pendente = []
+                n_pendente = 0
+                for parte in _intercalar(arquivo, sequencias, colunas):
+                    pendente.append(parte)
+                    n_pendente += parte.num_rows
+                    if n_pendente < self.linhas_por_grupo:
+                        continue
+                    tabela = pa.concat_tables(pendente)
+                    ini = 0
+                    while tabela.num_rows - ini >= self.linhas_por_grupo:
+                        self._gravar_grupo(escritor, tabela.slice(ini, self.linhas_por_grupo), resumo)
+                        ini += self.linhas_por_grupo
+                    pendente = [tabela.slice(ini)]
+                    n_pendente = tabela.num_rows - ini
+                if n_pendente:
+                    self._gravar_grupo(escritor, pa.concat_tables(pendente), resumo)
+            os.replace(ordenado, tmp)
+        finally:
+            if ordenado.exists():
+                ordenado.unlink()
+
+    def _gravar_grupo(self, escritor, tabela: pa.Table, resumo):
+        grupo = _dicionarios_compactos(tabela)
+        escritor.write_table(grupo, row_group_size=self.linhas_por_grupo)
+        if resumo is not None:
+            resumo.adicionar(grupo)
+
+    def abortar(self):
+        """Descarta os temporários; os arquivos finais existentes ficam intactos."""
+        for escritor, tmp, _ in self._escritores.values():
+            try:
+                escritor.close()
+            finally:
+                for resto in (tmp, tmp.with_name(tmp.name + ".ord")):
+                    if resto.exists():
+                        resto.unlink()
+        self._escritores = {}
+        self._sequencias = {}
+
+
+def _chaves(tabela: pa.Table, colunas: list) -> list:
+    """Chave de cada linha como tupla; datas e horas como inteiros (comparação mais barata)."""
+    valores = []
+    for c in colunas:
+        col = tabela[c]
+        if pa.types.is_timestamp(col.type) or pa.types.is_date64(col.type):
+            col = col.cast(pa.int64())
+        elif pa.types.is_date32(col.type):
+            col = col.cast(pa.int32())
+        valores.append(col.to_numpy().tolist())
+    return list(zip(*valores))
+
+
+def _intercalar(arquivo: pq.ParquetFile, sequencias: list, colunas: list):
+    """
+    K-way merge das sequências de row groups do temporário (cada sequência
+    já ordenada por `colunas`): gera tabelas ordenadas, em ordem, com um row
+    group de cada sequência em memória.
+
+    A cada passo, a menor das últimas chaves em memória é um limite seguro:
+    o que ainda não foi lido de cada sequência vem depois dela. Tudo até o
+    limite é ordenado e sai; a sequência que definiu o limite lê o próximo
+    row group.
+    """
+    if not colunas:
+        for i in range(arquivo.num_row_groups):
+            yield arquivo.read_row_group(i)
+        return
+    leitores, inicio = {}, 0
+    for i, n in enumerate(sequencias):
+        leitores[i] = iter(range(inicio, inicio + n))
+        inicio += n
+    atuais = {}  # sequência → [row group em memória, chaves das linhas, posição]
+
+    def _proximo(i):
+        for grupo in leitores[i]:
+            tabela = arquivo.read_row_group(grupo)
+            if tabela.num_rows:
+                atuais[i] = [tabela, _chaves(tabela, colunas), 0]
+                return
+        del atuais[i]
+
+    for i in leitores:
+        _proximo(i)
+    while atuais:
+        limite = min(chaves[-1] for _, chaves, _ in atuais.values())
+        partes = []
+        for i, (tabela, chaves, pos) in list(atuais.items()):
+            if chaves[pos] > limite:
+                continue
+            fim = bisect_right(chaves, limite, pos)
+            partes.append(tabela.slice(pos, fim - pos))
+            if fim == len(chaves):
+                _proximo(i)
+            else:
+                atuais[i][2] = fim
+        yield pa.concat_tables(partes).sort_by([(c, "ascending") for c in colunas])
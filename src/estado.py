@@ -0,0 +1,214 @@
+# src/estado.py
+# Ledger por município: uma linha por (data, tipo, codigo_ibge) com o
+# resultado da coleta, número de tentativas, parquet gerado e chave no S3.
+# A tabela marcas_horarias guarda, por município, a última hora já gravada
+# pelo modo horario-incremental (src/incremental.py).
+
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+
+STATUS_OK = "ok"
+STATUS_FALHA = "falha"
+STATUS_ADIADO = "adiado"   # não buscado agora; a próxima execução tenta de novo
+MOTIVO_ADIADO = "adiado: cota da API esgotada"           # src.cota
+MOTIVO_ARCHIVE = "adiado: archive ainda sem dados da data"  # src.roteamento
+MOTIVOS_ADIADO = (MOTIVO_ADIADO, MOTIVO_ARCHIVE)
+
+_lock = threading.Lock()
+
+
+def caminho_ledger(base_dir: Path) -> Path:
+    return base_dir / "state" / "ledger.sqlite"
+
+
+def conectar(base_dir: Path) -> sqlite3.Connection:
+    caminho = caminho_ledger(base_dir)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(caminho), check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS coletas (
+            data           TEXT    NOT NULL,
+            tipo           TEXT    NOT NULL,
+            codigo_ibge    INTEGER NOT NULL,
+            status         TEXT    NOT NULL,
+            tentativas     INTEGER NOT NULL DEFAULT 0,
+            parquet        TEXT,
+            s3_key         TEXT,
+            erro           TEXT,
+            atualizado_em  TEXT    NOT NULL,
+            PRIMARY KEY (data, tipo, codigo_ibge)
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS ix_coletas_tipo_data ON coletas (tipo, data)")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS marcas_horarias (
+            codigo_ibge    INTEGER PRIMARY KEY,
+            ultima_hora    TEXT    NOT NULL,
+            atualizado_em  TEXT    NOT NULL
+        )
+        """
+    )
+    con.commit()
+    return con
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def registrar_coleta(con: sqlite3.Connection, tipo: str, dia: date, ok, falhas: dict,
+                     parquet: Path | None):
+    """
+    Registra o resultado de uma data: `ok` são os codigo_ibge gravados no
+    parquet e `falhas` mapeia codigo_ibge → mensagem de erro (MOTIVOS_ADIADO
+    viram status "adiado"). A chave S3 é zerada porque o parquet foi
+    (re)escrito e precisa de novo upload.
+    """
+    dia_str = dia.strftime("%Y-%m-%d")
+    agora = _agora()
+    linhas = [(dia_str, tipo, int(c), STATUS_OK, str(parquet) if parquet else None, None, agora)
+              for c in ok]
+    linhas += [(dia_str, tipo, int(c), STATUS_ADIADO if erro in MOTIVOS_ADIADO else STATUS_FALHA,
+                None, str(erro)[:500], agora)
+               for c, erro in falhas.items()]
+    with _lock:
+        con.executemany(
+            """
+            INSERT INTO coletas (data, tipo, codigo_ibge, status, tentativas, parquet, erro, atualizado_em)
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT (data, tipo, codigo_ibge) DO UPDATE SET
+                status        = excluded.status,
+                tentativas    = coletas.tentativas + 1,
+                parquet       = COALESCE(excluded.parquet, coletas.parquet),
+                s3_key        = NULL,
+                erro          = excluded.erro,
+                atualizado_em = excluded.atualizado_em
+            """,
+            linhas,
+        )
+        if parquet:
+            # municípios de execuções anteriores continuam no mesmo arquivo
+            con.execute(
+                "UPDATE coletas SET s3_key = NULL WHERE data = ? AND tipo = ? AND status = ?",
+                (dia_str, tipo, STATUS_OK),
+            )
+        con.commit()
+
+
+def registrar_upload(con: sqlite3.Connection, tipo: str, dia: date, s3_key: str):
+    """Marca todos os municípios OK da data como enviados para `s3_key`."""
+    with _lock:
+        con.execute(
+            "UPDATE coletas SET s3_key = ?, atualizado_em = ? "
+            "WHERE data = ? AND tipo = ? AND status = ?",
+            (s3_key, _agora(), dia.strftime("%Y-%m-%d"), tipo, STATUS_OK),
+        )
+        con.commit()
+
+
+def municipios_pendentes(con: sqlite3.Connection, tipo: str, dia: date, codigos) -> set:
+    """codigo_ibge de `codigos` que ainda não têm coleta OK na data."""
+    with _lock:
+        ok = {
+            c for (c,) in con.execute(
+                "SELECT codigo_ibge FROM coletas WHERE data = ? AND tipo = ? AND status = ?",
+                (dia.strftime("%Y-%m-%d"), tipo, STATUS_OK),
+            )
+        }
+    return {int(c) for c in codigos} - ok
+
+
+def tem_adiados(con: sqlite3.Connection, tipo: str, dia_ini: date, dia_fim: date | None = None) -> bool:
+    """Se algum município ficou adiado (cota esgotada, archive atrasado) entre dia_ini e dia_fim."""
+    return _tem_status(con, tipo, STATUS_ADIADO, dia_ini, dia_fim)
+
+
+def tem_falhas(con: sqlite3.Connection, tipo: str, dia_ini: date, dia_fim: date | None = None) -> bool:
+    """Se algum município falhou entre dia_ini e dia_fim."""
+    return _tem_status(con, tipo, STATUS_FALHA, dia_ini, dia_fim)
+
+
+def _tem_status(con, tipo, status, dia_ini, dia_fim):
+    with _lock:
+        linha = con.execute(
+            "SELECT 1 FROM coletas WHERE tipo = ? AND status = ? AND data BETWEEN ? AND ? LIMIT 1",
+            (tipo, status, dia_ini.strftime("%Y-%m-%d"),
+             (dia_fim or dia_ini).strftime("%Y-%m-%d")),
+        ).fetchone()
+    return linha is not None
+
+
+def primeira_data_adiada(con: sqlite3.Connection, tipos) -> date | None:
+    tipos = list(tipos)
+    with _lock:
+        (valor,) = con.execute(
+            f"SELECT MIN(data) FROM coletas WHERE status = ? AND tipo IN ({','.join('?' * len(tipos))})",
+            (STATUS_ADIADO, *tipos),
+        ).fetchone()
+    return date.fromisoformat(valor) if valor else None
+
+
+def primeira_data(con: sqlite3.Connection, tipo: str) -> date | None:
+    with _lock:
+        (valor,) = con.execute("SELECT MIN(data) FROM coletas WHERE tipo = ?", (tipo,)).fetchone()
+    return date.fromisoformat(valor) if valor else None
+
+
+def lacunas(con: sqlite3.Connection, tipo: str, codigos, dia_ini: date, dia_fim: date) -> dict:
+    """
+    Procura lacunas em todas as datas de dia_ini a dia_fim (não só após o
+    último run): devolve {date: set(codigo_ibge pendentes)} apenas para as
+    datas com algum município faltando ou com falha.
+    """
+    resultado = {}
+    dia = dia_ini
+    while dia <= dia_fim:
+        pendentes = municipios_pendentes(con, tipo, dia, codigos)
+        if pendentes:
+            resultado[dia] = pendentes
+        dia += timedelta(days=1)
+    return resultado
+
+
+def uploads_pendentes(con: sqlite3.Connection, tipo: str) -> dict:
+    """{date: parquet} das datas com municípios OK cujo arquivo não foi enviado."""
+    with _lock:
+        linhas = con.execute(
+            "SELECT data, MAX(parquet) FROM coletas "
+            "WHERE tipo = ? AND status = ? AND s3_key IS NULL AND parquet IS NOT NULL "
+            "GROUP BY data",
+            (tipo, STATUS_OK),
+        ).fetchall()
+    return {date.fromisoformat(d): Path(p) for d, p in linhas}
+
+
+def marcas_horarias(con: sqlite3.Connection, codigos) -> dict:
+    """{codigo_ibge: última hora gravada (YYYY-MM-DDTHH:MM)} dos municípios que já têm marca."""
+    codigos = {int(c) for c in codigos}
+    with _lock:
+        linhas = con.execute("SELECT codigo_ibge, ultima_hora FROM marcas_horarias").fetchall()
+    return {c: h for c, h in linhas if c in codigos}
+
+
+def registrar_marcas_horarias(con: sqlite3.Connection, marcas: dict):
+    """Avança a marca de cada município (nunca recua)."""
+    agora = _agora()
+    with _lock:
+        con.executemany(
+            """
+            INSERT INTO marcas_horarias (codigo_ibge, ultima_hora, atualizado_em)
+            VALUES (?, ?, ?)
+            ON CONFLICT (codigo_ibge) DO UPDATE SET
+                ultima_hora   = MAX(marcas_horarias.ultima_hora, excluded.ultima_hora),
+                atualizado_em = excluded.atualizado_em
+            """,
+            [(int(c), h, agora) for c, h in marcas.items()],
+        )
+        con.commit()
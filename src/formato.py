@@ -0,0 +1,133 @@
+# src/formato.py
+"""
+Formato das respostas do Open-Meteo: JSON (padrão) ou FlatBuffers.
+
+Com format=flatbuffers a API devolve, para cada local, uma mensagem binária
+prefixada pelo tamanho (4 bytes little-endian). Cada variável chega como um
+vetor float32 e o tempo como início/fim/intervalo em epoch. ler() converte
+isso direto em arrays NumPy, no mesmo formato de dict que o JSON gera
+({"daily"/"hourly": {"time": [...], var: valores}}). O AcumuladorColunar copia
+os arrays para os buffers sem passar por listas de floats do Python.
+
+O pacote openmeteo-sdk é opcional. Sem ele, configurar_formato(FLATBUFFERS)
+avisa e continua em JSON. Uma resposta que chega em JSON mesmo pedida em
+binário (erro da API, cache antigo) também é lida como JSON. A sonda de
+src.roteamento sempre usa JSON: é uma coordenada só.
+
+As variáveis vêm na ordem em que foram pedidas. Os nomes saem dos parâmetros
+da própria chamada (daily=..., hourly=...).
+"""
+from __future__ import annotations
+
+import json
+import time
+
+import numpy as np
+
+from src import metricas
+
+try:
+    from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+except ImportError:  # dependência opcional: pip install openmeteo-sdk
+    WeatherApiResponse = None
+
+
+JSON = "json"
+FLATBUFFERS = "flatbuffers"
+FORMATOS = (JSON, FLATBUFFERS)
+FORMATO = JSON
+
+# bloco → (método da mensagem, unidade do texto de tempo igual ao do JSON)
+BLOCOS = {
+    "daily": ("Daily", "D"),     # 2025-01-15
+    "hourly": ("Hourly", "m"),   # 2025-01-15T13:00
+}
+
+
+def configurar_formato(formato: str = JSON) -> str:
+    """Escolhe o formato pedido à API. Devolve o formato efetivo."""
+    global FORMATO
+    if formato not in FORMATOS:
+        raise ValueError(f"formato desconhecido: {formato!r} (use {', '.join(FORMATOS)})")
+    if formato == FLATBUFFERS and WeatherApiResponse is None:
+        print("⚠️  openmeteo-sdk não instalado (pip install openmeteo-sdk); usando JSON.")
+        formato = JSON
+    FORMATO = formato
+    return FORMATO
+
+
+def com_formato(params: dict) -> dict:
+    """Parâmetros da chamada com format=flatbuffers quando o binário está ligado."""
+    if FORMATO == FLATBUFFERS:
+        return {**params, "format": FLATBUFFERS}
+    return params
+
+
+def ler(resp, params: dict):
+    """
+    Corpo da resposta como o JSON da API: um objeto para 1 coordenada, uma
+    lista para N (ver separar_locais). O formato é detectado pelo corpo.
+    """
+    corpo = resp.content
+    inicio = time.perf_counter()
+    if corpo[:1] in (b"{", b"["):
+        formato = JSON
+        payload = json.loads(corpo)
+    else:
+        formato = FLATBUFFERS
+        payload = _decodificar(corpo, params)
+        if len(payload) == 1:
+            payload = payload[0]
+    metricas.observar("decodificacao_segundos", time.perf_counter() - inicio,
+                      limites=metricas.LIMITES_ESTAGIO, formato=formato)
+    metricas.contar("bytes_decodificados_total", len(corpo), formato=formato)
+    return payload
+
+
+def _decodificar(corpo: bytes, params: dict) -> list:
+    if WeatherApiResponse is None:
+        raise RuntimeError("resposta em FlatBuffers, mas o openmeteo-sdk não está instalado")
+    nomes = {chave: [v for v in str(params[chave]).split(",") if v]
+             for chave in BLOCOS if params.get(chave)}
+    tempos = {}  # os locais de uma chamada costumam ter o mesmo eixo de tempo
+    saida, pos = [], 0
+    while pos < len(corpo):
+        tamanho = int.from_bytes(corpo[pos:pos + 4], "little")
+        msg = WeatherApiResponse.GetRootAs(corpo, pos + 4)
+        offset = msg.UtcOffsetSeconds()
+        local = {
+            "latitude": msg.Latitude(),
+            "longitude": msg.Longitude(),
+            "elevation": msg.Elevation(),
+            "utc_offset_seconds": offset,
+        }
+        for chave, variaveis in nomes.items():
+            metodo, unidade = BLOCOS[chave]
+            bloco = getattr(msg, metodo)()
+            if bloco is not None:
+                local[chave] = _bloco(bloco, variaveis, offset, unidade, tempos)
+        saida.append(local)
+        pos += 4 + tamanho
+    return saida
+
+
+def _bloco(bloco, variaveis: list, offset: int, unidade: str, tempos: dict) -> dict:
+    """VariablesWithTime → {"time": [texto local], var: array float32}."""
+    if bloco.VariablesLength() != len(variaveis):
+        raise ValueError(f"FlatBuffers trouxe {bloco.VariablesLength()} variáveis; "
+                         f"pedidas {len(variaveis)}")
+    eixo = (bloco.Time(), bloco.TimeEnd(), bloco.Interval(), offset, unidade)
+    tempo = tempos.get(eixo)
+    if tempo is None:
+        instantes = np.arange(eixo[0], eixo[1], eixo[2], dtype=np.int64) + offset
+        tempo = np.datetime_as_string(instantes.astype("datetime64[s]"), unit=unidade).tolist()
+        tempos[eixo] = tempo
+    saida = {"time": tempo}
+    for i, var in enumerate(variaveis):
+        valores = bloco.Variables(i).ValuesAsNumpy()
+        if isinstance(valores, int):  # variável sem vetor: tudo nulo
+            valores = np.full(len(tempo), np.nan, dtype=np.float32)
+        if len(valores) != len(tempo):
+            raise ValueError(f"FlatBuffers: {var} com {len(valores)} valores para {len(tempo)} instantes")
+        saida[var] = valores
+    return saida
@@ -0,0 +1,403 @@
+# src/gold.py
+"""
+Camada gold calculada localmente (scripts/gold_local.py), sem cluster.
+
+Reproduz databricks/pipeline_dlt/.../gold_metricas_clima.sql a partir dos
+parquets diários de data/raw/. Antes, aplica as mesmas conversões do
+bronze/silver: UF por extenso → sigla, município em maiúsculas, medidas em
+DOUBLE com nulo → 0. As medidas float32 viram DOUBLE arredondado a
+CASAS_MEDIDAS casas, como no silver, então 25.3 continua 25.3 e não
+25.299999237.
+
+    clima_diario_historico   uma linha por município e dia + métricas derivadas
+    clima_extremos           municípios com o maior/menor valor do dia (empates inclusos)
+    clima_tendencias         médias móveis 7d/30d, acumulados e anomalias
+    clima_horario_analitico  séries horárias + hora, período do dia e classificações
+
+Saída: data/gold/<tabela>/ano=YYYY/mes=M/<tabela>_YYYYMMDD.parquet (um por
+dia; clima_tendencias é um por mês, _YYYYMM). O data/gold/estado.json
+guarda o tamanho e a data de modificação do diário de cada data processada.
+Só as datas novas ou alteradas são recalculadas. clima_tendencias é
+refeita a partir do mês mais antigo alterado, porque as janelas e o total
+do mês dependem dos dias vizinhos.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src import arquivos, escrita
+from src.compactacao import arquivos_diarios
+
+
+DIARIO_HISTORICO = "clima_diario_historico"
+EXTREMOS = "clima_extremos"
+TENDENCIAS = "clima_tendencias"
+HORARIO_ANALITICO = "clima_horario_analitico"
+TABELAS = {"diario": [DIARIO_HISTORICO, EXTREMOS, TENDENCIAS], "horario": [HORARIO_ANALITICO]}
+
+ESTADO = "estado.json"
+VERSAO_ESTADO = 1
+MJ_PARA_KWH = 0.2778
+JANELA_CURTA = 7    # ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+JANELA_LONGA = 30   # ROWS BETWEEN 29 PRECEDING AND CURRENT ROW
+
+# de-para do silver (CASE uf WHEN ...); UF fora da lista vira nulo
+SIGLAS_UF = {
+    "Acre": "AC", "Alagoas": "AL", "Amapá": "AP", "Amazonas": "AM", "Bahia": "BA",
+    "Ceará": "CE", "Distrito Federal": "DF", "Espírito Santo": "ES", "Goiás": "GO",
+    "Maranhão": "MA", "Mato Grosso": "MT", "Mato Grosso do Sul": "MS", "Minas Gerais": "MG",
+    "Pará": "PA", "Paraíba": "PB", "Paraná": "PR", "Pernambuco": "PE", "Piauí": "PI",
+    "Rio de Janeiro": "RJ", "Rio Grande do Norte": "RN", "Rio Grande do Sul": "RS",
+    "Rondônia": "RO", "Roraima": "RR", "Santa Catarina": "SC", "São Paulo": "SP",
+    "Sergipe": "SE", "Tocantins": "TO",
+}
+
+# float32 guarda ~7 dígitos: a 4 casas o DOUBLE volta ao decimal da API (até 1000)
+CASAS_MEDIDAS = 4
+
+MEDIDAS_DIARIAS = [
+    "temp_max_c", "temp_min_c", "sensacao_termica_max_c", "sensacao_termica_min_c",
+    "precipitacao_total_mm", "chuva_mm", "neve_mm", "vento_velocidade_max_kmh",
+    "rajadas_vento_max_kmh", "vento_direcao_dominante_graus", "radiacao_solar_mj_m2",
+]
+MEDIDAS_HORARIAS = ["temperatura_c", "umidade_relativa", "precipitacao_mm", "velocidade_vento_ms"]
+
+# tipo_extremo → (coluna, agregação)
+EXTREMOS_POR_DIA = {
+    "temp_max_maior": ("temp_max_c", "max"),
+    "temp_min_menor": ("temp_min_c", "min"),
+    "chuva_maior": ("precipitacao_total_mm", "max"),
+    "vento_maior": ("vento_velocidade_max_kmh", "max"),
+    "rajada_maior": ("rajadas_vento_max_kmh", "max"),
+    "radiacao_maior": ("radiacao_solar_mj_m2", "max"),
+}
+COLUNAS_EXTREMOS = [
+    "data", "codigo_ibge", "municipio", "uf", "latitude", "longitude",
+    "temp_max_c", "temp_min_c", "precipitacao_total_mm", "vento_velocidade_max_kmh",
+    "rajadas_vento_max_kmh", "radiacao_solar_mj_m2", "ano", "mes", "dia", "ingested_at",
+]
+COLUNAS_TENDENCIAS = [
+    "data", "codigo_ibge", "municipio", "uf", "latitude", "longitude",
+    "temp_max_c", "temp_min_c", "precipitacao_total_mm", "chuva_mm", "radiacao_solar_mj_m2",
+    "ano", "mes", "dia", "ingested_at",
+]
+
+
+def pasta_gold(base_dir: Path) -> Path:
+    return base_dir / "data" / "gold"
+
+
+def caminho_tabela(base_dir: Path, tabela: str, dia: date) -> Path:
+    """Arquivo da data (ou do mês, em clima_tendencias) dentro da partição ano=/mes=."""
+    rotulo = dia.strftime("%Y%m") if tabela == TENDENCIAS else dia.strftime("%Y%m%d")
+    return pasta_gold(base_dir) / tabela / f"ano={dia.year}" / f"mes={dia.month}" / f"{tabela}_{rotulo}.parquet"
+
+
+# ============================================================
+# SILVER
+# ============================================================
+def _double(col) -> pa.ChunkedArray:
+    """ROUND(CAST(x AS DOUBLE), 4), como no silver: float32 mantém o valor decimal."""
+    return pc.round(pc.cast(col, pa.float64()), CASAS_MEDIDAS)
+
+
+def _medida(col) -> pa.ChunkedArray:
+    return pc.fill_null(_double(col), 0.0)
+
+
+def _sigla_uf(col) -> pa.Array:
+    nomes = pa.array(list(SIGLAS_UF))
+    return pc.take(pa.array(list(SIGLAS_UF.values())), pc.index_in(col.cast(pa.string()), value_set=nomes))
+
+
+def _ingestao(caminho: Path, n: int) -> pa.Array:
+    """ingested_at: quando o parquet bruto foi gravado (o bronze usa current_timestamp())."""
+    instante = datetime.fromtimestamp(caminho.stat().st_mtime, timezone.utc)
+    return pa.array([instante] * n, type=pa.timestamp("us", tz="UTC"))
+
+
+def _ano_mes_dia(datas) -> dict:
+    return {"ano": pc.year(datas).cast(pa.int32()), "mes": pc.month(datas).cast(pa.int32()),
+            "dia": pc.day(datas).cast(pa.int32())}
+
+
+def silver_diario(bruto: pa.Table, caminho: Path) -> pa.Table:
+    """open_meteo.silver.clima_diario a partir de um parquet de data/raw/diario."""
+    colunas = {
+        "data": bruto["data"].cast(pa.date32()),
+        "codigo_ibge": bruto["codigo_ibge"].cast(pa.int64()),
+        "municipio": pc.utf8_upper(bruto["nome"].cast(pa.string())),
+        "uf": _sigla_uf(bruto["nome_uf"]),
+        "latitude": bruto["latitude"].cast(pa.float64()),
+        "longitude": bruto["longitude"].cast(pa.float64()),
+    }
+    colunas.update({c: _medida(bruto[c]) for c in MEDIDAS_DIARIAS})
+    colunas["codigo_tempo_wmo"] = bruto["codigo_tempo_wmo"].cast(pa.int32())
+    colunas.update(_ano_mes_dia(colunas["data"]))
+    colunas["ingested_at"] = _ingestao(caminho, bruto.num_rows)
+    return pa.table(colunas)
+
+
+def silver_horario(bruto: pa.Table, caminho: Path) -> pa.Table:
+    """open_meteo.silver.clima_horario (sem codigo_ibge, como no SQL)."""
+    data_hora = bruto["data_hora"].cast(pa.timestamp("us"))
+    colunas = {
+        "data_hora": data_hora,
+        "municipio": pc.utf8_upper(bruto["municipio"].cast(pa.string())),
+        "uf": _sigla_uf(bruto["uf"]),
+        "latitude": bruto["latitude"].cast(pa.float64()),
+        "longitude": bruto["longitude"].cast(pa.float64()),
+    }
+    colunas.update({c: _medida(bruto[c]) for c in MEDIDAS_HORARIAS})
+    colunas.update(_ano_mes_dia(data_hora))
+    colunas["ingested_at"] = _ingestao(caminho, bruto.num_rows)
+    return pa.table(colunas)
+
+
+# ============================================================
+# GOLD
+# ============================================================
+def _classificar(condicoes: list, rotulos: list, padrao: str) -> pa.Array:
+    """CASE WHEN ... THEN ... ELSE padrao END: vale a primeira condição verdadeira."""
+    return pa.array(np.select(condicoes, rotulos, default=padrao), type=pa.string())
+
+
+def clima_diario_historico(silver: pa.Table) -> pa.Table:
+    tmax = silver["temp_max_c"].to_numpy()
+    precip = silver["precipitacao_total_mm"].to_numpy()
+    derivadas = {
+        "amplitude_termica_c": pc.subtract(silver["temp_max_c"], silver["temp_min_c"]),
+        "sensacao_termica_media_c": pc.divide(
+            pc.add(silver["sensacao_termica_max_c"], silver["sensacao_termica_min_c"]), 2.0),
+        "teve_chuva": pc.greater(silver["chuva_mm"], 0.0).cast(pa.int32()),
+        "classificacao_chuva": _classificar([precip <= 5, precip <= 20],
+                                            ["baixa", "moderada"], "alta"),
+        # BETWEEN é inclusivo e o primeiro WHEN ganha: 30 é agradável, 35 é quente
+        "classificacao_temperatura": _classificar([tmax < 18, tmax <= 30, tmax <= 35],
+                                                  ["frio", "agradavel", "quente"], "muito_quente"),
+        "radiacao_solar_kwh_m2": pc.multiply(silver["radiacao_solar_mj_m2"], MJ_PARA_KWH),
+    }
+    tabela = silver.select(silver.column_names[:silver.column_names.index("ano")])
+    for nome, col in derivadas.items():
+        tabela = tabela.append_column(nome, col)
+    for nome in ("ano", "mes", "dia", "ingested_at"):
+        tabela = tabela.append_column(nome, silver[nome])
+    return tabela
+
+
+def clima_extremos(silver: pa.Table) -> pa.Table:
+    """Para cada data, todas as linhas que empatam no maior (ou menor) valor de cada variável."""
+    base = silver.select(COLUNAS_EXTREMOS)
+    agregado = base.group_by("data").aggregate([(col, agg) for col, agg in EXTREMOS_POR_DIA.values()])
+    partes = []
+    for tipo, (col, agg) in EXTREMOS_POR_DIA.items():
+        valor = f"{col}_{agg}"
+        unido = base.join(agregado.select(["data", valor]), "data")
+        achados = unido.filter(pc.equal(unido[col], unido[valor]))
+        partes.append(
+            achados.select(COLUNAS_EXTREMOS)
+            .append_column("tipo_extremo", pa.array([tipo] * achados.num_rows, type=pa.string()))
+            .append_column("valor", achados[valor])
+        )
+    return pa.concat_tables(partes)
+
+
+def _soma_movel(valores: np.ndarray, posicao: np.ndarray, linhas: int) -> np.ndarray:
+    """
+    SUM(...) OVER (PARTITION BY codigo ORDER BY data ROWS BETWEEN linhas-1
+    PRECEDING AND CURRENT ROW), com `posicao` = índice da linha no município.
+    Soma da linha mais antiga para a atual, na ordem do Spark.
+    """
+    soma = np.zeros_like(valores)
+    for k in range(linhas - 1, -1, -1):
+        alcanca = np.flatnonzero(posicao >= k)
+        soma[alcanca] += valores[alcanca - k]
+    return soma
+
+
+def clima_tendencias(historico: pa.Table) -> pa.Table:
+    """Médias móveis, acumulados e anomalias sobre clima_diario_historico (todas as linhas dadas)."""
+    base = historico.select(COLUNAS_TENDENCIAS).sort_by([("codigo_ibge", "ascending"), ("data", "ascending")])
+    codigo = base["codigo_ibge"].to_numpy()
+    n = len(codigo)
+    novo_grupo = np.r_[True, codigo[1:] != codigo[:-1]] if n else np.zeros(0, bool)
+    inicio = np.maximum.accumulate(np.where(novo_grupo, np.arange(n), 0))
+    posicao = np.arange(n) - inicio
+
+    temp_media = (base["temp_max_c"].to_numpy() + base["temp_min_c"].to_numpy()) / 2
+    chuva = base["chuva_mm"].to_numpy()
+    radiacao = base["radiacao_solar_mj_m2"].to_numpy()
+    curta = np.minimum(posicao + 1, JANELA_CURTA).astype(np.float64)
+    longa = np.minimum(posicao + 1, JANELA_LONGA).astype(np.float64)
+    media_7d = _soma_movel(temp_media, posicao, JANELA_CURTA) / curta
+    media_30d = _soma_movel(temp_media, posicao, JANELA_LONGA) / longa
+    chuva_30d = _soma_movel(chuva, posicao, JANELA_LONGA)
+
+    # SUM(chuva_mm) OVER (PARTITION BY codigo_ibge, ano, mes): linhas já contíguas pela ordenação
+    mes = base["ano"].to_numpy() * 100 + base["mes"].to_numpy()
+    novo_mes = novo_grupo | np.r_[True, mes[1:] != mes[:-1]] if n else novo_grupo
+    grupo_mes = np.cumsum(novo_mes) - 1
+    chuva_mes = np.add.reduceat(chuva, np.flatnonzero(novo_mes))[grupo_mes] if n else chuva
+
+    tabela = base.append_column("temp_media", pa.array(temp_media))
+    for nome, valores in {
+        "media_movel_7d_temp": media_7d,
+        "media_movel_30d_temp": media_30d,
+        "tendencia_temp": media_7d - media_30d,
+        "chuva_7d": _soma_movel(chuva, posicao, JANELA_CURTA),
+        "chuva_30d": chuva_30d,
+        "chuva_mes_total": chuva_mes,
+        "radiacao_7d": _soma_movel(radiacao, posicao, JANELA_CURTA) / curta,
+        "anomalia_temp": temp_media - media_30d,
+        "anomalia_chuva": chuva - chuva_30d / JANELA_LONGA,
+    }.items():
+        tabela = tabela.append_column(nome, pa.array(valores, type=pa.float64()))
+    return tabela
+
+
+def clima_horario_analitico(silver: pa.Table) -> pa.Table:
+    hora = pc.hour(silver["data_hora"]).cast(pa.int32())
+    h = hora.to_numpy()
+    temp = silver["temperatura_c"].to_numpy()
+    tabela = silver.select(["data_hora"]).append_column("data", silver["data_hora"].cast(pa.date32()))
+    for nome in silver.column_names[1:]:
+        tabela = tabela.append_column(nome, silver[nome])
+    return (
+        tabela.append_column("hora", hora)
+        .append_column("periodo_dia", _classificar(
+            [(h >= 5) & (h <= 11), (h >= 12) & (h <= 17), (h >= 18) & (h <= 23)],
+            ["manha", "tarde", "noite"], "madrugada"))
+        .append_column("teve_chuva", pc.greater(silver["precipitacao_mm"], 0.0).cast(pa.int32()))
+        .append_column("classificacao_temperatura", _classificar(
+            [temp < 15, temp <= 25, temp <= 32], ["frio", "agradavel", "quente"], "muito_quente"))
+    )
+
+
+# ============================================================
+# ESTADO E GRAVAÇÃO
+# ============================================================
+def _assinatura(caminho: Path) -> dict:
+    info = caminho.stat()
+    return {"bytes": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def ler_estado(base_dir: Path) -> dict:
+    caminho = pasta_gold(base_dir) / ESTADO
+    if caminho.exists():
+        return json.loads(caminho.read_text())
+    return {"versao": VERSAO_ESTADO, "diario": {}, "horario": {}, "tendencias_desde": None}
+
+
+def _gravar_estado(base_dir: Path, estado: dict):
+    estado["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    arquivos.gravar_texto(pasta_gold(base_dir) / ESTADO, json.dumps(estado, indent=2, ensure_ascii=False))
+
+
+def _publicar(tabela: pa.Table, destino: Path):
+    with arquivos.gravacao_atomica(destino) as tmp:
+        pq.write_table(tabela, tmp, compression=escrita.COMPRESSAO)
+
+
+def pendentes(base_dir: Path, tipo: str, estado: dict, desde: date | None = None,
+              ate: date | None = None, forcar: bool = False) -> list:
+    """[(date, caminho)] dos diários brutos novos ou alterados desde a última execução."""
+    feitos = estado[tipo]
+    return [
+        (dia, caminho) for dia, caminho in arquivos_diarios(base_dir, tipo).items()
+        if (desde is None or dia >= desde) and (ate is None or dia <= ate)
+        and (forcar or feitos.get(dia.isoformat()) != _assinatura(caminho))
+    ]
+
+
+def ler_tabela(base_dir: Path, tabela: str, desde: date | None = None, ate: date | None = None) -> pa.Table | None:
+    """Junta os arquivos gold locais de `tabela` (filtrando por data); None se não há nenhum."""
+    caminhos = sorted((pasta_gold(base_dir) / tabela).glob(f"ano=*/mes=*/{tabela}_*.parquet"))
+    partes = [pq.read_table(a, partitioning=None) for a in caminhos]
+    if not partes:
+        return None
+    dados = pa.concat_tables(partes)
+    if desde is not None:
+        dados = dados.filter(pc.greater_equal(dados["data"], pa.scalar(desde, pa.date32())))
+    if ate is not None:
+        dados = dados.filter(pc.less_equal(dados["data"], pa.scalar(ate, pa.date32())))
+    return dados
+
+
+def _historico(base_dir: Path, dias: list) -> pa.Table:
+    return pa.concat_tables([pq.read_table(caminho_tabela(base_dir, DIARIO_HISTORICO, d), partitioning=None)
+                            for d in dias])
+
+
+def _atualizar_tendencias(base_dir: Path, estado: dict) -> int:
+    """
+    Refaz clima_tendencias do mês estado["tendencias_desde"] em diante. As
+    datas anteriores entram só como histórico das janelas: lidas de trás
+    para frente até cada município ter JANELA_LONGA - 1 linhas antes do
+    primeiro dia refeito (ou o histórico acabar).
+    """
+    desde = date.fromisoformat(estado["tendencias_desde"])
+    dias = sorted(date.fromisoformat(d) for d in estado["diario"])
+    alvo = [d for d in dias if d >= desde]
+    anteriores = [d for d in dias if d < desde]
+    if not alvo:
+        return 0
+    atual = _historico(base_dir, alvo)
+
+    contexto = []
+    codigos = pc.unique(atual["codigo_ibge"])
+    while anteriores:
+        bloco, anteriores = anteriores[-(JANELA_LONGA - 1):], anteriores[:-(JANELA_LONGA - 1)]
+        contexto.insert(0, _historico(base_dir, bloco))
+        linhas = pa.concat_tables(contexto).select(["codigo_ibge"])
+        linhas = linhas.filter(pc.is_in(linhas["codigo_ibge"], value_set=codigos))
+        contagem = linhas.group_by("codigo_ibge").aggregate([("codigo_ibge", "count")])
+        if len(contagem) == len(codigos) and pc.min(contagem["codigo_ibge_count"]).as_py() >= JANELA_LONGA - 1:
+            break
+
+    tendencias = clima_tendencias(pa.concat_tables(contexto + [atual]))
+    tendencias = tendencias.filter(pc.greater_equal(tendencias["data"], pa.scalar(desde, pa.date32())))
+    meses = tendencias["ano"].to_numpy() * 100 + tendencias["mes"].to_numpy()
+    for mes in np.unique(meses):
+        parte = tendencias.filter(pa.array(meses == mes))
+        _publicar(parte, caminho_tabela(base_dir, TENDENCIAS, date(int(mes) // 100, int(mes) % 100, 1)))
+    return len(np.unique(meses))
+
+
+def atualizar(base_dir: Path, tipo: str, desde: date | None = None, ate: date | None = None,
+              forcar: bool = False) -> list:
+    """
+    Calcula as tabelas gold de `tipo` ("diario" ou "horario") para as datas
+    novas ou alteradas em data/raw/<tipo>/. Devolve as datas processadas.
+    """
+    estado = ler_estado(base_dir)
+    feitos = []
+    for dia, caminho in pendentes(base_dir, tipo, estado, desde, ate, forcar):
+        assinatura = _assinatura(caminho)
+        bruto = pq.read_table(caminho)
+        if tipo == "diario":
+            silver = silver_diario(bruto, caminho)
+            _publicar(clima_diario_historico(silver), caminho_tabela(base_dir, DIARIO_HISTORICO, dia))
+            _publicar(clima_extremos(silver), caminho_tabela(base_dir, EXTREMOS, dia))
+            mes = dia.replace(day=1).isoformat()
+            estado["tendencias_desde"] = min(mes, estado.get("tendencias_desde") or mes)
+        else:
+            silver = silver_horario(bruto, caminho)
+            _publicar(clima_horario_analitico(silver), caminho_tabela(base_dir, HORARIO_ANALITICO, dia))
+        estado[tipo][dia.isoformat()] = assinatura
+        _gravar_estado(base_dir, estado)
+        feitos.append(dia)
+        print(f"🥇 ({tipo}) {dia}: {silver.num_rows} linhas → {', '.join(TABELAS[tipo][:2])}")
+
+    if tipo == "diario" and estado.get("tendencias_desde"):
+        meses = _atualizar_tendencias(base_dir, estado)
+        print(f"🥇 (diario) {TENDENCIAS}: {meses} mês(es) refeitos desde {estado['tendencias_desde'][:7]}")
+        estado["tendencias_desde"] = None
+        _gravar_estado(base_dir, estado)
+    return feitos
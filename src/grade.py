@@ -0,0 +1,110 @@
+# src/grade.py
+"""
+Deduplicação de municípios por célula da grade do modelo.
+
+O archive do Open-Meteo vem de uma reanálise em grade fixa (ERA5-Land,
+0,1°), então municípios vizinhos caem na mesma célula e recebem a mesma
+série. Com a deduplicação ligada (--resolucao-grade > 0), cada célula é
+buscada uma única vez, no ponto da grade (centro da célula), e a resposta é
+repetida para todos os membros. Buscar o ponto da grade, e não a coordenada
+de um dos municípios, deixa a resposta igual para todos os membros e
+independente da ordem do CSV.
+
+Vem desligada: a resposta da célula não passa pela correção de altitude de
+cada município, então a troca de precisão por chamadas fica a critério de
+quem roda.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+RESOLUCAO_GRADE = 0.0  # graus; 0 desliga a deduplicação (0.1 = ERA5-Land)
+CASAS_CENTRO = 6       # casas decimais da coordenada buscada
+
+
+def configurar_grade(resolucao: float):
+    """Define a resolução (em graus) usada para agrupar coordenadas; 0 desliga."""
+    global RESOLUCAO_GRADE
+    RESOLUCAO_GRADE = max(0.0, float(resolucao))
+
+
+def celulas(lat, lon, resolucao: float | None = None) -> np.ndarray:
+    """Identificador inteiro da célula de cada coordenada (ou da própria coordenada, se desligado)."""
+    resolucao = RESOLUCAO_GRADE if resolucao is None else resolucao
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    passo = resolucao if resolucao > 0 else 1e-6
+    i_lat = np.round((lat + 90.0) / passo).astype(np.int64)
+    i_lon = np.round((lon + 180.0) / passo).astype(np.int64)
+    return i_lat * (int(round(360.0 / passo)) + 1) + i_lon
+
+
+def posicoes(lat, lon, resolucao: float | None = None) -> tuple[np.ndarray, int]:
+    """
+    Posição (0..n_celulas-1) da célula de cada coordenada, numerada na ordem
+    da primeira aparição, e o total de células.
+    """
+    ids = celulas(lat, lon, resolucao)
+    if not len(ids):
+        return np.empty(0, dtype=np.int64), 0
+    _, primeira, inversa = np.unique(ids, return_index=True, return_inverse=True)
+    rank = np.empty(len(primeira), dtype=np.int64)
+    rank[np.argsort(primeira)] = np.arange(len(primeira))
+    return rank[inversa], len(primeira)
+
+
+def centros(lat, lon, resolucao: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Ponto da grade (centro da célula) de cada coordenada."""
+    resolucao = RESOLUCAO_GRADE if resolucao is None else resolucao
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    c_lat = np.round((lat + 90.0) / resolucao) * resolucao - 90.0
+    c_lon = np.round((lon + 180.0) / resolucao) * resolucao - 180.0
+    return np.round(c_lat, CASAS_CENTRO), np.round(c_lon, CASAS_CENTRO)
+
+
+def agrupar(coords) -> tuple[list, list]:
+    """
+    coords (lista de (lat, lon)) → (coordenadas a buscar, uma por célula;
+    índice da coordenada buscada para cada item de coords).
+
+    Com a grade ligada, a coordenada buscada é o centro da célula. Desligada,
+    só coordenadas idênticas são agrupadas e a coordenada é a do município.
+    """
+    if not coords:
+        return [], []
+    lat, lon = zip(*coords)
+    pos, n = posicoes(lat, lon)
+    if RESOLUCAO_GRADE > 0:
+        lat, lon = centros(lat, lon)
+    unicas = [None] * n
+    for coord, p in zip(zip(lat, lon), pos):
+        if unicas[p] is None:
+            unicas[p] = (float(coord[0]), float(coord[1]))
+    return unicas, pos.tolist()
+
+
+def resumo(df_cidades: pd.DataFrame, tamanho_lote: int) -> dict:
+    """Quantas coordenadas e chamadas a deduplicação economiza para df_cidades."""
+    tamanho_lote = max(1, int(tamanho_lote))
+    _, n_celulas = posicoes(df_cidades["latitude"], df_cidades["longitude"])
+    n = len(df_cidades)
+    return {
+        "municipios": n,
+        "celulas": n_celulas,
+        "coordenadas_economizadas": n - n_celulas,
+        "chamadas_sem_grade": -(-n // tamanho_lote),
+        "chamadas_com_grade": -(-n_celulas // tamanho_lote),
+    }
+
+
+def imprimir_resumo(df_cidades: pd.DataFrame, tamanho_lote: int) -> dict:
+    r = resumo(df_cidades, tamanho_lote)
+    if RESOLUCAO_GRADE > 0 and r["municipios"]:
+        pct = 100 * r["coordenadas_economizadas"] / r["municipios"]
+        print(f"🧩 Grade {RESOLUCAO_GRADE:g}°: {r['municipios']} municípios em {r['celulas']} células "
+              f"({r['coordenadas_economizadas']} coordenadas a menos, {pct:.1f}%) → "
+              f"{r['chamadas_com_grade']} chamada(s) por período em vez de {r['chamadas_sem_grade']}")
+    return r
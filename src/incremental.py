@@ -0,0 +1,165 @@
+# src/incremental.py
+"""
+Coleta horária incremental (main.py --modo horario-incremental).
+
+Feita para rodar várias vezes ao dia: cada município tem uma marca d'água
+com a última hora já gravada (tabela marcas_horarias do ledger, src.estado).
+Cada execução pede ao forecast só as horas depois da marca até a última
+hora fechada (start_hour/end_hour) e acrescenta um arquivo novo por dia ao
+dataset particionado:
+
+    data/incremental/horario/date=YYYY-MM-DD/dados_climaticos_horarios_YYYYMMDD_<execução>.parquet
+
+Os arquivos nunca são reescritos. A marca só avança depois que o arquivo
+do dia foi publicado (e enviado, com upload): uma falha no meio faz a
+próxima execução pedir de novo as mesmas horas, sem lacunas.
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dateutil.tz import gettz
+from tqdm import tqdm
+
+from src.coleta import ESPECIFICACOES, TIMEZONE, TAMANHO_LOTE, lotes, montar_lote
+from src.concorrencia import iterar_em_paralelo
+from src.escrita import EscritorParquetDiario
+from src.recupera_dados_api_hora import MAX_PAST_DAYS, get_clima_horario_por_horas
+from src import cota, estado, grade, metricas
+
+
+TIPO = "horario_incremental"   # tipo no S3: raw/clima/horario_incremental/date=.../
+FORMATO_HORA = "%Y-%m-%dT%H:%M"
+
+
+def pasta_incremental(base_dir: Path) -> Path:
+    return base_dir / "data" / "incremental" / ESPECIFICACOES["horario"]["pasta"]
+
+
+def ultima_hora_fechada(agora: datetime | None = None) -> datetime:
+    """Início da última hora completa no fuso da coleta (sem tzinfo, como a API devolve)."""
+    agora = agora or datetime.now(gettz(TIMEZONE))
+    return agora.replace(minute=0, second=0, microsecond=0, tzinfo=None) - timedelta(hours=1)
+
+
+def planejar(df_cidades: pd.DataFrame, marcas: dict, ate: datetime) -> list:
+    """
+    [(hora inicial, municípios)] agrupando os municípios pela próxima hora a
+    buscar. Sem marca, começa à meia-noite do dia de `ate` (D-1 para trás é
+    da coleta diária); marcas mais antigas que o forecast guarda são
+    limitadas a MAX_PAST_DAYS.
+    """
+    mais_antiga = datetime.combine(ate.date() - timedelta(days=MAX_PAST_DAYS), datetime.min.time())
+    padrao = datetime.combine(ate.date(), datetime.min.time())
+    inicio = [
+        max(mais_antiga, datetime.strptime(marcas[int(c)], FORMATO_HORA) + timedelta(hours=1))
+        if int(c) in marcas else padrao
+        for c in df_cidades["codigo_ibge"]
+    ]
+    por_inicio = pd.Series(inicio, index=df_cidades.index)
+    return [
+        (hora, df_cidades.loc[grupo.index])
+        for hora, grupo in sorted(por_inicio.groupby(por_inicio), key=lambda g: g[0])
+        if hora <= ate
+    ]
+
+
+def _buscar(bloco: pd.DataFrame, hora_ini: str, hora_fim: str) -> list:
+    coords = list(zip(bloco["latitude"], bloco["longitude"]))
+    unicas, indice = grade.agrupar(coords)
+    try:
+        respostas = get_clima_horario_por_horas(unicas, hora_ini, hora_fim, TIMEZONE)
+    except cota.CotaEsgotada as e:
+        return [e] * len(bloco)
+    return [respostas[i] for i in indice]
+
+
+def _marcas(tabela: pa.Table) -> dict:
+    """{codigo_ibge: última data_hora} das linhas de `tabela`."""
+    agregado = tabela.select(["codigo_ibge", "data_hora"]).group_by("codigo_ibge").aggregate(
+        [("data_hora", "max")]
+    )
+    horas = pc.strftime(agregado["data_hora_max"], format=FORMATO_HORA).to_pylist()
+    return dict(zip(agregado["codigo_ibge"].to_pylist(), horas))
+
+
+def coleta_incremental(base_dir: Path, df_cidades: pd.DataFrame, ledger,
+                       tamanho_lote: int = TAMANHO_LOTE, concorrencia: int = 1,
+                       enviar=None, agora: datetime | None = None) -> dict:
+    """
+    Busca as horas novas de cada município, grava um arquivo por dia no
+    dataset particionado e avança as marcas. enviar(caminho, dia) sobe cada
+    arquivo antes de a marca avançar. Devolve {date: caminho}.
+    """
+    ate = ultima_hora_fechada(agora)
+    marcas = estado.marcas_horarias(ledger, df_cidades["codigo_ibge"])
+    plano = planejar(df_cidades, marcas, ate)
+    if not plano:
+        print(f"⏱️ (HORÁRIO INCREMENTAL) Nenhuma hora nova até {ate:%Y-%m-%d %H:%M}. Nada a fazer.")
+        return {}
+
+    hora_fim = ate.strftime(FORMATO_HORA)
+    tabelas, erros = [], {}
+    for hora_ini, df in plano:
+        n_horas = int((ate - hora_ini).total_seconds() // 3600) + 1
+        print(f"⏱️ (HORÁRIO INCREMENTAL) {hora_ini:%Y-%m-%d %H:%M} → {ate:%Y-%m-%d %H:%M} "
+              f"({n_horas} h) para {len(df)} municípios")
+        inicio = hora_ini.strftime(FORMATO_HORA)
+
+        def _busca(bloco):
+            with metricas.medir("busca"):
+                return _buscar(bloco, inicio, hora_fim)
+
+        with tqdm(total=len(df)) as barra:
+            for bloco, respostas in iterar_em_paralelo(_busca, lotes(df, tamanho_lote), concorrencia):
+                with metricas.medir("montagem"):
+                    tabela, erros_lote = montar_lote("horario", bloco, respostas, -(-n_horas // 24))
+                if tabela is not None:
+                    tabelas.append(tabela)
+                erros.update(erros_lote)
+                barra.update(len(bloco))
+
+    adiados = sum(erro in estado.MOTIVOS_ADIADO for erro in erros.values())
+    if len(erros) > adiados:
+        print(f"Atenção: {len(erros) - adiados} município(s) falharam (horário incremental); "
+              f"a marca deles não avança.")
+    if adiados:
+        print(f"⏸️  {adiados} município(s) adiados para a próxima janela de cota (horário incremental).")
+    if not tabelas:
+        print("❌ Nenhum dado horário incremental coletado.")
+        return {}
+
+    tabela = pa.concat_tables(tabelas, promote_options="permissive")
+    datas = ESPECIFICACOES["horario"]["datas"](tabela)
+    # nome único por execução: um arquivo publicado nunca é sobrescrito
+    carimbo = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    caminhos = {}
+    # um dia por vez, em ordem: a marca de um município nunca passa de um dia não publicado
+    for dia_str in sorted(pc.unique(datas).to_pylist()):
+        dia = date.fromisoformat(dia_str)
+        mascara = pc.equal(datas, dia_str)
+        parte = tabela.filter(mascara)
+        with metricas.medir("gravacao"):
+            escritor = EscritorParquetDiario(
+                pasta_incremental(base_dir) / f"date={dia_str}", ESPECIFICACOES["horario"]["prefixo"],
+                schema=ESPECIFICACOES["horario"]["schema"],
+                ordenar_por=ESPECIFICACOES["horario"]["ordenar_por"], sufixo=f"_{carimbo}",
+            )
+            with escritor:
+                escritor.escrever(parte, datas.filter(mascara))
+                caminho = escritor.fechar()[dia]
+        if enviar is not None:
+            try:
+                enviar(caminho, dia)
+            except BaseException:
+                caminho.unlink()  # não enviado: as horas voltam na próxima execução
+                raise
+        estado.registrar_marcas_horarias(ledger, _marcas(parte))
+        caminhos[dia] = caminho
+        print(f"✅ Horário incremental salvo em: {caminho} ({parte.num_rows} linhas)")
+    return caminhos
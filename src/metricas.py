@@ -0,0 +1,239 @@
+# src/metricas.py
+"""
+Métricas da execução: latência de cada requisição (histograma),
+retentativas e falhas por endpoint, bytes baixados e enviados e duração de
+cada estágio.
+
+Tudo fica em memória (thread-safe). No fim da execução, main.py grava um
+relatório JSON e um arquivo no formato texto do Prometheus (para o textfile
+collector do node_exporter).
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from src import arquivos, perfil
+
+PREFIXO = "open_meteo"
+LIMITES_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)   # segundos
+LIMITES_ESTAGIO = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0)       # segundos
+
+# nome → (tipo Prometheus, descrição)
+DESCRICOES = {
+    "requisicao_segundos": ("histogram", "Latência de cada requisição HTTP à API"),
+    "requisicoes_total": ("counter", "Requisições HTTP por endpoint e status"),
+    "retentativas_total": ("counter", "Novas tentativas por endpoint e motivo"),
+    "falhas_total": ("counter", "Requisições que falharam após todas as tentativas"),
+    "cache_hits_total": ("counter", "Respostas servidas pelo cache local"),
+    "bytes_baixados_total": ("counter", "Bytes recebidos da API (corpo descomprimido)"),
+    "decodificacao_segundos": ("histogram", "Tempo para decodificar cada resposta da API, por formato"),
+    "bytes_decodificados_total": ("counter", "Bytes de resposta decodificados, por formato (JSON ou FlatBuffers)"),
+    "fallback_individual_total": ("counter", "Lotes que caíram para chamadas individuais"),
+    "lotes_falhos_total": ("counter", "Lotes marcados como falha sem chamadas individuais (429/5xx/rede)"),
+    "locais_forecast_total": ("counter", "Locais buscados no forecast por falta de archive"),
+    "sondas_archive_total": ("counter", "Sondas de disponibilidade do archive por resultado"),
+    "cota_chamadas_total": ("counter", "Chamadas ponderadas reservadas na cota da API"),
+    "cota_espera_segundos_total": ("counter", "Tempo esperando reabastecimento da cota"),
+    "cota_esgotada_total": ("counter", "Execuções em que a cota esgotou, por janela"),
+    "municipios_total": ("counter", "Municípios montados por tipo e resultado"),
+    "estagio_segundos": ("histogram", "Duração do trabalho de cada estágio por item"),
+    "estagio_bloqueado_segundos_total": ("counter", "Tempo esperando vaga na fila do estágio seguinte"),
+    "upload_segundos": ("histogram", "Duração de cada upload para o S3"),
+    "uploads_total": ("counter", "Arquivos por resultado do upload"),
+    "bytes_enviados_total": ("counter", "Bytes enviados ao S3"),
+    "execucao_duracao_segundos": ("gauge", "Duração da execução"),
+    "execucao_sucesso": ("gauge", "1 se a última execução terminou sem erro"),
+    "execucao_fim_timestamp_segundos": ("gauge", "Fim da última execução (epoch)"),
+}
+
+_lock = threading.Lock()
+_contadores = {}   # (nome, rotulos) → valor
+_valores = {}      # (nome, rotulos) → valor (gauge)
+_histogramas = {}  # (nome, rotulos) → {"limites", "contagens", "soma", "n", "max"}
+_inicio = [time.time()]
+
+
+def _chave(nome: str, rotulos: dict):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+
+def resetar():
+    """Zera tudo (início de uma nova execução)."""
+    with _lock:
+        _contadores.clear()
+        _valores.clear()
+        _histogramas.clear()
+        _inicio[0] = time.time()
+
+
+def contar(nome: str, valor: float = 1, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def definir(nome: str, valor: float, **rotulos):
+    with _lock:
+        _valores[_chave(nome, rotulos)] = valor
+
+
+def observar(nome: str, valor: float, limites=LIMITES_LATENCIA, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        h = _histogramas.get(chave)
+        if h is None:
+            h = {"limites": tuple(limites), "contagens": [0] * len(limites), "soma": 0.0, "n": 0, "max": 0.0}
+            _histogramas[chave] = h
+        for i, limite in enumerate(h["limites"]):
+            if valor <= limite:
+                h["contagens"][i] += 1
+                break
+        h["soma"] += valor
+        h["n"] += 1
+        h["max"] = max(h["max"], valor)
+
+
+@contextmanager
+def medir(estagio: str):
+    """Mede a duração do bloco como uma observação do estágio (e o perfila, com --profile)."""
+    inicio = time.perf_counter()
+    try:
+        with perfil.estagio(estagio):
+            yield
+    finally:
+        observar("estagio_segundos", time.perf_counter() - inicio, LIMITES_ESTAGIO, estagio=estagio)
+
+
+def registrar_requisicao(endpoint: str, status, segundos: float, n_bytes: int = 0):
+    """Uma tentativa HTTP: status é o código ou o nome da exceção de rede."""
+    observar("requisicao_segundos", segundos, endpoint=endpoint)
+    contar("requisicoes_total", endpoint=endpoint, status=status)
+    if n_bytes:
+        contar("bytes_baixados_total", n_bytes, endpoint=endpoint)
+
+
+# ============================================================
+# SAÍDA
+# ============================================================
+def _quantil(h: dict, q: float) -> float | None:
+    """Estimativa por interpolação linear dentro do bucket (como histogram_quantile)."""
+    if not h["n"]:
+        return None
+    alvo = q * h["n"]
+    acumulado, anterior = 0, 0.0
+    for limite, contagem in zip(h["limites"], h["contagens"]):
+        if contagem and acumulado + contagem >= alvo:
+            return anterior + (limite - anterior) * (alvo - acumulado) / contagem
+        acumulado += contagem
+        anterior = limite
+    return h["max"]  # caiu no bucket +Inf
+
+
+def relatorio() -> dict:
+    """Snapshot das métricas em formato JSON-serializável."""
+    with _lock:
+        contadores = [{"nome": n, "rotulos": dict(r), "valor": v} for (n, r), v in sorted(_contadores.items())]
+        valores = [{"nome": n, "rotulos": dict(r), "valor": v} for (n, r), v in sorted(_valores.items())]
+        histogramas = []
+        for (n, r), h in sorted(_histogramas.items()):
+            histogramas.append({
+                "nome": n,
+                "rotulos": dict(r),
+                "n": h["n"],
+                "soma": round(h["soma"], 6),
+                "media": round(h["soma"] / h["n"], 6) if h["n"] else None,
+                "p50": _quantil(h, 0.5),
+                "p95": _quantil(h, 0.95),
+                "max": round(h["max"], 6),
+                "buckets": {str(l): c for l, c in zip(h["limites"], h["contagens"])},
+            })
+        inicio = _inicio[0]
+    fim = time.time()
+    return {
+        "inicio": datetime.fromtimestamp(inicio).isoformat(timespec="seconds"),
+        "fim": datetime.fromtimestamp(fim).isoformat(timespec="seconds"),
+        "duracao_s": round(fim - inicio, 3),
+        "contadores": contadores,
+        "valores": valores,
+        "histogramas": histogramas,
+    }
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos_prom(rotulos: dict, extra: dict | None = None) -> str:
+    todos = {**rotulos, **(extra or {})}
+    if not todos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in todos.items()) + "}"
+
+
+def prometheus() -> str:
+    """Métricas no formato texto de exposição do Prometheus."""
+    linhas = []
+    rel = relatorio()
+    por_nome = {}
+    for tipo_bloco in ("contadores", "valores", "histogramas"):
+        for m in rel[tipo_bloco]:
+            por_nome.setdefault(m["nome"], []).append(m)
+
+    for nome, metricas in sorted(por_nome.items()):
+        tipo, descricao = DESCRICOES.get(nome, ("untyped", nome))
+        completo = f"{PREFIXO}_{nome}"
+        linhas.append(f"# HELP {completo} {descricao}")
+        linhas.append(f"# TYPE {completo} {tipo}")
+        for m in metricas:
+            if "buckets" not in m:
+                linhas.append(f"{completo}{_rotulos_prom(m['rotulos'])} {m['valor']}")
+                continue
+            acumulado = 0
+            for limite, contagem in m["buckets"].items():
+                acumulado += contagem
+                linhas.append(f"{completo}_bucket{_rotulos_prom(m['rotulos'], {'le': limite})} {acumulado}")
+            linhas.append(f"{completo}_bucket{_rotulos_prom(m['rotulos'], {'le': '+Inf'})} {m['n']}")
+            linhas.append(f"{completo}_sum{_rotulos_prom(m['rotulos'])} {m['soma']}")
+            linhas.append(f"{completo}_count{_rotulos_prom(m['rotulos'])} {m['n']}")
+    return "\n".join(linhas) + "\n"
+
+
+def resumo(rel: dict) -> str:
+    """Uma linha legível com os números principais do relatório."""
+    def _soma(nome):
+        return sum(m["valor"] for m in rel["contadores"] if m["nome"] == nome)
+
+    requisicoes = _soma("requisicoes_total")
+    estagios = {}
+    for h in rel["histogramas"]:
+        if h["nome"] == "estagio_segundos":
+            estagios[h["rotulos"]["estagio"]] = h["soma"]
+    texto = (f"{requisicoes:.0f} requisições ({_soma('retentativas_total'):.0f} retentativas, "
+             f"{_soma('falhas_total'):.0f} falhas, {_soma('cache_hits_total'):.0f} do cache), "
+             f"{_soma('bytes_baixados_total') / 1024 ** 2:.1f} MB baixados, "
+             f"{_soma('bytes_enviados_total') / 1024 ** 2:.1f} MB enviados")
+    if estagios:
+        texto += "; estágios: " + ", ".join(f"{e} {s:.1f}s" for e, s in estagios.items())
+    return texto
+
+
+
+
+def finalizar_execucao(sucesso: bool, caminho_json: Path | None = None,
+                       caminho_prom: Path | None = None) -> dict:
+    """Registra duração/sucesso da execução e grava o relatório JSON e o .prom."""
+    definir("execucao_duracao_segundos", round(time.time() - _inicio[0], 3))
+    definir("execucao_sucesso", 1 if sucesso else 0)
+    definir("execucao_fim_timestamp_segundos", math.floor(time.time()))
+    rel = relatorio()
+    if caminho_json:
+        arquivos.gravar_texto(Path(caminho_json), json.dumps(rel, indent=2, ensure_ascii=False))
+    if caminho_prom:
+        arquivos.gravar_texto(Path(caminho_prom), prometheus())  # o node_exporter nunca lê arquivo pela metade
+    return rel
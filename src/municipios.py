@@ -0,0 +1,256 @@
+# src/municipios.py
+"""
+Cadastro de municípios carregado uma vez por processo.
+
+A lista (data/lista_municipios/lista_mun.csv ou lista_mun_tot.csv, com as
+5.570 cidades) vira arrays NumPy: codigo_ibge, latitude e longitude
+contíguos e nome/UF internados (a UF como índice em uma tupla de 27 nomes).
+Um cache binário .npz em data/cache/municipios/ evita reler o CSV; ele é
+refeito sozinho quando o CSV muda (tamanho ou data de modificação).
+
+Seleções por UF, código IBGE e retângulo (bbox) devolvem um novo cadastro
+sem copiar os nomes. O resto da coleta continua recebendo um DataFrame
+(para_dataframe()).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import arquivos
+
+
+LISTA_PADRAO = "lista_mun.csv"
+LISTA_COMPLETA = "lista_mun_tot.csv"
+COLUNAS = ["codigo_ibge", "nome", "nome_uf", "latitude", "longitude"]
+VERSAO_CACHE = 1
+
+# sigla → código IBGE da UF (os 2 primeiros dígitos do codigo_ibge do município)
+CODIGOS_UF = {
+    "RO": 11, "AC": 12, "AM": 13, "RR": 14, "PA": 15, "AP": 16, "TO": 17,
+    "MA": 21, "PI": 22, "CE": 23, "RN": 24, "PB": 25, "PE": 26, "AL": 27, "SE": 28, "BA": 29,
+    "MG": 31, "ES": 32, "RJ": 33, "SP": 35,
+    "PR": 41, "SC": 42, "RS": 43,
+    "MS": 50, "MT": 51, "GO": 52, "DF": 53,
+}
+
+_carregados = {}   # (caminho, assinatura) → Municipios
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Municipios:
+    """Cadastro em arrays alinhados (uma posição por município)."""
+    codigo_ibge: np.ndarray   # int32
+    latitude: np.ndarray      # float64
+    longitude: np.ndarray     # float64
+    nome: np.ndarray          # object (str internadas)
+    uf: np.ndarray            # int8: posição em `ufs`
+    ufs: tuple                # nomes das UFs
+
+    def __len__(self) -> int:
+        return len(self.codigo_ibge)
+
+    def _recortar(self, mascara: np.ndarray) -> "Municipios":
+        return Municipios(self.codigo_ibge[mascara], self.latitude[mascara], self.longitude[mascara],
+                          self.nome[mascara], self.uf[mascara], self.ufs)
+
+    def por_uf(self, ufs) -> "Municipios":
+        """Municípios das UFs pedidas (sigla, código IBGE da UF ou nome)."""
+        codigos = {codigo_uf(u) for u in ufs}
+        return self._recortar(np.isin(self.codigo_ibge // 100000, list(codigos)))
+
+    def por_codigo(self, codigos) -> "Municipios":
+        """Municípios com os codigo_ibge pedidos (na ordem do cadastro)."""
+        return self._recortar(np.isin(self.codigo_ibge, np.asarray(list(codigos), dtype=np.int64)))
+
+    def por_bbox(self, oeste: float, sul: float, leste: float, norte: float) -> "Municipios":
+        """Municípios dentro do retângulo (graus; bordas inclusas)."""
+        return self._recortar(
+            (self.longitude >= oeste) & (self.longitude <= leste)
+            & (self.latitude >= sul) & (self.latitude <= norte)
+        )
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """DataFrame com as colunas de lista_mun.csv, no formato que src.coleta usa."""
+        return pd.DataFrame({
+            "codigo_ibge": self.codigo_ibge.astype(np.int64),
+            "nome": self.nome,
+            "nome_uf": np.asarray(self.ufs, dtype=object)[self.uf],
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        })
+
+
+# ============================================================
+# UF
+# ============================================================
+def _sem_acento(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)).lower()
+
+
+_NOMES_UF = {}  # nome sem acento → código; preenchido pelos cadastros carregados
+
+
+def codigo_uf(valor) -> int:
+    """"SP", "35" ou "São Paulo" → 35."""
+    texto = str(valor).strip()
+    if texto.upper() in CODIGOS_UF:
+        return CODIGOS_UF[texto.upper()]
+    if texto.isdigit() and int(texto) in CODIGOS_UF.values():
+        return int(texto)
+    if _sem_acento(texto) in _NOMES_UF:
+        return _NOMES_UF[_sem_acento(texto)]
+    raise ValueError(f"UF desconhecida: {valor!r} (use a sigla, ex.: SP)")
+
+
+# ============================================================
+# CARGA
+# ============================================================
+def _assinatura(csv: Path) -> tuple[int, int]:
+    info = csv.stat()
+    return info.st_size, info.st_mtime_ns
+
+
+def _ler_csv(csv: Path) -> Municipios:
+    df = pd.read_csv(csv, sep=";", usecols=COLUNAS)
+    codigos_uf, ufs = pd.factorize(df["nome_uf"])
+    return Municipios(
+        codigo_ibge=df["codigo_ibge"].to_numpy(np.int32),
+        latitude=df["latitude"].to_numpy(np.float64),
+        longitude=df["longitude"].to_numpy(np.float64),
+        nome=np.array([sys.intern(str(n)) for n in df["nome"]], dtype=object),
+        uf=codigos_uf.astype(np.int8),
+        ufs=tuple(sys.intern(str(u)) for u in ufs),
+    )
+
+
+def _ler_cache(caminho: Path, assinatura: tuple[int, int]) -> Municipios | None:
+    try:
+        with np.load(caminho, allow_pickle=False) as z:
+            if int(z["versao"]) != VERSAO_CACHE or tuple(z["assinatura"].tolist()) != assinatura:
+                return None
+            return Municipios(
+                codigo_ibge=z["codigo_ibge"],
+                latitude=z["latitude"],
+                longitude=z["longitude"],
+                nome=np.array([sys.intern(n) for n in z["nome"].tolist()], dtype=object),
+                uf=z["uf"],
+                ufs=tuple(sys.intern(u) for u in z["ufs"].tolist()),
+            )
+    except (OSError, KeyError, ValueError):
+        return None  # cache ausente ou corrompido: relê o CSV
+
+
+def _gravar_cache(caminho: Path, assinatura: tuple[int, int], m: Municipios):
+    with arquivos.gravacao_atomica(caminho, sufixo=".tmp.npz") as tmp:  # np.savez exige .npz
+        np.savez(
+            tmp, versao=VERSAO_CACHE, assinatura=np.asarray(assinatura, dtype=np.int64),
+            codigo_ibge=m.codigo_ibge, latitude=m.latitude, longitude=m.longitude,
+            nome=m.nome.astype(str), uf=m.uf, ufs=np.asarray(m.ufs, dtype=str),
+        )
+
+
+def carregar(base_dir: Path, lista: str = LISTA_PADRAO, usar_cache: bool = True) -> Municipios:
+    """
+    Cadastro de data/lista_municipios/<lista> (nome do arquivo ou caminho).
+    Dentro do processo o resultado é reaproveitado; entre processos, vem do
+    cache .npz enquanto o CSV não mudar.
+    """
+    csv = Path(lista)
+    if csv.name == str(lista):  # só o nome: arquivo da pasta padrão
+        csv = base_dir / "data" / "lista_municipios" / lista
+    if not csv.exists():
+        raise FileNotFoundError(f"Não encontrei lista de municípios: {csv}")
+    assinatura = _assinatura(csv)
+
+    with _lock:
+        chave = (csv.resolve(), assinatura)
+        if chave in _carregados:
+            return _carregados[chave]
+        cache = base_dir / "data" / "cache" / "municipios" / f"{csv.stem}.npz"
+        m = _ler_cache(cache, assinatura) if usar_cache else None
+        if m is None:
+            m = _ler_csv(csv)
+            if usar_cache:
+                _gravar_cache(cache, assinatura, m)
+        for i, nome in enumerate(m.ufs):
+            codigos = m.codigo_ibge[m.uf == i] // 100000
+            if len(codigos):
+                _NOMES_UF[_sem_acento(nome)] = int(codigos[0])
+        _carregados[chave] = m
+        return m
+
+
+# ============================================================
+# SELEÇÃO (CLI)
+# ============================================================
+def interpretar_bbox(texto: str) -> tuple[float, float, float, float]:
+    """"oeste,sul,leste,norte" → tupla de floats (longitudes/latitudes em graus)."""
+    try:
+        oeste, sul, leste, norte = (float(p) for p in texto.split(","))
+    except ValueError:
+        raise ValueError(f"bbox inválida: {texto!r} (use oeste,sul,leste,norte, ex.: -48,-24,-46,-23)")
+    if oeste > leste or sul > norte:
+        raise ValueError(f"bbox inválida: {texto!r} (oeste <= leste e sul <= norte)")
+    return oeste, sul, leste, norte
+
+
+def _lista_separada(texto: str) -> list[str]:
+    return [p.strip() for p in texto.split(",") if p.strip()]
+
+
+def _lista_de_codigos(texto: str) -> list[int]:
+    """"3550308,3304557" → [3550308, 3304557]; código não numérico vira erro do argparse."""
+    codigos = []
+    for p in _lista_separada(texto):
+        try:
+            codigos.append(int(p))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"codigo_ibge inválido: {p!r} (use números, ex.: 3550308,3304557)")
+    return codigos
+
+
+def adicionar_argumentos(p):
+    """Seletores de municípios compartilhados por main.py e scripts/backfil_once.py."""
+    p.add_argument("--lista-municipios", default=LISTA_PADRAO,
+                   help=f"Arquivo em data/lista_municipios/ (ou caminho). "
+                        f"{LISTA_COMPLETA} tem os 5.570 municípios")
+    p.add_argument("--uf", type=_lista_separada, default=None,
+                   help="Só as UFs pedidas, separadas por vírgula (sigla, código ou nome). Ex.: SP,RJ")
+    p.add_argument("--ibge", type=_lista_de_codigos, default=None,
+                   help="Só os codigo_ibge pedidos, separados por vírgula")
+    p.add_argument("--bbox", type=interpretar_bbox, default=None,
+                   help="Só os municípios no retângulo oeste,sul,leste,norte (graus). "
+                        "Ex.: --bbox=-48,-24,-46,-23 (com =, por causa do sinal negativo)")
+
+
+def selecionar(args, base_dir: Path) -> pd.DataFrame:
+    """Carrega o cadastro e aplica --uf/--ibge/--bbox. Devolve o DataFrame de municípios."""
+    m = carregar(base_dir, args.lista_municipios)
+    total = len(m)
+    filtros = []
+    if args.uf:
+        try:
+            m = m.por_uf(args.uf)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        filtros.append(f"UF {','.join(args.uf)}")
+    if args.ibge:
+        m = m.por_codigo(args.ibge)
+        filtros.append(f"{len(args.ibge)} código(s) IBGE")
+    if args.bbox:
+        m = m.por_bbox(*args.bbox)
+        filtros.append("bbox " + ",".join(f"{v:g}" for v in args.bbox))
+    if filtros:
+        print(f"🗺️  Seleção ({'; '.join(filtros)}): {len(m)} de {total} municípios")
+        if not len(m):
+            raise SystemExit("Nenhum município na seleção.")
+    return m.para_dataframe()
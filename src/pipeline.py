@@ -0,0 +1,279 @@
+# src/pipeline.py
+# Coleta em estágios (busca → montagem → gravação → upload) ligados por filas
+# limitadas: cada estágio tem seus próprios workers e, quando o estágio seguinte
+# está lento, a fila enche e o anterior espera (backpressure). Assim o upload
+# de um período acontece enquanto o período seguinte ainda está sendo coletado.
+
+import queue
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from tqdm import tqdm
+
+from src import cota, grade, metricas, perfil
+from src.coleta import (
+    ESPECIFICACOES, COMBINADO, GravacaoPeriodo, buscar_lote, buscar_lote_combinado, montar_lote,
+    lotes, contar_lotes, _n_dias, estimar_chamadas,
+    _descricao_periodo, TAMANHO_LOTE, MUNICIPIOS_POR_GRUPO,
+)
+
+
+TAMANHO_FILA = 8  # itens aguardando entre dois estágios
+
+_FIM = object()
+
+
+class Estagio:
+    """
+    Um estágio do pipeline: `funcao(item)` devolve um iterável com os itens
+    do estágio seguinte (zero, um ou vários).
+    """
+
+    def __init__(self, nome: str, funcao, workers: int = 1):
+        self.nome = nome
+        self.funcao = funcao
+        self.workers = max(1, int(workers))
+
+
+def executar_pipeline(itens, estagios, tamanho_fila: int = TAMANHO_FILA):
+    """
+    Executa os estágios em threads, ligados por filas de até `tamanho_fila`
+    itens. Na primeira exceção o pipeline para de alimentar novos itens,
+    drena as filas e relança o erro.
+    """
+    filas = [queue.Queue(maxsize=tamanho_fila) for _ in range(len(estagios) + 1)]
+    parar = threading.Event()
+    erros = []
+    lock = threading.Lock()
+    ativos = [e.workers for e in estagios]
+
+    def _alimentar():
+        try:
+            for item in itens:
+                if parar.is_set():
+                    break
+                filas[0].put(item)
+        except BaseException as e:
+            erros.append(e)
+            parar.set()
+        finally:
+            filas[0].put(_FIM)
+
+    def _trabalhar(i: int, estagio: Estagio):
+        entrada, saida = filas[i], filas[i + 1]
+        while True:
+            item = entrada.get()
+            if item is _FIM:
+                entrada.put(_FIM)  # libera os outros workers do estágio
+                break
+            if parar.is_set():
+                continue  # só drena
+            try:
+                # mede só o trabalho do estágio; a espera por vaga na fila seguinte
+                # (backpressure) é contada à parte
+                trabalho = bloqueado = 0.0
+                produtos = iter(estagio.funcao(item) or ())
+                while True:
+                    inicio = time.perf_counter()
+                    with perfil.estagio(estagio.nome):
+                        proximo = next(produtos, _FIM)
+                    trabalho += time.perf_counter() - inicio
+                    if proximo is _FIM:
+                        break
+                    inicio = time.perf_counter()
+                    saida.put(proximo)
+                    bloqueado += time.perf_counter() - inicio
+                metricas.observar("estagio_segundos", trabalho, metricas.LIMITES_ESTAGIO,
+                                  estagio=estagio.nome)
+                metricas.contar("estagio_bloqueado_segundos_total", bloqueado, estagio=estagio.nome)
+            except BaseException as e:
+                with lock:
+                    erros.append(e)
+                parar.set()
+        with lock:
+            ativos[i] -= 1
+            ultimo = ativos[i] == 0
+        if ultimo:
+            saida.put(_FIM)
+
+    threads = [threading.Thread(target=_alimentar, name="pipeline-fonte", daemon=True)]
+    for i, estagio in enumerate(estagios):
+        for n in range(estagio.workers):
+            threads.append(threading.Thread(
+                target=_trabalhar, args=(i, estagio), name=f"pipeline-{estagio.nome}-{n}", daemon=True
+            ))
+
+    # consome a saída do último estágio para não travar a fila final
+    for t in threads:
+        t.start()
+    while filas[-1].get() is not _FIM:
+        pass
+    for t in threads:
+        t.join()
+
+    if erros:
+        raise erros[0]
+
+
+def _combinaveis(tarefas) -> set:
+    """
+    (ini, fim, id(df)) dos períodos pedidos para diário e horário com a mesma
+    lista de municípios: esses são buscados numa chamada só.
+    """
+    tipos_por_grupo = {}
+    for tipo, ini, fim, df in tarefas:
+        tipos_por_grupo.setdefault((ini, fim, id(df)), set()).add(tipo)
+    return {grupo for grupo, tipos in tipos_por_grupo.items() if tipos >= set(ESPECIFICACOES)}
+
+
+def _por_busca(tarefas, combinar: bool = True):
+    """
+    Tarefas como serão buscadas: (tipo, ini, fim, df), com tipo=COMBINADO no
+    lugar do par diário + horário de um mesmo período.
+    """
+    combinados = _combinaveis(tarefas) if combinar else set()
+    emitidos = set()
+    for tipo, ini, fim, df in tarefas:
+        grupo = (ini, fim, id(df))
+        if grupo not in combinados:
+            yield tipo, ini, fim, df
+        elif grupo not in emitidos:
+            emitidos.add(grupo)
+            yield COMBINADO, ini, fim, df
+
+
+def estimar_orcamento(tarefas, tamanho_lote: int = TAMANHO_LOTE, combinar: bool = True) -> bool:
+    """
+    Soma requisições e chamadas de cota das tarefas (tipo, dia_ini, dia_fim,
+    df_cidades) e mostra contra a cota disponível. False = não cabe na cota.
+    """
+    requisicoes, por_tipo = 0, {}
+    for tipo, ini, fim, df in _por_busca(list(tarefas), combinar):
+        n, chamadas = estimar_chamadas(tipo, df, ini, fim, tamanho_lote)
+        requisicoes += n
+        por_tipo[tipo] = por_tipo.get(tipo, 0.0) + chamadas
+    return cota.imprimir_orcamento(requisicoes, sum(por_tipo.values()), por_tipo)
+
+
+def coletar_e_enviar(base_dir: Path, tarefas, enviar=None, ledger=None,
+                     tamanho_lote: int = TAMANHO_LOTE, concorrencia: int = 1,
+                     workers_montagem: int = 1, workers_gravacao: int = 1,
+                     workers_upload: int = 1, municipios_por_grupo: int = MUNICIPIOS_POR_GRUPO,
+                     mesclar: bool = False, ao_concluir=None, shard: tuple | None = None,
+                     combinar: bool = True) -> dict:
+    """
+    Roda a coleta como pipeline de estágios.
+
+    tarefas: lista de (tipo, dia_ini, dia_fim, df_cidades), na ordem de
+      prioridade (normalmente por data).
+    enviar(caminho, tipo, dia) → chave S3: estágio de upload; None pula o upload.
+    ao_concluir(tipo, dia, caminho_ou_None): chamado quando a data de um tipo
+      terminou por completo (gravada e, se houver upload, enviada).
+    shard: (i, n) grava parquets de shard em data/shards/ (ver src/shards.py).
+    combinar: diário e horário do mesmo período e da mesma lista de municípios
+      saem de uma única chamada por lote (metade das requisições).
+
+    Devolve {tipo: {date: caminho}} com os parquets gerados.
+    """
+    tarefas = list(tarefas)
+    gravacoes = {}
+    esperados = {}
+    recebidos = {}
+    gerados = {tipo: {} for tipo, *_ in tarefas}
+    lock = threading.Lock()
+
+    for tipo, ini, fim, df in tarefas:
+        chave = (tipo, ini, fim)
+        gravacoes[chave] = GravacaoPeriodo(base_dir, tipo, ini, fim, df["codigo_ibge"],
+                                           mesclar, municipios_por_grupo, shard)
+        esperados[chave] = max(1, contar_lotes(df, tamanho_lote))
+        recebidos[chave] = 0
+
+    # relatório da deduplicação por célula da grade (uma vez por lista de municípios)
+    for df in {id(df): df for *_, df in tarefas}.values():
+        grade.imprimir_resumo(df, tamanho_lote)
+
+    total = sum(len(df) for *_, df in tarefas)
+    barra = tqdm(total=total)
+
+    def _itens():
+        for tipo, ini, fim, df in _por_busca(tarefas, combinar):
+            if tipo == COMBINADO:
+                print(f"📅⏱️ (DIÁRIO + HORÁRIO) "
+                      f"Enfileirando {_descricao_periodo(ini, fim)} para {len(df)} municípios")
+            else:
+                print(f"{'📅' if tipo == 'diario' else '⏱️'} ({ESPECIFICACOES[tipo]['rotulo']}) "
+                      f"Enfileirando {_descricao_periodo(ini, fim)} para {len(df)} municípios")
+            if df.empty:
+                yield (tipo, ini, fim), df.iloc[0:0]
+            for bloco in lotes(df, tamanho_lote):
+                yield (tipo, ini, fim), bloco
+
+    # ---------- estágios ----------
+    def _buscar(item):
+        chave, bloco = item
+        tipo, ini, fim = chave
+        if tipo == COMBINADO:
+            diarios, horarios = buscar_lote_combinado(bloco, ini, fim) if len(bloco) else ([], [])
+            yield ("diario", ini, fim), bloco, diarios
+            yield ("horario", ini, fim), bloco, horarios
+            return
+        respostas = buscar_lote(tipo, bloco, ini, fim) if len(bloco) else []
+        yield chave, bloco, respostas
+
+    def _montar(item):
+        chave, bloco, respostas = item
+        tipo, ini, fim = chave
+        tabela, erros = montar_lote(tipo, bloco, respostas, _n_dias(ini, fim))
+        yield chave, tabela, erros, len(bloco)
+
+    def _gravar(item):
+        chave, tabela, erros, n = item
+        gravacao = gravacoes[chave]
+        gravacao.adicionar(tabela, erros, n)
+        with lock:
+            recebidos[chave] += 1
+            completo = recebidos[chave] == esperados[chave]
+            barra.update(n)
+        if not completo:
+            return
+        tipo, ini, fim = chave
+        caminhos = gravacao.finalizar(ledger)
+        with lock:
+            gerados[tipo].update(caminhos)
+        dia = ini
+        while dia <= fim:
+            caminho = caminhos.get(dia)
+            if caminho is not None and enviar is not None:
+                yield tipo, dia, caminho
+            elif ao_concluir:
+                ao_concluir(tipo, dia, caminho)
+            dia += timedelta(days=1)
+
+    def _enviar(item):
+        tipo, dia, caminho = item
+        enviar(caminho, tipo, dia)
+        if ao_concluir:
+            ao_concluir(tipo, dia, caminho)
+        return ()
+
+    estagios = [
+        Estagio("busca", _buscar, concorrencia),
+        Estagio("montagem", _montar, workers_montagem),
+        Estagio("gravacao", _gravar, workers_gravacao),
+    ]
+    if enviar is not None:
+        estagios.append(Estagio("upload", _enviar, workers_upload))
+
+    try:
+        executar_pipeline(_itens(), estagios)
+    except BaseException:
+        for gravacao in gravacoes.values():
+            gravacao.abortar()
+        raise
+    finally:
+        barra.close()
+
+    return gerados
@@ -1,4 +1,8 @@
+from itertools import groupby
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 # --- Mapeamento para renomear colunas ---
 COLUNAS_TRADUZIDAS = {
@@ -30,3 +34,218 @@ def processar_clima(clima_json, row):
         df_clima[col] = row[col]
 
     return df_clima
+
+
+# ============================================================
+# MONTAGEM COLUNAR
+# ============================================================
+# Variáveis que a API devolve como inteiros (viram int64 anulável).
+VARIAVEIS_INTEIRAS = {"weathercode", "winddirection_10m_dominant", "relative_humidity_2m"}
+
+# Colunas de texto que vêm no bloco (não na linha do município): um valor por
+# bloco ou uma lista por linha, ex.: "fonte" (archive/forecast) do horário.
+VARIAVEIS_TEXTO = {"fonte"}
+
+# Coluna de saída → campo da linha do CSV de municípios.
+ATRIBUTOS_DIARIOS = {
+    "codigo_ibge": "codigo_ibge",
+    "nome": "nome",
+    "nome_uf": "nome_uf",
+    "latitude": "latitude",
+    "longitude": "longitude",
+}
+ATRIBUTOS_HORARIOS = {
+    "codigo_ibge": "codigo_ibge",
+    "municipio": "nome",
+    "uf": "nome_uf",
+    "latitude": "latitude",
+    "longitude": "longitude",
+}
+
+
+# ============================================================
+# SCHEMAS DE SAÍDA
+# ============================================================
+# Medições em float32, códigos em int16, nomes dicionarizados e tempo tipado.
+# data_hora é a hora local da API (America/Sao_Paulo) sem fuso: o Spark lê
+# como TIMESTAMP_NTZ e o CAST para STRING do bronze preserva a hora local.
+TEXTO_DICIONARIO = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA_DIARIO = pa.schema([
+    ("data", pa.date32()),
+    ("temp_max_c", pa.float32()),
+    ("temp_min_c", pa.float32()),
+    ("sensacao_termica_max_c", pa.float32()),
+    ("sensacao_termica_min_c", pa.float32()),
+    ("precipitacao_total_mm", pa.float32()),
+    ("chuva_mm", pa.float32()),
+    ("neve_mm", pa.float32()),
+    ("vento_velocidade_max_kmh", pa.float32()),
+    ("rajadas_vento_max_kmh", pa.float32()),
+    ("vento_direcao_dominante_graus", pa.int16()),
+    ("radiacao_solar_mj_m2", pa.float32()),
+    ("codigo_tempo_wmo", pa.int16()),
+    ("codigo_ibge", pa.int32()),
+    ("nome", TEXTO_DICIONARIO),
+    ("nome_uf", TEXTO_DICIONARIO),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+])
+
+SCHEMA_HORARIO = pa.schema([
+    ("data_hora", pa.timestamp("ms")),
+    ("codigo_ibge", pa.int32()),
+    ("municipio", TEXTO_DICIONARIO),
+    ("uf", TEXTO_DICIONARIO),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("temperatura_c", pa.float32()),
+    ("umidade_relativa", pa.int16()),
+    ("precipitacao_mm", pa.float32()),
+    ("velocidade_vento_ms", pa.float32()),
+    ("fonte", TEXTO_DICIONARIO),  # endpoint de origem: archive ou forecast
+])
+
+
+def _array_numerico(valores: np.ndarray, tipo: pa.DataType) -> pa.Array:
+    """Buffer float64 com NaN → array Arrow do tipo pedido (NaN vira nulo)."""
+    nulos = np.isnan(valores)
+    if pa.types.is_integer(tipo):
+        return pa.array(np.where(nulos, 0, valores).astype(tipo.to_pandas_dtype()),
+                        mask=nulos, type=tipo)
+    return pa.array(valores.astype(tipo.to_pandas_dtype()), mask=nulos, type=tipo)
+
+
+def _array_repetido(valores: list, contagens: np.ndarray, tipo: pa.DataType | None) -> pa.Array:
+    """Um valor por município (ou trecho) → uma linha por passo de tempo."""
+    if tipo is not None and pa.types.is_dictionary(tipo):
+        codigos, unicos = pd.factorize(pd.Series(valores, dtype=object))
+        indices = np.repeat(codigos.astype(np.int32), contagens)
+        nulos = indices < 0
+        return pa.DictionaryArray.from_arrays(
+            pa.array(np.maximum(indices, 0), type=tipo.index_type, mask=nulos if nulos.any() else None),
+            pa.array(unicos, type=tipo.value_type),
+        )
+    arr = pa.array(np.repeat(np.asarray(valores), contagens))
+    return arr.cast(tipo) if tipo is not None and arr.type != tipo else arr
+
+
+class AcumuladorColunar:
+    """
+    Junta os blocos `daily`/`hourly` de vários municípios direto em buffers
+    NumPy pré-alocados (sem um DataFrame por município nem pd.concat) e
+    monta uma única tabela Arrow no final.
+
+    renomear: mapa API → coluna de saída (ex.: COLUNAS_TRADUZIDAS).
+    atributos: coluna de saída → campo do município, repetido em cada linha.
+    capacidade: estimativa de linhas (municípios × passos de tempo).
+    """
+
+    def __init__(self, renomear: dict, atributos: dict, capacidade: int = 1024):
+        self.renomear = renomear
+        self.atributos = atributos
+        self._capacidade = max(1, int(capacidade))
+        self._n = 0
+        self._tempo = []
+        self._buffers = {}
+        self._textos = {}  # var → (valores, linhas) em trechos de valor repetido
+        self._valores_municipio = {col: [] for col in atributos}
+        self._linhas_por_municipio = []
+
+    def __len__(self):
+        return self._n
+
+    def _garantir(self, extra: int):
+        necessario = self._n + extra
+        if necessario <= self._capacidade:
+            return
+        nova = max(necessario, self._capacidade * 2)
+        for var, buf in self._buffers.items():
+            novo = np.empty(nova, dtype=np.float64)
+            novo[:self._n] = buf[:self._n]
+            self._buffers[var] = novo
+        self._capacidade = nova
+
+    def _buffer(self, var: str) -> np.ndarray:
+        buf = self._buffers.get(var)
+        if buf is None:
+            # variável nova: linhas anteriores ficam nulas
+            buf = np.empty(self._capacidade, dtype=np.float64)
+            buf[:self._n] = np.nan
+            self._buffers[var] = buf
+        return buf
+
+    def adicionar(self, bloco: dict, municipio) -> int:
+        """Acrescenta o bloco de um município; devolve o número de linhas."""
+        tempo = bloco.get("time") or []
+        n = len(tempo)
+        if n == 0:
+            return 0
+
+        self._garantir(n)
+        ini, fim = self._n, self._n + n
+        self._tempo.extend(tempo)
+
+        for var, valores in bloco.items():
+            if var in VARIAVEIS_TEXTO:
+                self._acrescentar_texto(var, valores, n, ini)
+            elif var != "time":
+                self._buffer(var)[ini:fim] = valores
+        for var, buf in self._buffers.items():
+            if var not in bloco:
+                buf[ini:fim] = np.nan
+        for var in self._textos:
+            if var not in bloco:
+                self._acrescentar_texto(var, None, n, ini)
+
+        for col, campo in self.atributos.items():
+            self._valores_municipio[col].append(municipio[campo])
+        self._linhas_por_municipio.append(n)
+        self._n = fim
+        return n
+
+    def _acrescentar_texto(self, var: str, valor, n: int, ini: int):
+        valores, linhas = self._textos.setdefault(var, ([None], [ini]) if ini else ([], []))
+        if valor is None or isinstance(valor, str):
+            valores.append(valor)
+            linhas.append(n)
+            return
+        for v, grupo in groupby(valor):
+            valores.append(v)
+            linhas.append(sum(1 for _ in grupo))
+
+    def para_tabela(self, schema: pa.Schema | None = None) -> pa.Table:
+        """
+        Monta a tabela Arrow. Com `schema`, cada coluna já sai no tipo e na
+        ordem do schema (ausentes viram nulo; variáveis fora dele vão ao fim).
+        """
+        def _tipo(col):
+            return schema.field(col).type if schema is not None and col in schema.names else None
+
+        col_tempo = self.renomear.get("time", "time")
+        tempo = pa.array(self._tempo, type=pa.string())
+        colunas = {col_tempo: tempo.cast(_tipo(col_tempo)) if _tipo(col_tempo) else tempo}
+
+        for var, buf in self._buffers.items():
+            col = self.renomear.get(var, var)
+            tipo = _tipo(col) or (pa.int64() if var in VARIAVEIS_INTEIRAS else pa.float64())
+            colunas[col] = _array_numerico(buf[:self._n], tipo)
+
+        for var, (valores, linhas) in self._textos.items():
+            col = self.renomear.get(var, var)
+            colunas[col] = _array_repetido(valores, np.asarray(linhas, dtype=np.int64),
+                                           _tipo(col) or pa.string())
+
+        contagens = np.asarray(self._linhas_por_municipio, dtype=np.int64)
+        for col, valores in self._valores_municipio.items():
+            colunas[col] = _array_repetido(valores, contagens, _tipo(col))
+
+        if schema is None:
+            return pa.table(colunas)
+        campos = [pa.field(c, colunas[c].type if c in colunas else schema.field(c).type)
+                  for c in schema.names]
+        campos += [pa.field(c, arr.type) for c, arr in colunas.items() if c not in schema.names]
+        return pa.Table.from_arrays(
+            [colunas.get(f.name, pa.nulls(self._n, type=f.type)) for f in campos],
+            schema=pa.schema(campos),
+        )
@@ -0,0 +1,104 @@
+# src/recupera_dados_api_combinado.py
+
+from src import cache, cota, formato, metricas, roteamento, transporte
+from src.recupera_dados_api_dia import (
+    URL_ARCHIVE, VARIAVEIS_DIARIAS, separar_locais, juntar_coordenadas, get_clima_diario_por_lote,
+)
+from src.roteamento import ARCHIVE
+from src.recupera_dados_api_hora import (
+    VARIAVEIS_HORARIAS, completar_com_forecast, get_clima_horario_por_lote,
+)
+
+
+def get_clima_combinado_por_lote(coords, dia_str: str,
+                                 tz_name: str = "America/Sao_Paulo",
+                                 dia_fim_str: str | None = None) -> tuple[list, list]:
+    """
+    Uma chamada ao archive pedindo os blocos `daily` e `hourly` juntos para N
+    coordenadas (lista de (lat, lon)), opcionalmente para um período.
+
+    Retorna (diarios, horarios), listas alinhadas com coords em que cada item
+    é o bloco do município (dict de listas) ou a Exception que ele gerou.
+    Locais sem `hourly` no archive vão para o forecast num segundo lote. Se
+    src.roteamento diz que o archive ainda não tem o período todo, o diário
+    fica com ArchiveIndisponivel (sem chamada) e o horário segue o roteamento
+    da busca horária; se a chamada falhar, diário e horário são buscados
+    separadamente (com os mesmos fallbacks de antes). Com 429/5xx ou erro de
+    rede, o lote inteiro fica com o erro, sem novas chamadas.
+    """
+    if not coords:
+        return [], []
+
+    erro = roteamento.exigir_archive(dia_str, dia_fim_str, tz_name)
+    if erro is not None:
+        return ([erro] * len(coords),
+                get_clima_horario_por_lote(coords, dia_str, tz_name, dia_fim_str=dia_fim_str))
+
+    lats, lons = juntar_coordenadas(coords)
+    params = {
+        "latitude": lats,
+        "longitude": lons,
+        "start_date": dia_str,
+        "end_date": dia_fim_str or dia_str,
+        "daily": VARIAVEIS_DIARIAS,
+        "hourly": VARIAVEIS_HORARIAS,
+        "timezone": tz_name,
+    }
+
+    try:
+        r = transporte.get(URL_ARCHIVE, params=formato.com_formato(params), timeout=60, usar_cache=True,
+                           ttl=cache.ttl_archive(params["end_date"], tz_name))
+        if r.status_code in transporte.STATUS_RETENTAVEIS:
+            r.raise_for_status()
+        if r.status_code == 200:
+            locais = separar_locais(formato.ler(r, params))
+            if len(locais) != len(coords):
+                raise ValueError(
+                    f"API devolveu {len(locais)} locais para {len(coords)} coordenadas"
+                )
+    except cota.CotaEsgotada:
+        raise  # sem cota, as buscas separadas também seriam adiadas
+    except Exception as e:
+        if transporte.falha_do_lote(e):
+            metricas.contar("lotes_falhos_total", tipo="combinado")
+            print(f"Lote combinado ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+                  f"Fica para a próxima execução.")
+            return [e] * len(coords), [e] * len(coords)
+        metricas.contar("fallback_individual_total", tipo="combinado")
+        print(f"Lote combinado ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+              f"Buscando diário e horário separadamente...")
+        return (_diarios_separados(coords, dia_str, dia_fim_str),
+                get_clima_horario_por_lote(coords, dia_str, tz_name, dia_fim_str=dia_fim_str))
+
+    if r.status_code == 200:
+        diarios = [
+            js["daily"] if js.get("daily") else ValueError("archive sem bloco daily")
+            for js in locais
+        ]
+        horarios = [{**js["hourly"], "fonte": ARCHIVE} if js.get("hourly") else None for js in locais]
+    else:
+        # archive recusou o período (a sonda falhou ou ficou velha): o diário
+        # segue o caminho de sempre e o horário vai inteiro para o forecast
+        diarios = _diarios_separados(coords, dia_str, dia_fim_str)
+        horarios = [None] * len(coords)
+
+    # ---------- Fallback Forecast (somente locais pendentes do horário) ----------
+    try:
+        horarios = completar_com_forecast(coords, horarios, dia_str, tz_name, dia_fim_str)
+    except cota.CotaEsgotada:
+        raise
+    except Exception as e:
+        if transporte.falha_do_lote(e):
+            metricas.contar("lotes_falhos_total", tipo="combinado")
+            print(f"Forecast do lote combinado ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+                  f"Fica para a próxima execução.")
+            return diarios, [e if h is None else h for h in horarios]
+        print(f"Forecast do lote combinado ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+              f"Buscando o horário separadamente...")
+        horarios = get_clima_horario_por_lote(coords, dia_str, tz_name, dia_fim_str=dia_fim_str)
+    return diarios, horarios
+
+
+def _diarios_separados(coords, dia_str: str, dia_fim_str: str | None) -> list:
+    respostas = get_clima_diario_por_lote(coords, dia_str, dia_fim_str=dia_fim_str)
+    return [r if isinstance(r, Exception) else r["daily"] for r in respostas]
@@ -1,49 +1,122 @@
 # src/recupera_dados_api_dia.py
 
-import requests
-import time
-from datetime import datetime
-from dateutil.tz import gettz
+import os
 
+from src import cache, cota, formato, metricas, transporte
 
-def get_clima_diario_por_data(lat, lon, dia_str, tentativas=5, espera_inicial=5):
+
+# sobrescreva por variável de ambiente para apontar a um servidor local (scripts/fake_open_meteo.py)
+URL_ARCHIVE = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+
+VARIAVEIS_DIARIAS = (
+    "temperature_2m_max,temperature_2m_min,"
+    "apparent_temperature_max,apparent_temperature_min,"
+    "precipitation_sum,rain_sum,snowfall_sum,"
+    "windspeed_10m_max,windgusts_10m_max,winddirection_10m_dominant,"
+    "shortwave_radiation_sum,weathercode"
+)
+
+
+def separar_locais(payload):
     """
-    Coleta dados DIÁRIOS para uma data específica (YYYY-MM-DD).
-    Mantém retries com backoff exponencial.
+    A API devolve um objeto quando recebe 1 coordenada e uma lista
+    quando recebe N coordenadas separadas por vírgula.
     """
+    return payload if isinstance(payload, list) else [payload]
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
+
+def juntar_coordenadas(coords):
+    """Monta os parâmetros latitude/longitude no formato de lista da API."""
+    return (
+        ",".join(str(lat) for lat, _ in coords),
+        ",".join(str(lon) for _, lon in coords),
+    )
+
+
+def get_clima_diario_por_data(lat, lon, dia_str, tentativas=5, espera_inicial=5,
+                              dia_fim_str=None):
+    """
+    Coleta dados DIÁRIOS para uma data específica (YYYY-MM-DD) ou, se
+    dia_fim_str for informado, para o período dia_str → dia_fim_str.
+    Retries com backoff exponencial + jitter ficam a cargo de src.transporte.
+    """
+
+    url = URL_ARCHIVE
 
     params = {
         "latitude": lat,
         "longitude": lon,
-        "daily": (
-            "temperature_2m_max,temperature_2m_min,"
-            "apparent_temperature_max,apparent_temperature_min,"
-            "precipitation_sum,rain_sum,snowfall_sum,"
-            "windspeed_10m_max,windgusts_10m_max,winddirection_10m_dominant,"
-            "shortwave_radiation_sum,weathercode"
-        ),
+        "daily": VARIAVEIS_DIARIAS,
         "timezone": "America/Sao_Paulo",
         "start_date": dia_str,
-        "end_date": dia_str,
+        "end_date": dia_fim_str or dia_str,
     }
 
-    for tentativa in range(1, tentativas + 1):
-        try:
-            resp = requests.get(url, params=params, timeout=60)
-            resp.raise_for_status()
-            return resp.json()
+    resp = transporte.get(url, params=formato.com_formato(params), timeout=60,
+                          tentativas=tentativas, espera_base=espera_inicial,
+                          usar_cache=True, ttl=cache.ttl_archive(params["end_date"]))
+    resp.raise_for_status()
+    return formato.ler(resp, params)
 
-        except Exception as e:
-            print(
-                f"Erro na tentativa {tentativa}/{tentativas} "
-                f"para {dia_str} ({lat}, {lon}): {e}"
+
+def get_clima_diario_por_lote(coords, dia_str, tentativas=5, espera_inicial=5,
+                              tentativas_lote=2, dia_fim_str=None):
+    """
+    Coleta dados DIÁRIOS de vários municípios em uma única chamada.
+
+    coords: lista de (lat, lon). Retorna uma lista alinhada com coords em que
+    cada item é o JSON do município (ou o equivalente decodificado do
+    FlatBuffers, ver src.formato) ou a Exception que ele gerou. Com
+    dia_fim_str, cada JSON traz o período inteiro (uma linha por dia). Se a API
+    recusar o lote (HTTP 400, número de locais errado), cai para chamadas
+    individuais (get_clima_diario_por_data); se o erro for 429/5xx ou de rede,
+    todos os municípios do lote ficam com ele (ver transporte.falha_do_lote).
+    """
+    if not coords:
+        return []
+
+    lats, lons = juntar_coordenadas(coords)
+    params = {
+        "latitude": lats,
+        "longitude": lons,
+        "daily": VARIAVEIS_DIARIAS,
+        "timezone": "America/Sao_Paulo",
+        "start_date": dia_str,
+        "end_date": dia_fim_str or dia_str,
+    }
+
+    try:
+        resp = transporte.get(URL_ARCHIVE, params=formato.com_formato(params), timeout=60,
+                              tentativas=tentativas_lote, espera_base=espera_inicial,
+                              usar_cache=True, ttl=cache.ttl_archive(params["end_date"]))
+        resp.raise_for_status()
+        locais = separar_locais(formato.ler(resp, params))
+        if len(locais) != len(coords):
+            raise ValueError(
+                f"API devolveu {len(locais)} locais para {len(coords)} coordenadas"
             )
+        return locais
+
+    except cota.CotaEsgotada:
+        raise  # sem cota, chamadas individuais também seriam adiadas
+    except Exception as e:
+        if transporte.falha_do_lote(e):
+            metricas.contar("lotes_falhos_total", tipo="diario")
+            print(f"Lote ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+                  f"Fica para a próxima execução.")
+            return [e] * len(coords)
+        metricas.contar("fallback_individual_total", tipo="diario")
+        print(f"Lote ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+              f"Usando chamadas individuais...")
 
-            if tentativa < tentativas:
-                espera = espera_inicial * tentativa
-                print(f"Aguardando {espera}s antes da nova tentativa...")
-                time.sleep(espera)
-            else:
-                raise
+    # ---------- Fallback: uma chamada por município ----------
+    resultados = []
+    for lat, lon in coords:
+        try:
+            resultados.append(
+                get_clima_diario_por_data(lat, lon, dia_str, tentativas, espera_inicial,
+                                          dia_fim_str)
+            )
+        except Exception as e:
+            resultados.append(e)
+    return resultados
@@ -1,49 +1,258 @@
 # src/recupera_dados_api_hora.py
 
-import requests
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from dateutil.tz import gettz
 
+from src import cache, cota, formato, metricas, roteamento, transporte
+from src.recupera_dados_api_dia import separar_locais, juntar_coordenadas
+from src.roteamento import ARCHIVE, FORECAST
 
-def get_clima_horario_por_data(lat: float, lon: float, dia_str: str,
-                                tz_name: str = "America/Sao_Paulo") -> pd.DataFrame:
+
+# sobrescreva por variável de ambiente para apontar a um servidor local (scripts/fake_open_meteo.py)
+URL_ARCHIVE = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+URL_FORECAST = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+
+VARIAVEIS_HORARIAS = "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m"
+MAX_PAST_DAYS = 92  # limite do endpoint forecast (start_date até 92 dias atrás)
+
+
+def _filtra_periodo(df: pd.DataFrame, dia_str: str, dia_fim_str: str | None = None) -> pd.DataFrame:
+    if "time" in df.columns:
+        datas = df["time"].str[:10]
+        df = df[(datas >= dia_str) & (datas <= (dia_fim_str or dia_str))]
+    return df
+
+
+def _filtra_bloco(bloco: dict, dia_str: str, dia_fim_str: str | None = None) -> dict:
+    """Mesmo filtro de _filtra_periodo, direto no bloco `hourly` (listas ou arrays do FlatBuffers)."""
+    tempo = bloco.get("time") or []
+    fim = dia_fim_str or dia_str
+    idx = [i for i, t in enumerate(tempo) if dia_str <= t[:10] <= fim]
+    if len(idx) == len(tempo):
+        return bloco
+    return {var: valores[idx] if isinstance(valores, np.ndarray) else [valores[i] for i in idx]
+            for var, valores in bloco.items()}
+
+
+def _com_fonte(bloco: dict, fonte: str) -> dict:
+    """Marca o bloco com o endpoint de origem (vira a coluna `fonte`)."""
+    return {**bloco, "fonte": fonte}
+
+
+def juntar_trechos(*partes: list) -> list:
     """
-    Retorna dados horários para um dia específico (YYYY-MM-DD),
-    usando archive; se archive ainda não tiver o dia, usa forecast (fallback).
+    Junta, município a município, os blocos de trechos consecutivos do
+    período (ex.: archive até D-6 + forecast depois). Se algum trecho de um
+    município deu erro, o município fica com a Exception.
     """
+    if len(partes) == 1:
+        return partes[0]
+    juntos = []
+    for blocos in zip(*partes):
+        erro = next((b for b in blocos if isinstance(b, Exception)), None)
+        if erro is not None:
+            juntos.append(erro)
+            continue
+        bloco = {}
+        for b in blocos:
+            n = len(b.get("time") or [])
+            for var, valores in b.items():
+                if var == "fonte" and isinstance(valores, str):
+                    valores = [valores] * n
+                bloco.setdefault(var, []).extend(valores)
+        juntos.append(bloco)
+    return juntos
+
 
-    # ---------- Tenta API Archive ----------
-    params_archive = {
+def _params(lat, lon, dia_str: str, dia_fim_str: str | None, tz_name: str) -> dict:
+    # o forecast também aceita start_date/end_date: pede só os dias necessários
+    return {
         "latitude": lat,
         "longitude": lon,
         "start_date": dia_str,
-        "end_date": dia_str,
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m",
+        "end_date": dia_fim_str or dia_str,
+        "hourly": VARIAVEIS_HORARIAS,
         "timezone": tz_name,
     }
 
-    url_archive = "https://archive-api.open-meteo.com/v1/archive"
-    r = requests.get(url_archive, params=params_archive, timeout=30)
 
-    if r.status_code == 200 and r.json().get("hourly"):
-        return pd.DataFrame(r.json()["hourly"])
+def _get_archive(params: dict, tz_name: str):
+    return transporte.get(URL_ARCHIVE, params=formato.com_formato(params), timeout=30, usar_cache=True,
+                          ttl=cache.ttl_archive(params["end_date"], tz_name))
 
-    # ---------- Fallback Forecast ----------
-    params_forecast = {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m",
-        "past_days": 1,
-        "timezone": tz_name,
-    }
 
-    url_forecast = "https://api.open-meteo.com/v1/forecast"
-    r2 = requests.get(url_forecast, params=params_forecast, timeout=30)
+def _get_forecast(params: dict):
+    return transporte.get(URL_FORECAST, params=formato.com_formato(params), timeout=30,
+                          usar_cache=True, ttl=cache.TTL_FORECAST)
+
+
+def _levantar_se_transitoria(r):
+    """
+    429/5xx do archive não quer dizer que o período falta lá: levanta o erro
+    em vez de mandar os locais para o forecast.
+    """
+    if r.status_code in transporte.STATUS_RETENTAVEIS:
+        r.raise_for_status()
+
+
+def get_clima_horario_por_data(lat: float, lon: float, dia_str: str,
+                                tz_name: str = "America/Sao_Paulo",
+                                dia_fim_str: str | None = None) -> pd.DataFrame:
+    """
+    Retorna dados horários para um dia específico (YYYY-MM-DD) ou para o
+    período dia_str → dia_fim_str. src.roteamento diz que trecho já está no
+    archive; o resto vem do forecast (que também cobre o archive que vier
+    sem dado). A coluna `fonte` registra o endpoint de cada hora.
+    """
+    blocos = []
+    for fonte, ini, fim in roteamento.rotear(dia_str, dia_fim_str, tz_name):
+        params = _params(lat, lon, ini, fim, tz_name)
+        if fonte == ARCHIVE:
+            r = _get_archive(params, tz_name)
+            _levantar_se_transitoria(r)
+            js = formato.ler(r, params) if r.status_code == 200 else {}
+            if js.get("hourly"):
+                blocos.append(_com_fonte(js["hourly"], ARCHIVE))
+                continue
+
+        # ---------- Forecast ----------
+        metricas.contar("locais_forecast_total")
+        r2 = _get_forecast(params)
+        r2.raise_for_status()
+        blocos.append(_com_fonte(_filtra_bloco(formato.ler(r2, params).get("hourly", {}), ini, fim), FORECAST))
+
+    return pd.DataFrame(juntar_trechos(*[[b] for b in blocos])[0])
+
+
+def completar_com_forecast(coords, resultados: list, dia_str: str,
+                           tz_name: str = "America/Sao_Paulo",
+                           dia_fim_str: str | None = None) -> list:
+    """
+    Forecast em lote: preenche os itens None de `resultados` (locais sem
+    dado no archive, ou o trecho que o archive ainda não tem) com uma única
+    chamada ao forecast, só para os dias pedidos.
+    """
+    pendentes = [i for i, bloco in enumerate(resultados) if bloco is None]
+    if not pendentes:
+        return resultados
+
+    metricas.contar("locais_forecast_total", len(pendentes))
+    lats, lons = juntar_coordenadas([coords[i] for i in pendentes])
+    params = _params(lats, lons, dia_str, dia_fim_str, tz_name)
+    r2 = _get_forecast(params)
     r2.raise_for_status()
+    locais_f = separar_locais(formato.ler(r2, params))
+    if len(locais_f) != len(pendentes):
+        raise ValueError(
+            f"Forecast devolveu {len(locais_f)} locais para {len(pendentes)} coordenadas"
+        )
+    for i, js in zip(pendentes, locais_f):
+        resultados[i] = _com_fonte(_filtra_bloco(js.get("hourly", {}), dia_str, dia_fim_str), FORECAST)
+    return resultados
 
-    df = pd.DataFrame(r2.json().get("hourly", {}))
-    if "time" in df.columns:
-        df = df[df["time"].str.startswith(dia_str)]
 
-    return df
+def _archive_por_lote(coords, dia_str: str, tz_name: str, dia_fim_str: str) -> list:
+    """Trecho archive de um lote; locais sem dado vão para o forecast."""
+    lats, lons = juntar_coordenadas(coords)
+    params = _params(lats, lons, dia_str, dia_fim_str, tz_name)
+    r = _get_archive(params, tz_name)
+    _levantar_se_transitoria(r)
+
+    if r.status_code == 200:
+        locais = separar_locais(formato.ler(r, params))
+        if len(locais) != len(coords):
+            raise ValueError(
+                f"API devolveu {len(locais)} locais para {len(coords)} coordenadas"
+            )
+    else:
+        # archive ainda sem o período (a sonda falhou ou ficou velha) → forecast
+        locais = [{}] * len(coords)
+
+    resultados = [_com_fonte(js["hourly"], ARCHIVE) if js.get("hourly") else None for js in locais]
+    return completar_com_forecast(coords, resultados, dia_str, tz_name, dia_fim_str)
+
+
+def get_clima_horario_por_lote(coords, dia_str: str,
+                               tz_name: str = "America/Sao_Paulo",
+                               dia_fim_str: str | None = None) -> list:
+    """
+    Versão em lote de get_clima_horario_por_data: uma chamada para N
+    coordenadas (lista de (lat, lon)) por trecho do período (archive e/ou
+    forecast, conforme src.roteamento).
+
+    Retorna uma lista alinhada com coords em que cada item é o bloco
+    `hourly` do município (dict de listas com a coluna `fonte`, pronto para
+    o AcumuladorColunar) ou a Exception que ele gerou. Se a API recusar o
+    lote (HTTP 400, número de locais errado), cai para chamadas individuais;
+    com 429/5xx ou erro de rede, todos os municípios ficam com o erro.
+    """
+    if not coords:
+        return []
+
+    try:
+        partes = []
+        for fonte, ini, fim in roteamento.rotear(dia_str, dia_fim_str, tz_name):
+            if fonte == ARCHIVE:
+                partes.append(_archive_por_lote(coords, ini, tz_name, fim))
+            else:
+                partes.append(completar_com_forecast(coords, [None] * len(coords), ini, tz_name, fim))
+        return juntar_trechos(*partes)
+
+    except cota.CotaEsgotada:
+        raise  # sem cota, chamadas individuais também seriam adiadas
+    except Exception as e:
+        if transporte.falha_do_lote(e):
+            metricas.contar("lotes_falhos_total", tipo="horario")
+            print(f"Lote horário ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+                  f"Fica para a próxima execução.")
+            return [e] * len(coords)
+        metricas.contar("fallback_individual_total", tipo="horario")
+        print(f"Lote horário ({len(coords)} municípios) falhou para {dia_str}: {e}. "
+              f"Usando chamadas individuais...")
+
+    resultados = []
+    for lat, lon in coords:
+        try:
+            df = get_clima_horario_por_data(lat, lon, dia_str, tz_name, dia_fim_str)
+            resultados.append(df.to_dict(orient="list"))
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+
+def get_clima_horario_por_horas(coords, hora_ini: str, hora_fim: str,
+                                tz_name: str = "America/Sao_Paulo") -> list:
+    """
+    Horas hora_ini → hora_fim (YYYY-MM-DDTHH:MM, inclusive) do forecast para
+    N coordenadas numa chamada (start_hour/end_hour). Usado pela coleta
+    incremental: sem cache, porque as horas recentes mudam a cada rodada do
+    modelo. Retorna uma lista alinhada com coords com o bloco `hourly` de
+    cada local (coluna `fonte` = forecast) ou a Exception do lote.
+    """
+    if not coords:
+        return []
+
+    lats, lons = juntar_coordenadas(coords)
+    params = {
+        "latitude": lats,
+        "longitude": lons,
+        "start_hour": hora_ini,
+        "end_hour": hora_fim,
+        "hourly": VARIAVEIS_HORARIAS,
+        "timezone": tz_name,
+    }
+    try:
+        r = transporte.get(URL_FORECAST, params=formato.com_formato(params), timeout=30)
+        r.raise_for_status()
+        locais = separar_locais(formato.ler(r, params))
+        if len(locais) != len(coords):
+            raise ValueError(
+                f"Forecast devolveu {len(locais)} locais para {len(coords)} coordenadas"
+            )
+    except cota.CotaEsgotada:
+        raise
+    except Exception as e:
+        # a marca dos municípios não avança: a próxima execução pede as mesmas horas
+        return [e] * len(coords)
+    return [_com_fonte(js.get("hourly") or {}, FORECAST) for js in locais]
@@ -0,0 +1,265 @@
+# src/resumo.py
+"""
+Resumo por dia gravado junto com o parquet (sidecar JSON).
+
+Ao publicar o arquivo do dia, o EscritorParquetDiario passa cada row group
+gravado a um ResumoDia, que acumula os agregados com pyarrow sem manter o
+dia em memória. No fim, grava dados_climaticos_<tipo>_YYYYMMDD.resumo.json
+ao lado do parquet:
+
+    variaveis    min/max de cada medida (com o município que o atingiu e os
+                 empates), média nacional e nulos
+    por_uf       municípios e média de cada medida por UF
+    horario_para_diario  (só horário) o dia de cada município (mín./máx./média
+                 da temperatura, chuva acumulada, vento máximo, umidade média)
+                 resumido do mesmo jeito
+
+Dashboards e jobs gold leem alguns KB em vez da partição inteira. O JSON vai
+para o mesmo prefixo date=... do S3. O Auto Loader só lê *.parquet, então
+ele não entra no bronze.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src import arquivos
+
+
+VERSAO = 1
+CASAS = 4   # casas decimais no JSON (as medidas são float32)
+
+# tipo → (medidas, coluna do nome do município, coluna da UF, coluna de tempo)
+COLUNAS = {
+    "diario": ([
+        "temp_max_c", "temp_min_c", "sensacao_termica_max_c", "sensacao_termica_min_c",
+        "precipitacao_total_mm", "chuva_mm", "neve_mm", "vento_velocidade_max_kmh",
+        "rajadas_vento_max_kmh", "radiacao_solar_mj_m2",
+    ], "nome", "nome_uf", None),
+    "horario": (["temperatura_c", "umidade_relativa", "precipitacao_mm", "velocidade_vento_ms"],
+                "municipio", "uf", "data_hora"),
+}
+
+# horário → diário por município: coluna de saída → (coluna horária, agregação)
+ROLLUP_HORARIO = {
+    "temp_min_c": ("temperatura_c", "min"),
+    "temp_max_c": ("temperatura_c", "max"),
+    "temp_media_c": ("temperatura_c", "mean"),
+    "precipitacao_total_mm": ("precipitacao_mm", "sum"),
+    "vento_max_ms": ("velocidade_vento_ms", "max"),
+    "umidade_media": ("umidade_relativa", "mean"),
+}
+
+
+def caminho_resumo(parquet: Path) -> Path:
+    """dados_..._YYYYMMDD.parquet → dados_..._YYYYMMDD.resumo.json"""
+    parquet = Path(parquet)
+    return parquet.with_name(f"{parquet.stem}.resumo.json")
+
+
+def _numero(valor):
+    return None if valor is None else round(float(valor), CASAS)
+
+
+def _onde(tabela: pa.Table, mascara, nome: str, uf: str, tempo: str | None) -> dict:
+    """Primeira linha que atingiu o valor (ordem do arquivo) e o número de empates."""
+    achados = tabela.filter(mascara)
+    linha = {"codigo_ibge": achados["codigo_ibge"][0].as_py(),
+             "municipio": achados[nome][0].as_py(), "uf": achados[uf][0].as_py()}
+    if tempo:
+        linha[tempo] = achados[tempo][0].as_py().isoformat(timespec="minutes")
+    linha["empates"] = achados.num_rows
+    return linha
+
+
+class _Variaveis:
+    """min/max (com onde ocorreram), média e nulos de cada medida, bloco a bloco."""
+
+    def __init__(self, medidas: list, nome: str, uf: str, tempo: str | None):
+        self.nome, self.uf, self.tempo = nome, uf, tempo
+        self.parciais = {c: {"min": None, "max": None, "soma": 0.0, "n": 0, "nulos": 0,
+                             "min_em": None, "max_em": None} for c in medidas}
+
+    def adicionar(self, tabela: pa.Table):
+        for coluna, item in self.parciais.items():
+            valores = tabela[coluna]
+            item["nulos"] += valores.null_count
+            extremos = pc.min_max(valores)
+            if extremos["min"].as_py() is None:
+                continue
+            item["soma"] += pc.sum(valores.cast(pa.float64())).as_py()
+            item["n"] += len(valores) - valores.null_count
+            for chave in ("min", "max"):
+                valor = extremos[chave].as_py()
+                mascara = pc.equal(valores, extremos[chave])
+                atual = item[chave]
+                if atual is None or (valor < atual if chave == "min" else valor > atual):
+                    # novo extremo: vale a primeira linha deste bloco
+                    item[chave] = valor
+                    item[f"{chave}_em"] = _onde(tabela, mascara, self.nome, self.uf, self.tempo)
+                elif valor == atual:
+                    item[f"{chave}_em"]["empates"] += pc.sum(mascara).as_py()
+
+    def resultado(self) -> dict:
+        saida = {}
+        for coluna, item in self.parciais.items():
+            saida[coluna] = {"min": _numero(item["min"]), "max": _numero(item["max"]),
+                             "media": _numero(item["soma"] / item["n"] if item["n"] else None),
+                             "nulos": item["nulos"]}
+            if item["min"] is not None:
+                saida[coluna]["min_em"] = item["min_em"]
+                saida[coluna]["max_em"] = item["max_em"]
+        return saida
+
+
+class _PorUf:
+    """Municípios e média de cada medida por UF, bloco a bloco."""
+
+    def __init__(self, medidas: list, uf: str):
+        self.medidas, self.uf = medidas, uf
+        self.parciais = {}  # uf → (set de codigo_ibge, {medida: [soma, n]})
+
+    def adicionar(self, tabela: pa.Table):
+        base = tabela.select(["codigo_ibge"] + self.medidas).append_column(
+            "_uf", tabela[self.uf].cast(pa.string()))
+        agregado = base.group_by("_uf").aggregate(
+            [("codigo_ibge", "distinct")]
+            + [(c, agg) for c in self.medidas for agg in ("sum", "count")]
+        )
+        for linha in agregado.to_pylist():
+            codigos, somas = self.parciais.setdefault(
+                linha["_uf"], (set(), {c: [0.0, 0] for c in self.medidas}))
+            codigos.update(linha["codigo_ibge_distinct"])
+            for c in self.medidas:
+                if linha[f"{c}_count"]:
+                    somas[c][0] += linha[f"{c}_sum"]
+                    somas[c][1] += linha[f"{c}_count"]
+
+    def resultado(self) -> dict:
+        return {
+            uf: {"municipios": len(codigos),
+                 **{c: _numero(soma / n if n else None) for c, (soma, n) in somas.items()}}
+            for uf, (codigos, somas) in sorted(self.parciais.items())
+        }
+
+
+class _RollupHorario:
+    """
+    Uma linha por município com o dia agregado das horas. Cada bloco vira
+    parciais por município (min/max/soma/contagem), reagregados no fim: são
+    poucas linhas por município, porque o arquivo vem ordenado por codigo_ibge.
+    """
+
+    PARCIAIS = {"min": "min", "max": "max", "sum": "sum", "count": "sum"}  # parcial → reagregação
+
+    def __init__(self, nome: str, uf: str):
+        self.nome, self.uf = nome, uf
+        self.origens = sorted({c for c, _ in ROLLUP_HORARIO.values()})
+        self.parciais = []
+
+    def adicionar(self, tabela: pa.Table):
+        base = pa.table({
+            "codigo_ibge": tabela["codigo_ibge"],
+            self.nome: tabela[self.nome].cast(pa.string()),
+            self.uf: tabela[self.uf].cast(pa.string()),
+            **{c: tabela[c].cast(pa.float64()) for c in self.origens},
+        })
+        self.parciais.append(base.group_by(["codigo_ibge", self.nome, self.uf]).aggregate(
+            [(c, agg) for c in self.origens for agg in self.PARCIAIS]
+        ))
+
+    def tabela(self) -> pa.Table:
+        chaves = ["codigo_ibge", self.nome, self.uf]
+        agregado = pa.concat_tables(self.parciais).group_by(chaves).aggregate(
+            [(f"{c}_{agg}", self.PARCIAIS[agg]) for c in self.origens for agg in self.PARCIAIS]
+        ).sort_by("codigo_ibge")
+        colunas = {c: agregado[c] for c in chaves}
+        for saida, (c, agg) in ROLLUP_HORARIO.items():
+            n = agregado[f"{c}_count_sum"]
+            if agg == "mean":
+                valor = pc.divide(agregado[f"{c}_sum_sum"], n.cast(pa.float64()))
+            else:
+                valor = agregado[f"{c}_{agg}_{self.PARCIAIS[agg]}"]
+            # sem nenhuma hora válida o resultado é nulo, como no group_by do dia inteiro
+            colunas[saida] = pc.if_else(pc.greater(n, 0), valor, pa.scalar(None, pa.float64()))
+        return pa.table(colunas)
+
+
+class ResumoDia:
+    """
+    Agregados do dia montados bloco a bloco: o EscritorParquetDiario chama
+    adicionar() com cada row group publicado, na ordem do arquivo, e
+    resultado() no fim. A memória é a dos parciais (por UF e, no horário,
+    por município), não a do dia.
+    """
+
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.medidas, self.nome, self.uf, self.tempo = COLUNAS[tipo]
+        self.linhas = 0
+        self.codigos = set()
+        self._variaveis = self._por_uf = None
+        self._rollup = _RollupHorario(self.nome, self.uf) if tipo == "horario" else None
+
+    def adicionar(self, tabela: pa.Table):
+        if self._variaveis is None:
+            self.medidas = [c for c in self.medidas if c in tabela.column_names]
+            self._variaveis = _Variaveis(self.medidas, self.nome, self.uf, self.tempo)
+            self._por_uf = _PorUf(self.medidas, self.uf)
+        if not tabela.num_rows:
+            return
+        self.linhas += tabela.num_rows
+        self.codigos.update(pc.unique(tabela["codigo_ibge"]).to_pylist())
+        self._variaveis.adicionar(tabela)
+        self._por_uf.adicionar(tabela)
+        if self._rollup is not None:
+            self._rollup.adicionar(tabela)
+
+    def resultado(self) -> dict:
+        resumo = {
+            "versao": VERSAO,
+            "tipo": self.tipo,
+            "linhas": self.linhas,
+            "municipios": len(self.codigos),
+            "variaveis": self._variaveis.resultado() if self._variaveis else {},
+            "por_uf": self._por_uf.resultado() if self._por_uf else {},
+        }
+        if self._rollup is not None:
+            dias = self._rollup.tabela()
+            variaveis = _Variaveis(list(ROLLUP_HORARIO), self.nome, self.uf, None)
+            por_uf = _PorUf(list(ROLLUP_HORARIO), self.uf)
+            if dias.num_rows:
+                variaveis.adicionar(dias)
+                por_uf.adicionar(dias)
+            resumo["horario_para_diario"] = {
+                "variaveis": variaveis.resultado(),
+                "por_uf": por_uf.resultado(),
+            }
+        return resumo
+
+
+def resumir(tipo: str, tabela: pa.Table) -> dict:
+    """Agregados do dia (`tabela` = conteúdo inteiro do parquet do dia)."""
+    resumo = ResumoDia(tipo)
+    resumo.adicionar(tabela)
+    return resumo.resultado()
+
+
+def gravar(parquet: Path, resumo: dict) -> Path:
+    """Grava o sidecar do parquet com rename atômico."""
+    destino = caminho_resumo(parquet)
+    conteudo = {"arquivo": Path(parquet).name, **resumo,
+                "gerado_em": datetime.now().isoformat(timespec="seconds")}
+    return arquivos.gravar_texto(destino, json.dumps(conteudo, ensure_ascii=False, indent=1))
+
+
+def ler(parquet: Path) -> dict | None:
+    """Resumo do parquet, ou None se ele não tem sidecar (arquivo anterior ao resumo)."""
+    caminho = caminho_resumo(parquet)
+    if not caminho.exists():
+        return None
+    return json.loads(caminho.read_text())
@@ -0,0 +1,159 @@
+# src/roteamento.py
+"""
+Roteador archive × forecast dos dados horários.
+
+O archive da Open-Meteo só tem os dados alguns dias depois. Em vez de pedir
+cada lote ao archive e, se não houver dado, repetir no forecast, uma sonda
+barata (1 coordenada, 1 variável) descobre até que data o archive está
+disponível. O período pedido é então dividido em um trecho archive e um
+trecho forecast, e todos os municípios vão direto ao endpoint certo.
+
+A disponibilidade é um prefixo (se o archive tem o dia D, tem os anteriores),
+então basta guardar a última data confirmada (vale para sempre) e a primeira
+data indisponível (refeita depois de TTL_INDISPONIVEL).
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+from src import metricas, transporte
+from src.recupera_dados_api_dia import URL_ARCHIVE
+
+
+COORDENADA_SONDA = (-15.7939, -47.8828)  # Brasília; a disponibilidade é igual em todo ponto
+VARIAVEL_SONDA = "temperature_2m"
+TTL_INDISPONIVEL = 3600.0  # segundos até sondar de novo uma data que ainda não estava no archive
+
+ARCHIVE = "archive"
+FORECAST = "forecast"
+
+_confirmada = {}    # tz → última data confirmada no archive
+_indisponivel = {}  # tz → (primeira data indisponível, verificado_em)
+_lock = threading.Lock()
+
+
+class ArchiveIndisponivel(Exception):
+    """O archive ainda não tem o período pedido (e o dado não existe no forecast)."""
+
+
+def limpar():
+    """Esquece as respostas das sondas."""
+    with _lock:
+        _confirmada.clear()
+        _indisponivel.clear()
+
+
+def _sondar(dia_ini: date, dia_fim: date, tz_name: str) -> date | None:
+    """
+    Última data de dia_ini → dia_fim com o dia inteiro no archive (dia_ini - 1
+    se nenhuma), ou None se a sonda falhou.
+    """
+    lat, lon = COORDENADA_SONDA
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": dia_ini.strftime("%Y-%m-%d"),
+        "end_date": dia_fim.strftime("%Y-%m-%d"),
+        "hourly": VARIAVEL_SONDA,
+        "timezone": tz_name,
+    }
+    try:
+        r = transporte.get(URL_ARCHIVE, params=params, timeout=30)
+    except Exception as e:
+        print(f"Sonda do archive falhou ({e}); seguindo com archive + fallback.")
+        metricas.contar("sondas_archive_total", resultado="erro")
+        return None
+
+    if r.status_code == 200:
+        bloco = r.json().get("hourly") or {}
+        completos = {}
+        for t, valor in zip(bloco.get("time") or [], bloco.get(VARIAVEL_SONDA) or []):
+            completos[t[:10]] = completos.get(t[:10], True) and valor is not None
+        ultima = dia_ini - timedelta(days=1)
+        dia = dia_ini
+        # prefixo de dias completos (o archive recente pode vir com horas nulas)
+        while completos.get(dia.strftime("%Y-%m-%d")):
+            ultima = dia
+            dia += timedelta(days=1)
+        metricas.contar("sondas_archive_total", resultado="ok")
+        return ultima
+
+    # 400 "... out of allowed range from 1940-01-01 to 2025-01-10": o limite vem na mensagem
+    try:
+        motivo = r.json().get("reason", "")
+    except ValueError:
+        motivo = ""
+    achado = re.search(r"to (\d{4}-\d{2}-\d{2})", motivo)
+    if r.status_code == 400 and achado:
+        metricas.contar("sondas_archive_total", resultado="limite")
+        return min(dia_fim, max(dia_ini - timedelta(days=1), date.fromisoformat(achado.group(1))))
+
+    print(f"Sonda do archive sem resposta útil (HTTP {r.status_code}); seguindo com archive + fallback.")
+    metricas.contar("sondas_archive_total", resultado="erro")
+    return None
+
+
+def ultima_data_archive(dia_ini: date, dia_fim: date, tz_name: str = "America/Sao_Paulo") -> date | None:
+    """
+    Última data de dia_ini → dia_fim disponível no archive (dia_ini - 1 se
+    nenhuma; None se não deu para saber). Consulta a API só quando a resposta
+    não está no cache da execução.
+    """
+    with _lock:  # uma sonda por vez: threads do mesmo período reaproveitam a resposta
+        confirmada = _confirmada.get(tz_name)
+        if confirmada is not None and dia_fim <= confirmada:
+            return dia_fim
+        inicio = dia_ini if confirmada is None else max(dia_ini, confirmada + timedelta(days=1))
+
+        indisponivel = _indisponivel.get(tz_name)
+        if indisponivel and time.time() - indisponivel[1] < TTL_INDISPONIVEL:
+            if indisponivel[0] <= inicio:
+                return inicio - timedelta(days=1)
+            if confirmada is not None and indisponivel[0] == confirmada + timedelta(days=1):
+                return min(dia_fim, confirmada)
+
+        ultima = _sondar(inicio, dia_fim, tz_name)
+        if ultima is None:
+            return None
+        if ultima >= inicio:
+            _confirmada[tz_name] = max(ultima, confirmada or ultima)
+        if ultima < dia_fim:
+            _indisponivel[tz_name] = (ultima + timedelta(days=1), time.time())
+        return ultima
+
+
+def rotear(dia_str: str, dia_fim_str: str | None = None,
+           tz_name: str = "America/Sao_Paulo") -> list[tuple[str, str, str]]:
+    """
+    Divide o período em trechos [(fonte, ini, fim)] com fonte ARCHIVE ou
+    FORECAST. Se a sonda falhar, devolve o período inteiro como ARCHIVE (os
+    fetchers mantêm o fallback para o forecast).
+    """
+    ini = date.fromisoformat(dia_str)
+    fim = date.fromisoformat(dia_fim_str or dia_str)
+    ultima = ultima_data_archive(ini, fim, tz_name)
+    if ultima is None or ultima >= fim:
+        return [(ARCHIVE, dia_str, fim.strftime("%Y-%m-%d"))]
+    trechos = []
+    if ultima >= ini:
+        trechos.append((ARCHIVE, dia_str, ultima.strftime("%Y-%m-%d")))
+    trechos.append((FORECAST, max(ini, ultima + timedelta(days=1)).strftime("%Y-%m-%d"),
+                    fim.strftime("%Y-%m-%d")))
+    return trechos
+
+
+def exigir_archive(dia_str: str, dia_fim_str: str | None = None,
+                   tz_name: str = "America/Sao_Paulo") -> ArchiveIndisponivel | None:
+    """
+    Para dados que só existem no archive (o diário): a exceção a registrar
+    se o período ainda não está todo disponível, sem gastar a chamada do
+    lote; None se está (ou se a sonda não soube dizer).
+    """
+    trechos = rotear(dia_str, dia_fim_str, tz_name)
+    if trechos[-1][0] == ARCHIVE:
+        return None
+    _, ini, fim = trechos[-1]
+    return ArchiveIndisponivel(f"archive ainda sem dados de {ini} a {fim}")
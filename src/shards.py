@@ -0,0 +1,104 @@
+# src/shards.py
+"""
+Coleta particionada em N shards (containers ou hosts) e consolidação.
+
+Cada shard (`main.py --shard i/N`) coleta os municípios com
+codigo_ibge % N == i - 1 e grava em data/shards/<tipo>/ um parquet e um
+marcador .json por dia. A consolidação (`main.py --consolidar-shards N`)
+só junta uma data quando os N marcadores existem: gera o parquet canônico
+em data/raw/, registra o ledger e remove os arquivos de shard.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.coleta import ESPECIFICACOES, pasta_saida, sufixo_shard
+from src.escrita import EscritorParquetDiario
+from src import estado, resumo
+
+
+def interpretar_shard(texto: str) -> tuple[int, int]:
+    """"i/N" → (i, N), com 1 <= i <= N."""
+    try:
+        i, n = (int(p) for p in texto.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard inválido: {texto!r} (use i/N, ex.: 1/4)")
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(f"Shard inválido: {texto!r} (precisa de 1 <= i <= N)")
+    return i, n
+
+
+def filtrar_municipios(df_cidades: pd.DataFrame, shard: tuple[int, int]) -> pd.DataFrame:
+    """Municípios do shard: partição determinística por codigo_ibge."""
+    i, n = shard
+    return df_cidades[df_cidades["codigo_ibge"].astype("int64") % n == i - 1]
+
+
+def _arquivos(base_dir: Path, tipo: str, dia: date, n: int) -> list[Path]:
+    """Parquet (possivelmente inexistente) de cada shard 1..n para a data."""
+    esp = ESPECIFICACOES[tipo]
+    pasta = pasta_saida(base_dir, tipo, shard=(1, n))
+    return [
+        pasta / f"{esp['prefixo']}_{dia.strftime('%Y%m%d')}{sufixo_shard((i, n))}.parquet"
+        for i in range(1, n + 1)
+    ]
+
+
+def marcadores(base_dir: Path, tipo: str, dia: date, n: int) -> list[dict] | None:
+    """Conteúdo dos N marcadores da data, ou None se algum shard ainda não terminou."""
+    lidos = []
+    for parquet in _arquivos(base_dir, tipo, dia, n):
+        marcador = parquet.with_suffix(".json")
+        if not marcador.exists():
+            return None
+        lidos.append(json.loads(marcador.read_text()))
+    return lidos
+
+
+def consolidar(base_dir: Path, tipo: str, dia: date, n: int, ledger=None):
+    """
+    Junta os parquets dos N shards no arquivo canônico do dia.
+
+    Devolve (completo, caminho): completo=False se algum shard ainda não
+    reportou; caminho=None se nenhum shard teve dados para a data.
+    """
+    lidos = marcadores(base_dir, tipo, dia, n)
+    if lidos is None:
+        return False, None
+
+    esp = ESPECIFICACOES[tipo]
+    with EscritorParquetDiario(
+        pasta_saida(base_dir, tipo), esp["prefixo"],
+        schema=esp["schema"], ordenar_por=esp["ordenar_por"],
+        resumir=partial(resumo.ResumoDia, tipo),
+    ) as escritor:
+        for parquet in _arquivos(base_dir, tipo, dia, n):
+            if not parquet.exists():
+                continue
+            arquivo = pq.ParquetFile(parquet)
+            for i in range(arquivo.num_row_groups):
+                tabela = arquivo.read_row_group(i)
+                escritor.escrever(tabela, esp["datas"](tabela))
+        caminho = escritor.fechar().get(dia)
+
+    if ledger is not None:
+        ok = {c for m in lidos for c in m["ok"]}
+        falhas = {
+            int(c): erro for m in lidos for c, erro in m["falhas"].items() if int(c) not in ok
+        }
+        estado.registrar_coleta(ledger, tipo, dia, ok, falhas, caminho)
+    return True, caminho
+
+
+def limpar(base_dir: Path, tipo: str, dia: date, n: int):
+    """Remove parquets e marcadores dos shards de uma data já consolidada."""
+    for parquet in _arquivos(base_dir, tipo, dia, n):
+        for arquivo in (parquet, parquet.with_suffix(".json")):
+            if arquivo.exists():
+                arquivo.unlink()
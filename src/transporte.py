@@ -0,0 +1,167 @@
+# src/transporte.py
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import cache, cota, metricas
+from src.concorrencia import slot_host
+
+
+TAMANHO_POOL = 32                           # conexões keep-alive por host
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+ESPERA_BASE = 1.0                           # segundos (1ª espera máxima)
+ESPERA_MAXIMA = 60.0                        # teto de cada espera
+
+_sessao = None
+_lock = threading.Lock()
+
+
+def sessao() -> requests.Session:
+    """
+    Sessão HTTP compartilhada por todos os fetchers: mantém conexões
+    keep-alive (evita novo handshake TCP+TLS a cada chamada) e pede gzip.
+    """
+    global _sessao
+    with _lock:
+        if _sessao is None:
+            s = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=TAMANHO_POOL, pool_maxsize=TAMANHO_POOL)
+            s.mount("https://", adaptador)
+            s.mount("http://", adaptador)
+            s.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _sessao = s
+        return _sessao
+
+
+def _retry_after(resp) -> float | None:
+    """Lê o cabeçalho Retry-After (segundos ou data HTTP)."""
+    valor = resp.headers.get("Retry-After") if resp is not None else None
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        quando = parsedate_to_datetime(valor)
+        return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def calcular_espera(tentativa: int, espera_base: float = ESPERA_BASE, resp=None) -> float:
+    """
+    Backoff exponencial com jitter completo: sorteia entre 0 e
+    espera_base * 2^(tentativa-1), limitado a ESPERA_MAXIMA. Se o servidor
+    mandou Retry-After, espera pelo menos esse tempo.
+    """
+    teto = min(ESPERA_MAXIMA, espera_base * (2 ** (tentativa - 1)))
+    espera = random.uniform(0, teto)
+    pedido = _retry_after(resp)
+    if pedido is not None:
+        espera = max(espera, min(pedido, ESPERA_MAXIMA))
+    return espera
+
+
+def falha_do_lote(erro: Exception) -> bool:
+    """
+    True quando o erro é do servidor ou da rede (429/5xx que esgotaram as
+    tentativas, conexão, timeout), e não de um dos locais do lote. Refazer o
+    lote município a município só multiplicaria as chamadas a uma API que já
+    está limitando: o lote inteiro fica como falha no ledger e volta na
+    próxima execução.
+    """
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout)):
+        return True
+    resposta = getattr(erro, "response", None)
+    return (isinstance(erro, requests.HTTPError) and resposta is not None
+            and resposta.status_code in STATUS_RETENTAVEIS)
+
+
+def _resposta_do_cache(url: str, corpo: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = corpo
+    resp.url = url
+    resp.encoding = "utf-8"
+    resp.headers["Content-Type"] = "application/json"
+    resp.headers["X-Cache"] = "HIT"
+    return resp
+
+
+def endpoint(url: str) -> str:
+    """Rótulo do endpoint nas métricas: último trecho do caminho (archive, forecast)."""
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1] or urlsplit(url).netloc
+
+
+def get(url: str, params=None, timeout: float = 30, tentativas: int = 5,
+        espera_base: float = ESPERA_BASE, usar_cache: bool = False,
+        ttl: float | None = None) -> requests.Response:
+    """
+    GET pela sessão compartilhada, respeitando o limite de requisições
+    simultâneas por host.
+
+    Retenta erros de conexão/timeout e respostas 429/5xx. Devolve a última
+    resposta (o chamador decide se chama raise_for_status); só levanta
+    exceção quando o erro de rede persiste em todas as tentativas.
+
+    Com usar_cache=True consulta primeiro o cache em disco (src.cache) e
+    guarda lá as respostas 200; ttl=None significa que nunca expira.
+
+    Cada tentativa que sai para a rede consome a cota (src.cota); levanta
+    cota.CotaEsgotada se a cota acabou.
+    """
+    rotulo = endpoint(url)
+    if usar_cache:
+        corpo = cache.ler(url, params)
+        if corpo is not None:
+            metricas.contar("cache_hits_total", endpoint=rotulo)
+            return _resposta_do_cache(url, corpo)
+
+    custo = cota.custo(params)
+    for tentativa in range(1, tentativas + 1):
+        resp = None
+        cota.adquirir(custo)  # fora do slot: esperar cota não prende vaga do host
+        try:
+            with slot_host(url):
+                inicio = time.perf_counter()
+                try:
+                    resp = sessao().get(url, params=params, timeout=timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    metricas.registrar_requisicao(rotulo, type(e).__name__, time.perf_counter() - inicio)
+                    raise
+                metricas.registrar_requisicao(rotulo, resp.status_code, time.perf_counter() - inicio,
+                                              len(resp.content))
+            if resp.status_code not in STATUS_RETENTAVEIS:
+                if usar_cache and resp.status_code == 200:
+                    cache.gravar(url, params, resp.content, ttl)
+                if resp.status_code >= 400:
+                    metricas.contar("falhas_total", endpoint=rotulo)
+                return resp
+            motivo = f"HTTP {resp.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if tentativa >= tentativas:
+                metricas.contar("falhas_total", endpoint=rotulo)
+                raise
+            motivo = str(e)
+
+        if tentativa >= tentativas:
+            metricas.contar("falhas_total", endpoint=rotulo)
+            return resp
+
+        metricas.contar("retentativas_total", endpoint=rotulo,
+                        motivo=resp.status_code if resp is not None else "rede")
+
+        espera = calcular_espera(tentativa, espera_base, resp)
+        print(
+            f"Erro na tentativa {tentativa}/{tentativas} ({motivo}); "
+            f"aguardando {espera:.1f}s antes da nova tentativa..."
+        )
+        time.sleep(espera)
@@ -1,14 +1,101 @@
 import boto3
+import hashlib
+import threading
+import time
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import os
 
+from src import metricas
+from src.resumo import caminho_resumo
+
 BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO/moto local; vazio = AWS
+
+MB = 1024 ** 2
+# Transferência: multipart a partir de 8 MB, partes de 8 MB, 8 partes em paralelo.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_concurrency=8,
+    use_threads=True,
+)
+MAX_CONEXOES = 32
+WORKERS_UPLOAD = 4
+
+_cliente = None
+_lock = threading.Lock()
+
+
+def cliente_s3():
+    """
+    Cliente S3 único (boto3 clients são thread-safe) com pool de conexões
+    maior que o padrão, reaproveitado por todos os uploads.
+    """
+    global _cliente
+    with _lock:
+        if _cliente is None:
+            _cliente = boto3.client(
+                "s3",
+                endpoint_url=S3_ENDPOINT_URL or None,
+                config=Config(max_pool_connections=MAX_CONEXOES,
+                              retries={"max_attempts": 5, "mode": "adaptive"}),
+            )
+        return _cliente
+
+
+def chave_s3(caminho_local: str | Path, tipo: str, data_referencia: str) -> str:
+    """Prefixo Hive style: raw/clima/{tipo}/date=YYYY-MM-DD/{nome_arquivo}"""
+    return f"raw/clima/{tipo}/date={data_referencia}/{Path(caminho_local).name}"
+
+
+def _md5_e_etag(caminho: Path, tamanho_parte: int = TRANSFER_CONFIG.multipart_chunksize,
+                limite_multipart: int = TRANSFER_CONFIG.multipart_threshold):
+    """
+    Devolve (md5 hex do arquivo, ETag que o S3 calcularia no upload com
+    TRANSFER_CONFIG): md5 simples abaixo do limite de multipart, ou
+    md5(concatenação dos md5 das partes)-N acima dele.
+    """
+    md5_total = hashlib.md5()
+    md5_partes = []
+    with open(caminho, "rb") as f:
+        while True:
+            parte = f.read(tamanho_parte)
+            if not parte:
+                break
+            md5_total.update(parte)
+            md5_partes.append(hashlib.md5(parte).digest())
+    md5_hex = md5_total.hexdigest()
+    if caminho.stat().st_size < limite_multipart:
+        return md5_hex, md5_hex
+    etag = hashlib.md5(b"".join(md5_partes)).hexdigest() + f"-{len(md5_partes)}"
+    return md5_hex, etag
+
+
+def _objeto_inalterado(s3, bucket: str, prefix: str, caminho: Path, md5_hex: str, etag: str) -> bool:
+    """True se o objeto já existe com o mesmo tamanho e o mesmo MD5/ETag."""
+    try:
+        cabecalho = s3.head_object(Bucket=bucket, Key=prefix)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    if cabecalho.get("ContentLength") != caminho.stat().st_size:
+        return False
+    if cabecalho.get("Metadata", {}).get("md5") == md5_hex:
+        return True
+    return cabecalho.get("ETag", "").strip('"') == etag
+
 
 def upload_para_s3(
     caminho_local: str | Path,
     tipo: str,                # "diarios" ou "horarios"
     data_referencia: str,     # "YYYY-MM-DD"
-    bucket: str = BUCKET
+    bucket: str = BUCKET,
+    pular_se_igual: bool = True,
     #profile: str = "open-meteo"
 ):
     """
@@ -17,30 +104,98 @@ def upload_para_s3(
 
     tipo: "diarios" ou "horarios"
     data_referencia: string YYYY-MM-DD
+    pular_se_igual: não reenvia se o objeto já existe com mesmo tamanho e MD5/ETag
+
+    O resumo do dia (.resumo.json, src/resumo.py), se existir, vai junto para o mesmo prefixo.
     """
+    return _enviar_dia(caminho_local, tipo, data_referencia, bucket, pular_se_igual)["s3_uri"]
+
+
+def upload_chave_s3(caminho_local: str | Path, chave: str, bucket: str = BUCKET,
+                    pular_se_igual: bool = True) -> str:
+    """Como upload_para_s3, mas para uma chave explícita (fora de raw/clima/{tipo}/date=...)."""
+    return _enviar(caminho_local, None, None, bucket, pular_se_igual, chave=chave)["s3_uri"]
+
+
+def _enviar_dia(caminho_local, tipo, data_referencia, bucket, pular_se_igual=True) -> dict:
+    """Envia o parquet e, depois dele, o sidecar de resumo. Devolve o item do parquet."""
+    item = _enviar(caminho_local, tipo, data_referencia, bucket, pular_se_igual)
+    resumo = caminho_resumo(caminho_local)
+    if resumo.exists():
+        _enviar(resumo, tipo, data_referencia, bucket, pular_se_igual)
+    return item
+
+
+def _enviar(caminho_local, tipo, data_referencia, bucket, pular_se_igual=True, chave=None) -> dict:
+    """_enviar_arquivo + métricas (duração, resultado e bytes enviados)."""
+    inicio = time.perf_counter()
+    try:
+        item = _enviar_arquivo(caminho_local, tipo, data_referencia, bucket, pular_se_igual, chave)
+    except Exception:
+        metricas.contar("uploads_total", status="erro")
+        raise
+    metricas.observar("upload_segundos", time.perf_counter() - inicio)
+    metricas.contar("uploads_total", status=item["status"])
+    if item["status"] == "enviado":
+        metricas.contar("bytes_enviados_total", item["bytes"])
+    return item
 
+
+def _enviar_arquivo(caminho_local, tipo, data_referencia, bucket, pular_se_igual=True,
+                    chave=None) -> dict:
     caminho_local = Path(caminho_local)
     if not caminho_local.exists():
         raise FileNotFoundError(f"Arquivo local não encontrado: {caminho_local}")
 
-    # Nome do arquivo
-    nome_arquivo = caminho_local.name
+    prefix = chave or chave_s3(caminho_local, tipo, data_referencia)
+    s3 = cliente_s3()
+    md5_hex, etag = _md5_e_etag(caminho_local)
+    tamanho = caminho_local.stat().st_size
+
+    item = {
+        "arquivo": str(caminho_local),
+        "bucket": bucket,
+        "key": prefix,
+        "s3_uri": f"s3://{bucket}/{prefix}",
+        "bytes": tamanho,
+        "md5": md5_hex,
+    }
 
-    # Prefixo S3 no padrão Hive style
-    prefix = f"raw/clima/{tipo}/date={data_referencia}/{nome_arquivo}"
+    if pular_se_igual and _objeto_inalterado(s3, bucket, prefix, caminho_local, md5_hex, etag):
+        print(f"⏭️  Inalterado no S3, upload pulado: s3://{bucket}/{prefix}")
+        item["status"] = "inalterado"
+        return item
 
-    print(f"\n📤 Enviando para S3:")
+    print("\n📤 Enviando para S3:")
     print(f"   Bucket: {bucket}")
     print(f"   Prefixo: {prefix}")
     print(f"   Arquivo: {caminho_local}")
 
-    # Sessão boto3 usando o profile configurado 
-    #session = boto3.Session(profile_name=profile)
-    s3 = boto3.client("s3")
-
-    # Upload (sobrescreve automaticamente se já existir)
-    s3.upload_file(str(caminho_local), bucket, prefix)
+    # Upload (sobrescreve se já existir com conteúdo diferente)
+    s3.upload_file(
+        str(caminho_local), bucket, prefix,
+        ExtraArgs={"Metadata": {"md5": md5_hex}},
+        Config=TRANSFER_CONFIG,
+    )
 
     print("✅ Upload concluído com sucesso!\n")
+    item["status"] = "enviado"
+    return item
+
 
-    return f"s3://{bucket}/{prefix}"
+def upload_lote_s3(arquivos, bucket: str = BUCKET, workers: int = WORKERS_UPLOAD,
+                   pular_se_igual: bool = True) -> list:
+    """
+    Envia vários arquivos em paralelo (cada um com seu resumo, como
+    upload_para_s3). `arquivos` é uma lista de (caminho_local, tipo, data_referencia).
+
+    Devolve o manifesto: um dict por arquivo com arquivo, key, s3_uri,
+    bytes, md5 e status ("enviado" ou "inalterado"), na ordem de entrada.
+    """
+    arquivos = list(arquivos)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futuros = [
+            pool.submit(_enviar_dia, caminho, tipo, data_ref, bucket, pular_se_igual)
+            for caminho, tipo, data_ref in arquivos
+        ]
+        return [f.result() for f in futuros]
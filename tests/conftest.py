@@ -0,0 +1,71 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from scripts import fake_open_meteo  # noqa: E402
+from src import cache, cota, roteamento  # noqa: E402
+from src.coleta import ESPECIFICACOES, pasta_saida  # noqa: E402
+
+# módulos que guardam as URLs da API lidas na importação
+MODULOS_URL = {
+    "src.recupera_dados_api_dia": ["URL_ARCHIVE"],
+    "src.recupera_dados_api_hora": ["URL_ARCHIVE", "URL_FORECAST"],
+    "src.recupera_dados_api_combinado": ["URL_ARCHIVE"],
+    "src.roteamento": ["URL_ARCHIVE"],
+}
+
+
+@pytest.fixture
+def base_dir(tmp_path):
+    """BASE_DIR vazio com a estrutura de pastas do projeto."""
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    (tmp_path / "state").mkdir()
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def servidor_falso():
+    """scripts/fake_open_meteo.py numa porta livre, sem latência nem erros."""
+    servidor = fake_open_meteo.iniciar_servidor()
+    yield servidor
+    servidor.shutdown()
+
+
+@pytest.fixture
+def api_falsa(monkeypatch, servidor_falso):
+    """Fetchers apontando para o servidor falso, sem cache, sem cota e sem sondas anteriores."""
+    urls = servidor_falso.variaveis_ambiente()
+    for modulo, nomes in MODULOS_URL.items():
+        for nome in nomes:
+            env = "OPEN_METEO_ARCHIVE_URL" if nome == "URL_ARCHIVE" else "OPEN_METEO_FORECAST_URL"
+            monkeypatch.setattr(f"{modulo}.{nome}", urls[env])
+    monkeypatch.setitem(cache._config, "habilitado", False)
+    cota.configurar_cota(None)
+    roteamento.limpar()
+    servidor_falso.estatisticas = fake_open_meteo.Estatisticas()
+    yield servidor_falso
+    roteamento.limpar()
+
+
+def tabela_bruta(tipo: str, linhas: list) -> pa.Table:
+    """`linhas` (dicts) no schema do parquet publicado de `tipo`; colunas ausentes ficam nulas."""
+    schema = ESPECIFICACOES[tipo]["schema"]
+    return pa.table({c: pa.array([linha.get(c) for linha in linhas], type=schema.field(c).type)
+                     for c in schema.names})
+
+
+def gravar_bruto(base_dir: Path, tipo: str, dia, linhas: list) -> Path:
+    """Grava `linhas` (dicts) como o parquet publicado do dia em data/raw/<tipo>/."""
+    esp = ESPECIFICACOES[tipo]
+    destino = pasta_saida(base_dir, tipo) / f"{esp['prefixo']}_{dia:%Y%m%d}.parquet"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(tabela_bruta(tipo, linhas), destino)
+    return destino
@@ -0,0 +1,34 @@
+# tests/test_arquivos.py
+# Gravação atômica (src/arquivos.py): o arquivo final é o antigo ou o novo, nunca um pela metade.
+import numpy as np
+import pytest
+
+from src import arquivos
+
+
+def test_gravar_texto_substitui_o_arquivo(tmp_path):
+    destino = tmp_path / "state" / "cota.json"  # a pasta é criada
+    assert arquivos.gravar_texto(destino, "{}") == destino
+    arquivos.gravar_texto(destino, '{"janelas": {}}')
+    assert destino.read_text() == '{"janelas": {}}'
+    assert [p.name for p in destino.parent.iterdir()] == ["cota.json"]
+
+
+def test_erro_no_meio_mantem_o_anterior(tmp_path):
+    destino = tmp_path / "manifesto.json"
+    arquivos.gravar_texto(destino, "antigo")
+    with pytest.raises(RuntimeError):
+        with arquivos.gravacao_atomica(destino, sincronizar=True) as tmp:
+            tmp.write_text("novo pela met")
+            raise RuntimeError("disco cheio")
+    assert destino.read_text() == "antigo"
+    assert [p.name for p in tmp_path.iterdir()] == ["manifesto.json"]
+
+
+def test_sufixo_da_biblioteca(tmp_path):
+    destino = tmp_path / "municipios.npz"
+    with arquivos.gravacao_atomica(destino, sufixo=".tmp.npz") as tmp:
+        np.savez(tmp, codigo_ibge=np.array([3550308]))
+    with np.load(destino) as z:
+        assert z["codigo_ibge"].tolist() == [3550308]
+    assert [p.name for p in tmp_path.iterdir()] == ["municipios.npz"]
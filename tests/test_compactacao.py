@@ -0,0 +1,93 @@
+# tests/test_compactacao.py
+# Compactação mensal (src/compactacao.py): um row group por dia e reexecução segura.
+import os
+import random
+from datetime import date, timedelta
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from conftest import gravar_bruto
+from src import compactacao
+
+CODIGOS = [3550308, 1100015, 3304557]
+JANEIRO = [date(2025, 1, 1) + timedelta(days=i) for i in range(31)]
+
+
+def _linhas(dia, versao=0):
+    linhas = [{"data": dia, "codigo_ibge": c, "nome": f"M{c}", "nome_uf": "São Paulo",
+               "latitude": -23.0, "longitude": -46.0, "temp_max_c": 25.0 + dia.day / 10 + versao}
+              for c in CODIGOS]
+    random.Random(dia.toordinal()).shuffle(linhas)  # diários fora de ordem
+    return linhas
+
+
+def _gravar_dias(base_dir, dias):
+    return {dia: gravar_bruto(base_dir, "diario", dia, _linhas(dia)) for dia in dias}
+
+
+def test_mes_fechado_vira_um_row_group_por_dia(base_dir):
+    _gravar_dias(base_dir, JANEIRO + [date(2025, 2, 1), date(2025, 2, 2)])
+    assert compactacao.compactar(base_dir, "diario", date(2025, 2, 10)) == ["2025-01"]  # fevereiro aberto
+
+    entrada = compactacao.ler_manifesto(base_dir, "diario")["meses"]["2025-01"]
+    mensal = pq.ParquetFile(compactacao.pasta_mensal(base_dir, "diario") / entrada["arquivo"])
+    assert (entrada["dias"], entrada["linhas"]) == (31, 31 * 3)
+    assert mensal.metadata.num_rows == 31 * 3
+    assert mensal.num_row_groups == 31
+    for i, dia in enumerate(JANEIRO):
+        grupo = mensal.read_row_group(i)
+        assert pc.unique(grupo["data"]).to_pylist() == [dia]
+        assert grupo["codigo_ibge"].to_pylist() == sorted(CODIGOS)
+    assert [c.name for c in compactacao.arquivos_vigentes(base_dir, "diario")] == [
+        entrada["arquivo"], "dados_climaticos_diarios_20250201.parquet", "dados_climaticos_diarios_20250202.parquet",
+    ]
+
+
+def test_reexecutar_nao_muda_nada(base_dir):
+    _gravar_dias(base_dir, JANEIRO)
+    compactacao.compactar(base_dir, "diario", date(2025, 1, 31))
+    pasta = compactacao.pasta_mensal(base_dir, "diario")
+    antes = {p.name: (p.read_bytes(), p.stat().st_mtime_ns) for p in pasta.iterdir()}
+
+    assert compactacao.compactar(base_dir, "diario", date(2025, 1, 31)) == []
+    depois = {p.name: (p.read_bytes(), p.stat().st_mtime_ns) for p in pasta.iterdir()}
+    assert depois == antes  # mensal e manifesto intactos, sem temporários
+    assert sorted(antes) == ["dados_climaticos_diarios_202501.parquet", "manifesto.json"]
+
+
+def test_reexecutar_com_upload_so_reenvia_o_manifesto(base_dir):
+    _gravar_dias(base_dir, JANEIRO)
+    enviados = []
+
+    def enviar(caminho, chave):
+        enviados.append(chave)
+        return chave
+
+    compactacao.compactar(base_dir, "diario", date(2025, 1, 31), enviar=enviar)
+    meses = compactacao.ler_manifesto(base_dir, "diario")["meses"]
+    assert enviados == ["raw/clima_mensal/diario/mes=2025-01/dados_climaticos_diarios_202501.parquet",
+                        "raw/clima_mensal/diario/manifesto.json"]
+
+    enviados.clear()
+    assert compactacao.compactar(base_dir, "diario", date(2025, 1, 31), enviar=enviar) == []
+    assert enviados == ["raw/clima_mensal/diario/manifesto.json"]
+    assert compactacao.ler_manifesto(base_dir, "diario")["meses"] == meses
+
+
+def test_diario_alterado_refaz_o_mes(base_dir):
+    caminhos = _gravar_dias(base_dir, JANEIRO)
+    compactacao.compactar(base_dir, "diario", date(2025, 1, 31))
+
+    # retomada regravou o dia 15 com valores novos
+    gravar_bruto(base_dir, "diario", JANEIRO[14], _linhas(JANEIRO[14], versao=1))
+    os.utime(caminhos[JANEIRO[14]], ns=(1, 1))  # mtime diferente mesmo com o relógio grosso
+    vigentes = compactacao.arquivos_vigentes(base_dir, "diario")
+    assert len(vigentes) == 31 and all(c.parent.name == "diario" for c in vigentes)  # mensal vencido
+
+    assert compactacao.compactar(base_dir, "diario", date(2025, 1, 31)) == ["2025-01"]
+    entrada = compactacao.ler_manifesto(base_dir, "diario")["meses"]["2025-01"]
+    assert entrada["linhas"] == 31 * 3
+    mensal = pq.read_table(compactacao.pasta_mensal(base_dir, "diario") / entrada["arquivo"])
+    dia_15 = mensal.filter(pc.equal(mensal["data"], JANEIRO[14]))
+    assert dia_15["temp_max_c"].to_pylist() == [27.5] * 3  # 25 + 15/10 + 1
@@ -0,0 +1,136 @@
+# tests/test_cota.py
+# Baldes de cota (src/cota.py) com relógio falso: sem esperas de verdade.
+import json
+
+import pytest
+
+from src import cota
+
+
+class Relogio:
+    """Substitui o módulo time em src.cota: sleep só avança o relógio."""
+
+    def __init__(self):
+        self.agora = 1_000_000.0
+        self.esperas = []
+
+    def time(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = Relogio()
+    monkeypatch.setattr(cota, "time", r)
+    yield r
+    cota.configurar_cota(None)
+
+
+def _fichas(janela="minuto"):
+    return cota.disponivel()[janela][0]
+
+
+def test_reabastece_e_para_no_limite(relogio):
+    cota.configurar_cota({"minuto": 60, "hora": 3600})
+    cota.adquirir(30)
+    assert cota.disponivel() == {"minuto": (30.0, 60.0), "hora": (3570.0, 3600.0)}
+
+    relogio.agora += 10  # 1 ficha/s nas duas janelas
+    assert cota.disponivel() == {"minuto": (40.0, 60.0), "hora": (3580.0, 3600.0)}
+
+    relogio.agora += 1000
+    assert cota.disponivel() == {"minuto": (60.0, 60.0), "hora": (3600.0, 3600.0)}
+    assert relogio.esperas == []
+
+
+def test_reserva_deixa_o_balde_negativo_e_quem_chega_depois_espera_mais(relogio):
+    cota.configurar_cota({"minuto": 60})
+    cota.adquirir(50)
+    cota.adquirir(30)  # faltam 20 fichas a 1/s
+    assert relogio.esperas == [20.0]
+    assert _fichas() == 0.0  # a espera pagou o saldo negativo
+
+    relogio.sleep = relogio.esperas.append  # espera sem avançar: o próximo já vê o saldo reservado
+    cota.adquirir(10)
+    cota.adquirir(10)
+    assert relogio.esperas == [20.0, 10.0, 20.0]
+    assert cota._baldes["minuto"]["fichas"] == -20.0
+
+
+def test_requisicao_maior_que_a_janela_espera_so_a_janela_cheia(relogio):
+    cota.configurar_cota({"minuto": 60})
+    cota.adquirir(60)
+    cota.adquirir(500)
+    assert relogio.esperas == [60.0]
+
+
+def test_cota_esgotada_na_espera_maxima_e_em_toda_chamada_seguinte(relogio, tmp_path):
+    caminho = tmp_path / "state" / "cota.json"
+    cota.configurar_cota({"minuto": 60}, espera_maxima=5, caminho=caminho)
+    cota.adquirir(57)
+    cota.adquirir(8)  # faltam 5 fichas: espera exatamente a máxima
+    assert relogio.esperas == [5.0]
+
+    with pytest.raises(cota.CotaEsgotada, match="cota por minuto esgotada"):
+        cota.adquirir(6)
+    assert relogio.esperas == [5.0]  # não espera nem reserva
+    assert json.loads(caminho.read_text())["janelas"]["minuto"]["fichas"] == 0.0  # gravado na hora
+
+    relogio.agora += 3600  # mesmo com o balde cheio de novo, o resto da execução fica adiado
+    with pytest.raises(cota.CotaEsgotada):
+        cota.adquirir(1)
+    assert _fichas() == 60.0
+
+
+def test_sem_limites_nao_controla_nada(relogio):
+    cota.configurar_cota(None)
+    assert not cota.ativa()
+    cota.adquirir(1e9)
+    assert relogio.esperas == []
+
+
+@pytest.mark.parametrize("params, esperado", [
+    # lote diário: 50 locais, 12 variáveis, 31 dias → 50 × 1,2 × 31/14
+    ({"latitude": ",".join(["-23.5"] * 50), "daily": ",".join(f"v{i}" for i in range(12)),
+      "start_date": "2025-01-01", "end_date": "2025-01-31"}, 50 * 1.2 * 31 / 14),
+    # horário: 4 variáveis e até 14 dias não multiplicam
+    ({"latitude": "-23.5,-22.9", "hourly": "a,b,c,d", "start_date": "2025-01-01",
+      "end_date": "2025-01-14"}, 2.0),
+    # combinado: daily + hourly somam variáveis (12 + 4 = 16)
+    ({"latitude": "-23.5", "daily": ",".join(f"v{i}" for i in range(12)), "hourly": "a,b,c,d",
+      "start_date": "2025-01-15"}, 1.6),
+    # incremental por horas, atravessando a meia-noite: 2 dias
+    ({"latitude": "-23.5", "hourly": "a", "start_hour": "2025-01-15T22:00",
+      "end_hour": "2025-01-16T03:00"}, 1.0),
+    # sem datas: past_days + forecast_days (7 por padrão)
+    ({"latitude": "-23.5", "hourly": "a", "past_days": 21}, 28 / 14),
+])
+def test_custo(params, esperado):
+    assert cota.custo(params) == pytest.approx(esperado)
+
+
+def test_estado_relido_do_disco_so_com_os_mesmos_limites(relogio, tmp_path):
+    caminho = tmp_path / "cota.json"
+    cota.configurar_cota({"hora": 3600, "dia": 10000}, caminho=caminho)
+    cota.adquirir(1000)
+    cota.salvar()
+
+    relogio.agora += 600  # nova execução 10 min depois: a hora reabasteceu 600, o dia ~69
+    cota.configurar_cota({"hora": 3600, "dia": 10000}, caminho=caminho)
+    assert cota.disponivel()["hora"] == (3200.0, 3600.0)
+    assert cota.disponivel()["dia"][0] == pytest.approx(9000 + 600 * 10000 / 86400)
+
+    # limite do dia mudou: esse balde recomeça cheio, o da hora continua
+    cota.configurar_cota({"hora": 3600, "dia": 20000}, caminho=caminho)
+    assert cota.disponivel() == {"hora": (3200.0, 3600.0), "dia": (20000.0, 20000.0)}
+
+
+def test_estado_corrompido_recomeca_cheio(relogio, tmp_path):
+    caminho = tmp_path / "cota.json"
+    caminho.write_text("{não é json")
+    cota.configurar_cota({"minuto": 60}, caminho=caminho)
+    assert cota.disponivel() == {"minuto": (60.0, 60.0)}
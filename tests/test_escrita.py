@@ -0,0 +1,115 @@
+# tests/test_escrita.py
+# EscritorParquetDiario (src/escrita.py): intercalação das sequências ordenadas,
+# publicação atômica e mescla com o arquivo do dia.
+import random
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import tabela_bruta
+from src import escrita
+from src.coleta import ESPECIFICACOES
+from src.escrita import EscritorParquetDiario
+
+ESP = ESPECIFICACOES["horario"]
+CHAVES = [(c, "ascending") for c in ESP["ordenar_por"]]
+DIAS = [date(2025, 1, 15), date(2025, 1, 16)]
+
+
+@pytest.fixture(autouse=True)
+def row_groups_pequenos(monkeypatch):
+    # sequências de vários row groups mesmo com poucas linhas
+    monkeypatch.setattr(escrita, "LINHAS_POR_LEITURA", 7)
+
+
+def _grupo(codigos, dias=DIAS, versao=0, semente=0):
+    """Todas as horas de `dias` para `codigos`, embaralhadas."""
+    linhas = [
+        {"data_hora": datetime(d.year, d.month, d.day, h), "codigo_ibge": c,
+         "municipio": f"M{c}", "uf": "São Paulo", "latitude": -23.0, "longitude": -46.0,
+         "temperatura_c": 20.0 + h / 10 + versao, "fonte": "archive"}
+        for c in codigos for d in dias for h in range(24)
+    ]
+    random.Random(semente).shuffle(linhas)
+    return tabela_bruta("horario", linhas)
+
+
+def _escritor(pasta, **kwargs):
+    return EscritorParquetDiario(pasta, ESP["prefixo"], schema=ESP["schema"],
+                                 ordenar_por=ESP["ordenar_por"], linhas_por_grupo=50, **kwargs)
+
+
+def _escrever(escritor, tabela):
+    escritor.escrever(tabela, ESP["datas"](tabela))
+
+
+def _temporarios(pasta):
+    return sorted(p.name for p in pasta.iterdir() if p.name.startswith("."))
+
+
+def test_intercala_grupos_desordenados(tmp_path):
+    codigos = list(range(1, 31))
+    random.Random(1).shuffle(codigos)
+    grupos = [_grupo(codigos[i:i + 5], semente=i) for i in range(0, len(codigos), 5)]
+
+    escritor = _escritor(tmp_path)
+    for grupo in grupos:
+        _escrever(escritor, grupo)
+    caminhos = escritor.fechar()
+
+    assert sorted(caminhos) == DIAS
+    assert _temporarios(tmp_path) == []
+    tudo = pa.concat_tables(grupos)
+    for dia, caminho in caminhos.items():
+        esperado = tudo.filter(pc.equal(ESP["datas"](tudo), dia.isoformat())).sort_by(CHAVES)
+        arquivo = pq.ParquetFile(caminho)
+        obtido = arquivo.read()
+        assert obtido.num_rows == esperado.num_rows == 30 * 24
+        assert obtido.to_pylist() == esperado.to_pylist()
+        # row groups de linhas_por_grupo linhas, com a ordenação declarada
+        assert arquivo.num_row_groups == -(-obtido.num_rows // 50)
+        colunas = arquivo.metadata.row_group(0).sorting_columns
+        assert [obtido.schema.names[c.column_index] for c in colunas] == ESP["ordenar_por"]
+
+
+def test_erro_antes_de_fechar_nao_publica_nada(tmp_path):
+    with pytest.raises(RuntimeError):
+        with _escritor(tmp_path) as escritor:
+            _escrever(escritor, _grupo([1, 2, 3]))
+            raise RuntimeError("coleta interrompida")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_erro_antes_de_fechar_mantem_o_arquivo_anterior(tmp_path):
+    escritor = _escritor(tmp_path)
+    _escrever(escritor, _grupo([1, 2], dias=DIAS[:1]))
+    [caminho] = escritor.fechar().values()
+    antes = caminho.read_bytes()
+
+    with pytest.raises(RuntimeError):
+        with _escritor(tmp_path, mesclar_excluindo={2}) as escritor:
+            _escrever(escritor, _grupo([2, 3], dias=DIAS[:1], versao=1))
+            raise RuntimeError("coleta interrompida")
+    assert caminho.read_bytes() == antes
+    assert _temporarios(tmp_path) == []
+
+
+def test_mescla_com_o_arquivo_do_dia(tmp_path):
+    dia = DIAS[:1]
+    escritor = _escritor(tmp_path)
+    _escrever(escritor, _grupo([5, 1, 3], dias=dia))
+    escritor.fechar()
+
+    # refaz o município 3 e acrescenta o 2: o 3 antigo sai, 1 e 5 ficam
+    escritor = _escritor(tmp_path, mesclar_excluindo={3})
+    novos = [_grupo([3], dias=dia, versao=1, semente=1), _grupo([2], dias=dia, versao=1, semente=2)]
+    for grupo in novos:
+        _escrever(escritor, grupo)
+    [caminho] = escritor.fechar().values()
+
+    esperado = pa.concat_tables([_grupo([5, 1], dias=dia)] + novos).sort_by(CHAVES)
+    assert pq.read_table(caminho).to_pylist() == esperado.to_pylist()
+    assert _temporarios(tmp_path) == []
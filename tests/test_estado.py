@@ -0,0 +1,119 @@
+# tests/test_estado.py
+# Ledger por município (src/estado.py) e o plano de retomada de main.py.
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+import main
+from src import estado
+
+CODIGOS = [1, 2, 3, 4]
+D = date(2025, 1, 10)
+
+
+def _dia(n: int) -> date:
+    return D + timedelta(days=n)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    con = estado.conectar(tmp_path)
+    yield con
+    con.close()
+
+
+def _registrar(ledger, n, ok, falhas=None, tipo="diario"):
+    parquet = Path(f"data/raw/{tipo}/{_dia(n):%Y%m%d}.parquet") if ok else None
+    estado.registrar_coleta(ledger, tipo, _dia(n), ok, falhas or {}, parquet)
+
+
+def test_lacunas_em_datas_nao_consecutivas(ledger):
+    # dias 0, 2 e 5 completos; 1 parcial; 3 e 4 nunca coletados; 6 com falha
+    for n in (0, 2, 5):
+        _registrar(ledger, n, CODIGOS)
+    _registrar(ledger, 1, [1, 2])
+    _registrar(ledger, 6, [1, 2, 3], {4: "HTTP 400"})
+
+    assert estado.lacunas(ledger, "diario", CODIGOS, _dia(0), _dia(6)) == {
+        _dia(1): {3, 4},
+        _dia(3): set(CODIGOS),
+        _dia(4): set(CODIGOS),
+        _dia(6): {4},
+    }
+    # só os municípios pedidos e só o tipo pedido
+    assert estado.lacunas(ledger, "diario", [1, 2], _dia(0), _dia(6)) == {
+        _dia(3): {1, 2}, _dia(4): {1, 2},
+    }
+    assert estado.lacunas(ledger, "horario", [1], _dia(0), _dia(1)) == {_dia(0): {1}, _dia(1): {1}}
+
+
+def test_falha_e_adiado_voltam_ao_plano_ate_dar_ok(ledger):
+    _registrar(ledger, 0, [1, 2], {3: "HTTP 503", 4: estado.MOTIVO_ARCHIVE})
+    assert estado.tem_falhas(ledger, "diario", _dia(0))
+    assert estado.tem_adiados(ledger, "diario", _dia(0))
+    assert estado.primeira_data_adiada(ledger, ["diario", "horario"]) == _dia(0)
+    assert main._plano_retomada(ledger, "diario", CODIGOS, _dia(0), _dia(0), 31) == [
+        (_dia(0), _dia(0), {3, 4}),
+    ]
+    status = dict(ledger.execute("SELECT codigo_ibge, status FROM coletas").fetchall())
+    assert status == {1: "ok", 2: "ok", 3: "falha", 4: "adiado"}
+
+    _registrar(ledger, 0, [3, 4])
+    assert main._plano_retomada(ledger, "diario", CODIGOS, _dia(0), _dia(0), 31) == []
+    assert not estado.tem_falhas(ledger, "diario", _dia(0))
+    assert estado.primeira_data_adiada(ledger, ["diario"]) is None
+    (tentativas,) = ledger.execute("SELECT tentativas FROM coletas WHERE codigo_ibge = 3").fetchone()
+    assert tentativas == 2
+
+
+def test_plano_junta_dias_consecutivos_com_os_mesmos_pendentes(ledger):
+    # 0-3: faltam {3, 4}; 4: falta {4}; 5-6 completos; 7-9: faltam {3, 4} de novo
+    for n in range(10):
+        if n in (5, 6):
+            _registrar(ledger, n, CODIGOS)
+        elif n == 4:
+            _registrar(ledger, n, [1, 2, 3])
+        else:
+            _registrar(ledger, n, [1, 2])
+
+    assert main._plano_retomada(ledger, "diario", CODIGOS, _dia(0), _dia(9), 31) == [
+        (_dia(0), _dia(3), {3, 4}),
+        (_dia(4), _dia(4), {4}),
+        (_dia(7), _dia(9), {3, 4}),
+    ]
+
+
+def test_plano_respeita_janela_dias(ledger):
+    # nada coletado em 10 dias: períodos de no máximo 4 dias
+    assert main._plano_retomada(ledger, "diario", CODIGOS, _dia(0), _dia(9), 4) == [
+        (_dia(0), _dia(3), set(CODIGOS)),
+        (_dia(4), _dia(7), set(CODIGOS)),
+        (_dia(8), _dia(9), set(CODIGOS)),
+    ]
+    assert main._plano_retomada(ledger, "diario", CODIGOS, _dia(0), _dia(2), 1) == [
+        (_dia(n), _dia(n), set(CODIGOS)) for n in range(3)
+    ]
+
+
+def test_uploads_pendentes(ledger):
+    _registrar(ledger, 0, [1, 2])
+    _registrar(ledger, 1, [1], {2: "HTTP 500"})
+    _registrar(ledger, 2, [], {1: "HTTP 500"})  # nada gravado: nada a enviar
+    _registrar(ledger, 0, [1], tipo="horario")
+    assert estado.uploads_pendentes(ledger, "diario") == {
+        _dia(0): Path(f"data/raw/diario/{_dia(0):%Y%m%d}.parquet"),
+        _dia(1): Path(f"data/raw/diario/{_dia(1):%Y%m%d}.parquet"),
+    }
+
+    estado.registrar_upload(ledger, "diario", _dia(0), "raw/clima/diario/date=2025-01-10/x.parquet")
+    assert list(estado.uploads_pendentes(ledger, "diario")) == [_dia(1)]
+    assert list(estado.uploads_pendentes(ledger, "horario")) == [_dia(0)]
+
+    # o arquivo da data foi regravado (retomada do município 2): precisa de novo upload
+    _registrar(ledger, 0, [2])
+    assert sorted(estado.uploads_pendentes(ledger, "diario")) == [_dia(0), _dia(1)]
+    chaves = {c: k for c, k in ledger.execute(
+        "SELECT codigo_ibge, s3_key FROM coletas WHERE tipo = 'diario' AND data = ?",
+        (_dia(0).isoformat(),))}
+    assert chaves == {1: None, 2: None}
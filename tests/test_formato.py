@@ -0,0 +1,91 @@
+# tests/test_formato.py
+# Leitura das respostas (src/formato.py): FlatBuffers e JSON de
+# scripts/fake_open_meteo.py decodificados para os mesmos tempos e valores.
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+import requests
+
+from src import formato
+from src.recupera_dados_api_dia import VARIAVEIS_DIARIAS, get_clima_diario_por_lote, separar_locais
+from src.recupera_dados_api_hora import VARIAVEIS_HORARIAS
+
+COORDS = [(-23.55, -46.63), (-22.91, -43.17), (-3.73, -38.52)]
+ONTEM = date.today() - timedelta(days=1)
+CONSULTAS = {
+    "diario_archive": ("archive", {"daily": VARIAVEIS_DIARIAS, "start_date": "2024-01-15",
+                                   "end_date": "2024-01-21"}),
+    "horario_archive": ("archive", {"hourly": VARIAVEIS_HORARIAS, "start_date": "2024-01-15",
+                                    "end_date": "2024-01-16"}),
+    "horario_forecast": ("forecast", {"hourly": VARIAVEIS_HORARIAS,
+                                      "start_hour": f"{ONTEM}T07:00", "end_hour": f"{ONTEM}T18:00"}),
+}
+
+
+def _consultar(servidor, endpoint, params, coords, binario):
+    params = {**params, "timezone": "America/Sao_Paulo",
+              "latitude": ",".join(str(la) for la, _ in coords),
+              "longitude": ",".join(str(lo) for _, lo in coords)}
+    pedido = {**params, "format": formato.FLATBUFFERS} if binario else params
+    resp = requests.get(f"{servidor.url_base}/v1/{endpoint}", params=pedido, timeout=10)
+    resp.raise_for_status()
+    return resp, params
+
+
+def _comparar(binario, texto):
+    for chave in formato.BLOCOS:
+        if chave not in texto:
+            continue
+        assert binario[chave]["time"] == texto[chave]["time"]
+        assert set(binario[chave]) == set(texto[chave])
+        for var, valores in texto[chave].items():
+            if var != "time":
+                assert isinstance(binario[chave][var], np.ndarray)
+                np.testing.assert_allclose(binario[chave][var], np.asarray(valores, dtype=np.float32))
+
+
+@pytest.mark.parametrize("consulta", CONSULTAS)
+@pytest.mark.parametrize("n_locais", [1, len(COORDS)])
+def test_flatbuffers_igual_ao_json(servidor_falso, consulta, n_locais):
+    endpoint, params = CONSULTAS[consulta]
+    coords = COORDS[:n_locais]
+    resp_fb, params = _consultar(servidor_falso, endpoint, params, coords, binario=True)
+    resp_js, _ = _consultar(servidor_falso, endpoint, params, coords, binario=False)
+    assert resp_fb.content[:1] not in (b"{", b"[")  # chegou mesmo em binário
+
+    binarios = separar_locais(formato.ler(resp_fb, params))
+    textos = separar_locais(formato.ler(resp_js, params))
+    assert isinstance(formato.ler(resp_fb, params), list) == (n_locais > 1)  # 1 local → objeto, como o JSON
+    assert len(binarios) == len(textos) == n_locais
+    for binario, texto in zip(binarios, textos):
+        assert binario["utc_offset_seconds"] == texto["utc_offset_seconds"]
+        assert (binario["latitude"], binario["longitude"]) == pytest.approx(
+            (texto["latitude"], texto["longitude"]), abs=1e-4)
+        _comparar(binario, texto)
+
+
+def test_lote_diario_com_flatbuffers(api_falsa, monkeypatch):
+    monkeypatch.setattr(formato, "FORMATO", formato.JSON)
+    textos = get_clima_diario_por_lote(COORDS, "2024-01-15", dia_fim_str="2024-01-17")
+    assert formato.configurar_formato(formato.FLATBUFFERS) == formato.FLATBUFFERS
+    binarios = get_clima_diario_por_lote(COORDS, "2024-01-15", dia_fim_str="2024-01-17")
+    for binario, texto in zip(binarios, textos):
+        _comparar(binario, texto)
+
+
+def test_sem_sdk_fica_no_json(servidor_falso, monkeypatch, capsys):
+    monkeypatch.setattr(formato, "FORMATO", formato.JSON)
+    monkeypatch.setattr(formato, "WeatherApiResponse", None)
+
+    assert formato.configurar_formato(formato.FLATBUFFERS) == formato.JSON
+    assert "openmeteo-sdk não instalado" in capsys.readouterr().out
+    assert "format" not in formato.com_formato({"daily": VARIAVEIS_DIARIAS})
+
+    # uma resposta JSON é lida mesmo sem o sdk; um corpo binário não tem como ser
+    endpoint, params = CONSULTAS["diario_archive"]
+    resp_js, params = _consultar(servidor_falso, endpoint, params, COORDS, binario=False)
+    assert len(formato.ler(resp_js, params)) == len(COORDS)
+    resp_fb, _ = _consultar(servidor_falso, endpoint, params, COORDS, binario=True)
+    with pytest.raises(RuntimeError, match="openmeteo-sdk"):
+        formato.ler(resp_fb, params)
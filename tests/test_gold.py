@@ -0,0 +1,155 @@
+# tests/test_gold.py
+# src.gold contra gold_metricas_clima.sql (e o bronze/silver antes dele). Os
+# valores esperados saem do SQL:
+#   classificacao_temperatura  < 18 frio | BETWEEN 18 AND 30 agradavel |
+#                              BETWEEN 30 AND 35 quente | muito_quente
+#   classificacao_chuva        <= 5 baixa | <= 20 moderada | alta
+#   teve_chuva                 chuva_mm > 0
+#   silver                     COALESCE(medida, 0), CASE uf WHEN 'São Paulo' THEN 'SP' ...,
+#                              UPPER(municipio)
+from datetime import date, datetime
+
+import pytest
+
+from conftest import gravar_bruto
+from src import gold
+
+DIA = date(2025, 1, 15)
+
+
+def _municipio(codigo, nome, uf, **medidas):
+    linha = {
+        "data": DIA, "codigo_ibge": codigo, "nome": nome, "nome_uf": uf,
+        "latitude": -10.0 - codigo, "longitude": -50.0 + codigo,
+        "temp_max_c": 25.0, "temp_min_c": 15.0,
+        "sensacao_termica_max_c": 26.0, "sensacao_termica_min_c": 14.0,
+        "precipitacao_total_mm": 1.0, "chuva_mm": 1.0, "neve_mm": 0.0,
+        "vento_velocidade_max_kmh": 10.0, "rajadas_vento_max_kmh": None,
+        "vento_direcao_dominante_graus": 90, "radiacao_solar_mj_m2": 12.0, "codigo_tempo_wmo": 3,
+    }
+    linha.update(medidas)
+    return linha
+
+
+DIARIO = [
+    _municipio(1, "São Paulo", "São Paulo", temp_max_c=17.9, precipitacao_total_mm=5.0,
+               chuva_mm=0.0, radiacao_solar_mj_m2=25.3),
+    _municipio(2, "Campinas", "São Paulo", temp_max_c=18.0, precipitacao_total_mm=5.1,
+               chuva_mm=0.1, radiacao_solar_mj_m2=25.3),
+    _municipio(3, "Rio de Janeiro", "Rio de Janeiro", temp_max_c=30.0, precipitacao_total_mm=20.0,
+               vento_velocidade_max_kmh=40.5),
+    _municipio(4, "Niterói", "Rio de Janeiro", temp_max_c=30.1, precipitacao_total_mm=20.1),
+    _municipio(5, "Cuiabá", "Mato Grosso", temp_max_c=35.0, temp_min_c=None,
+               precipitacao_total_mm=None, chuva_mm=None),
+    _municipio(6, "Palmas", "Tocantins", temp_max_c=36.0),
+    _municipio(7, "Teresina", "Piauí", temp_max_c=36.0),
+    _municipio(8, "Atlantis", "Narnia", temp_max_c=25.3),
+]
+
+# codigo_ibge → (municipio, uf, temp_max_c, temp_min_c, precipitacao_total_mm,
+#                teve_chuva, classificacao_chuva, classificacao_temperatura)
+HISTORICO_ESPERADO = {
+    1: ("SÃO PAULO", "SP", 17.9, 15.0, 5.0, 0, "baixa", "frio"),
+    2: ("CAMPINAS", "SP", 18.0, 15.0, 5.1, 1, "moderada", "agradavel"),
+    3: ("RIO DE JANEIRO", "RJ", 30.0, 15.0, 20.0, 1, "moderada", "agradavel"),
+    4: ("NITERÓI", "RJ", 30.1, 15.0, 20.1, 1, "alta", "quente"),
+    5: ("CUIABÁ", "MT", 35.0, 0.0, 0.0, 0, "baixa", "quente"),
+    6: ("PALMAS", "TO", 36.0, 15.0, 1.0, 1, "baixa", "muito_quente"),
+    7: ("TERESINA", "PI", 36.0, 15.0, 1.0, 1, "baixa", "muito_quente"),
+    8: ("ATLANTIS", None, 25.3, 15.0, 1.0, 1, "baixa", "agradavel"),
+}
+
+# tipo_extremo → ({codigo_ibge que empatam no extremo}, valor)
+EXTREMOS_ESPERADOS = {
+    "temp_max_maior": ({6, 7}, 36.0),
+    "temp_min_menor": ({5}, 0.0),                    # nulo → 0 no silver
+    "chuva_maior": ({4}, 20.1),
+    "vento_maior": ({3}, 40.5),
+    "rajada_maior": ({1, 2, 3, 4, 5, 6, 7, 8}, 0.0),  # todas nulas → 0, todas empatam
+    "radiacao_maior": ({1, 2}, 25.3),
+}
+
+
+@pytest.fixture
+def gold_diario(base_dir):
+    gravar_bruto(base_dir, "diario", DIA, DIARIO)
+    assert gold.atualizar(base_dir, "diario") == [DIA]
+    return base_dir
+
+
+def test_historico_segue_o_sql(gold_diario):
+    tabela = gold.ler_tabela(gold_diario, gold.DIARIO_HISTORICO)
+    obtido = {
+        linha["codigo_ibge"]: (
+            linha["municipio"], linha["uf"], linha["temp_max_c"], linha["temp_min_c"],
+            linha["precipitacao_total_mm"], linha["teve_chuva"], linha["classificacao_chuva"],
+            linha["classificacao_temperatura"],
+        )
+        for linha in tabela.to_pylist()
+    }
+    assert obtido == HISTORICO_ESPERADO
+
+
+def test_historico_derivadas(gold_diario):
+    linhas = {l["codigo_ibge"]: l for l in gold.ler_tabela(gold_diario, gold.DIARIO_HISTORICO).to_pylist()}
+    assert linhas[1]["amplitude_termica_c"] == pytest.approx(17.9 - 15.0)
+    assert linhas[5]["amplitude_termica_c"] == pytest.approx(35.0)
+    assert linhas[1]["sensacao_termica_media_c"] == pytest.approx(20.0)
+    assert linhas[1]["radiacao_solar_kwh_m2"] == pytest.approx(25.3 * 0.2778)
+    assert (linhas[1]["ano"], linhas[1]["mes"], linhas[1]["dia"]) == (2025, 1, 15)
+
+
+def test_extremos_com_empates(gold_diario):
+    tabela = gold.ler_tabela(gold_diario, gold.EXTREMOS)
+    obtido = {}
+    for linha in tabela.to_pylist():
+        codigos, valores = obtido.setdefault(linha["tipo_extremo"], (set(), set()))
+        codigos.add(linha["codigo_ibge"])
+        valores.add(linha["valor"])
+    assert obtido == {tipo: (codigos, {valor}) for tipo, (codigos, valor) in EXTREMOS_ESPERADOS.items()}
+    # UNION ALL: uma linha por município empatado em cada tipo
+    assert tabela.num_rows == sum(len(codigos) for codigos, _ in EXTREMOS_ESPERADOS.values())
+
+
+def test_tendencias_de_um_dia(gold_diario):
+    linhas = {l["codigo_ibge"]: l for l in gold.ler_tabela(gold_diario, gold.TENDENCIAS).to_pylist()}
+    # uma linha na janela: médias móveis = valor do dia, tendência 0, anomalia de chuva = chuva - chuva/30
+    assert linhas[6]["media_movel_7d_temp"] == pytest.approx((36.0 + 15.0) / 2)
+    assert linhas[6]["tendencia_temp"] == pytest.approx(0.0)
+    assert linhas[6]["chuva_mes_total"] == pytest.approx(1.0)
+    assert linhas[6]["anomalia_chuva"] == pytest.approx(1.0 - 1.0 / 30)
+    assert linhas[5]["temp_media"] == pytest.approx(17.5)
+
+
+def test_segunda_execucao_nao_refaz_nada(gold_diario):
+    assert gold.atualizar(gold_diario, "diario") == []
+
+
+HORAS = [
+    # (hora, temperatura_c, precipitacao_mm) → (periodo_dia, classificacao_temperatura, teve_chuva)
+    (0, None, None, "madrugada", "frio", 0),
+    (4, 14.9, 0.0, "madrugada", "frio", 0),
+    (5, 15.0, 0.2, "manha", "agradavel", 1),
+    (11, 25.0, 0.0, "manha", "agradavel", 0),
+    (12, 25.1, 0.0, "tarde", "quente", 0),
+    (17, 32.0, 0.0, "tarde", "quente", 0),
+    (18, 32.1, 0.0, "noite", "muito_quente", 0),
+    (23, 20.0, 0.0, "noite", "agradavel", 0),
+]
+
+
+def test_horario_analitico_segue_o_sql(base_dir):
+    gravar_bruto(base_dir, "horario", DIA, [
+        {"data_hora": datetime(2025, 1, 15, hora), "codigo_ibge": 1, "municipio": "São Paulo",
+         "uf": "São Paulo", "latitude": -23.5, "longitude": -46.6, "temperatura_c": temp,
+         "umidade_relativa": None, "precipitacao_mm": chuva, "velocidade_vento_ms": 2.0,
+         "fonte": "archive"}
+        for hora, temp, chuva, *_ in HORAS
+    ])
+    assert gold.atualizar(base_dir, "horario") == [DIA]
+    linhas = sorted(gold.ler_tabela(base_dir, gold.HORARIO_ANALITICO).to_pylist(), key=lambda l: l["hora"])
+    assert [(l["hora"], l["periodo_dia"], l["classificacao_temperatura"], l["teve_chuva"]) for l in linhas] == [
+        (hora, periodo, classe, chuva) for hora, _, _, periodo, classe, chuva in HORAS
+    ]
+    assert {(l["municipio"], l["uf"], l["data"]) for l in linhas} == {("SÃO PAULO", "SP", DIA)}
+    assert linhas[0]["temperatura_c"] == 0.0 and linhas[0]["umidade_relativa"] == 0.0
@@ -0,0 +1,111 @@
+# tests/test_incremental.py
+# Coleta horária incremental (src/incremental.py): plano por hora inicial e
+# marcas d'água que só avançam depois do upload. Forecast de scripts/fake_open_meteo.py.
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from dateutil.tz import gettz
+
+from src import estado, incremental
+from src.coleta import TIMEZONE
+from src.recupera_dados_api_hora import MAX_PAST_DAYS
+
+HOJE = date.today()
+AGORA = datetime(HOJE.year, HOJE.month, HOJE.day, 10, 30, tzinfo=gettz(TIMEZONE))
+ATE = datetime(HOJE.year, HOJE.month, HOJE.day, 9)  # última hora fechada
+CIDADES = pd.DataFrame({
+    "codigo_ibge": [1, 2, 3, 4],
+    "nome": ["A", "B", "C", "D"],
+    "nome_uf": ["São Paulo"] * 4,
+    "latitude": [-23.5, -22.9, -19.9, -25.4],
+    "longitude": [-46.6, -43.2, -43.9, -49.3],
+})
+
+
+def _hora(h: int, dias_atras: int = 0) -> str:
+    return (datetime.combine(HOJE, datetime.min.time()) + timedelta(days=-dias_atras, hours=h)).strftime(
+        incremental.FORMATO_HORA)
+
+
+@pytest.fixture
+def ledger(base_dir):
+    con = estado.conectar(base_dir)
+    yield con
+    con.close()
+
+
+def _marcas(ledger):
+    return estado.marcas_horarias(ledger, CIDADES["codigo_ibge"])
+
+
+def _arquivos(base_dir):
+    return sorted(incremental.pasta_incremental(base_dir).rglob("*.parquet"))
+
+
+def test_planejar_agrupa_pela_hora_inicial():
+    marcas = {1: _hora(5), 2: _hora(5), 3: _hora(7)}  # 4 sem marca: começa à meia-noite
+    plano = incremental.planejar(CIDADES, marcas, ATE)
+    assert [(hora.strftime(incremental.FORMATO_HORA), df["codigo_ibge"].tolist()) for hora, df in plano] == [
+        (_hora(0), [4]), (_hora(6), [1, 2]), (_hora(8), [3]),
+    ]
+
+
+def test_planejar_limita_marcas_antigas_e_pula_quem_esta_em_dia():
+    marcas = {1: _hora(0, dias_atras=200), 2: _hora(9), 3: _hora(8), 4: _hora(23, dias_atras=MAX_PAST_DAYS + 1)}
+    plano = incremental.planejar(CIDADES, marcas, ATE)
+    assert [(hora.strftime(incremental.FORMATO_HORA), df["codigo_ibge"].tolist()) for hora, df in plano] == [
+        (_hora(0, dias_atras=MAX_PAST_DAYS), [1, 4]), (_hora(9), [3]),
+    ]
+
+
+def test_marcas_avancam_so_depois_do_upload(api_falsa, base_dir, ledger):
+    enviados = []
+
+    def enviar(caminho, dia):
+        assert _marcas(ledger) == {}  # o arquivo ainda não subiu: marca parada
+        enviados.append((caminho, dia))
+
+    caminhos = incremental.coleta_incremental(base_dir, CIDADES, ledger, enviar=enviar, agora=AGORA)
+    assert [(c, d) for d, c in caminhos.items()] == enviados
+    assert [d for _, d in enviados] == [HOJE]
+    assert pq.read_table(caminhos[HOJE]).num_rows == 4 * 10  # 00:00 → 09:00
+    assert _marcas(ledger) == dict.fromkeys([1, 2, 3, 4], _hora(9))
+
+    # duas horas depois: só as horas novas, numa chamada (todos com a mesma marca)
+    api_falsa.estatisticas.por_endpoint.clear()
+    caminhos = incremental.coleta_incremental(base_dir, CIDADES, ledger, enviar=lambda c, d: None,
+                                              agora=AGORA + timedelta(hours=2))
+    assert pq.read_table(caminhos[HOJE]).num_rows == 4 * 2
+    assert dict(api_falsa.estatisticas.por_endpoint) == {"forecast": 1}
+    assert _marcas(ledger) == dict.fromkeys([1, 2, 3, 4], _hora(11))
+    assert len(_arquivos(base_dir)) == 2  # um arquivo novo por execução, nenhum reescrito
+
+
+def test_upload_com_falha_nao_move_as_marcas(api_falsa, base_dir, ledger):
+    estado.registrar_marcas_horarias(ledger, {1: _hora(5), 2: _hora(5)})
+
+    def falhar(caminho, dia):
+        raise RuntimeError("S3 fora do ar")
+
+    with pytest.raises(RuntimeError):
+        incremental.coleta_incremental(base_dir, CIDADES, ledger, enviar=falhar, agora=AGORA)
+    assert _marcas(ledger) == {1: _hora(5), 2: _hora(5)}
+    assert _arquivos(base_dir) == []  # o arquivo não enviado é descartado
+
+    # a próxima execução pede as mesmas horas: 4 h para 1 e 2, 10 h para 3 e 4
+    caminhos = incremental.coleta_incremental(base_dir, CIDADES, ledger, enviar=lambda c, d: None,
+                                              agora=AGORA)
+    tabela = pq.read_table(caminhos[HOJE])
+    assert tabela.group_by("codigo_ibge").aggregate([("data_hora", "count")]).sort_by(
+        "codigo_ibge").to_pydict() == {"codigo_ibge": [1, 2, 3, 4], "data_hora_count": [4, 4, 10, 10]}
+    assert _marcas(ledger) == dict.fromkeys([1, 2, 3, 4], _hora(9))
+    # uma chamada por hora inicial (06:00 e 00:00) em cada execução
+    assert dict(api_falsa.estatisticas.por_endpoint) == {"forecast": 4}
+
+
+def test_sem_horas_novas_nao_faz_nada(api_falsa, base_dir, ledger):
+    estado.registrar_marcas_horarias(ledger, dict.fromkeys([1, 2, 3, 4], _hora(9)))
+    assert incremental.coleta_incremental(base_dir, CIDADES, ledger, agora=AGORA) == {}
+    assert dict(api_falsa.estatisticas.por_endpoint) == {}
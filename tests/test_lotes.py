@@ -0,0 +1,85 @@
+# tests/test_lotes.py
+# Quando um lote cai para chamadas individuais (src/recupera_dados_api_*.py).
+import json
+
+import pytest
+import requests
+
+from src import transporte
+from src.recupera_dados_api_dia import get_clima_diario_por_lote
+from src.recupera_dados_api_hora import get_clima_horario_por_lote
+
+COORDS = [(-23.55, -46.63), (-22.91, -43.17), (-19.92, -43.94)]
+
+
+def _resposta(status, corpo):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(corpo).encode()
+    resp.url = "http://teste/v1/archive"
+    return resp
+
+
+def _local(bloco="daily"):
+    tempo = ["2024-01-15"] if bloco == "daily" else [f"2024-01-15T{h:02d}:00" for h in range(24)]
+    return {"latitude": 0.0, "longitude": 0.0, bloco: {"time": tempo}}
+
+
+class Chamadas(list):
+    """Nº de locais de cada GET; `respostas(n, params)` responde a n-ésima chamada."""
+    respostas = None
+
+
+@pytest.fixture
+def chamadas(monkeypatch):
+    feitas = Chamadas()
+
+    def get(url, params=None, **kwargs):
+        feitas.append(str(params["latitude"]).count(",") + 1)
+        return feitas.respostas(len(feitas), params)
+
+    monkeypatch.setattr(transporte, "get", get)
+    monkeypatch.setattr("src.roteamento.rotear", lambda ini, fim, tz: [("archive", ini, fim or ini)])
+    return feitas
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_lote_diario_com_429_5xx_nao_vira_chamadas_individuais(chamadas, status):
+    chamadas.respostas = lambda n, params: _resposta(status, {"reason": "ocupado"})
+    resultados = get_clima_diario_por_lote(COORDS, "2024-01-15")
+    assert chamadas == [3]
+    assert len(resultados) == 3
+    assert all(isinstance(r, requests.HTTPError) and r.response.status_code == status for r in resultados)
+
+
+def test_lote_diario_com_erro_de_rede_nao_vira_chamadas_individuais(chamadas):
+    def falhar(n, params):
+        raise requests.ConnectionError("recusada")
+    chamadas.respostas = falhar
+    resultados = get_clima_diario_por_lote(COORDS, "2024-01-15")
+    assert chamadas == [3]
+    assert all(isinstance(r, requests.ConnectionError) for r in resultados)
+
+
+def test_lote_diario_recusado_cai_para_chamadas_individuais(chamadas):
+    # 400 no lote (um local inválido): os outros ainda saem um a um
+    chamadas.respostas = lambda n, params: (
+        _resposta(400, {"reason": "latitude inválida"}) if n in (1, 3) else _resposta(200, _local()))
+    resultados = get_clima_diario_por_lote(COORDS, "2024-01-15")
+    assert chamadas == [3, 1, 1, 1]
+    assert isinstance(resultados[1], requests.HTTPError)
+    assert resultados[0]["daily"]["time"] == resultados[2]["daily"]["time"] == ["2024-01-15"]
+
+
+def test_lote_diario_com_locais_a_menos_cai_para_chamadas_individuais(chamadas):
+    chamadas.respostas = lambda n, params: _resposta(200, [_local()] * 2 if n == 1 else _local())
+    resultados = get_clima_diario_por_lote(COORDS, "2024-01-15")
+    assert chamadas == [3, 1, 1, 1]
+    assert not any(isinstance(r, Exception) for r in resultados)
+
+
+def test_lote_horario_com_503_nao_vai_para_o_forecast_nem_vira_individuais(chamadas):
+    chamadas.respostas = lambda n, params: _resposta(503, {"reason": "ocupado"})
+    resultados = get_clima_horario_por_lote(COORDS, "2024-01-15")
+    assert chamadas == [3]
+    assert all(isinstance(r, requests.HTTPError) for r in resultados)
@@ -0,0 +1,25 @@
+# tests/test_municipios.py
+# Argumentos de seleção de municípios (src/municipios.py).
+import argparse
+
+import pytest
+
+from src import municipios
+
+
+@pytest.fixture
+def parser():
+    p = argparse.ArgumentParser()
+    municipios.adicionar_argumentos(p)
+    return p
+
+
+def test_ibge_vira_lista_de_inteiros(parser):
+    assert parser.parse_args(["--ibge", "3550308, 3304557,"]).ibge == [3550308, 3304557]
+
+
+def test_ibge_nao_numerico_e_erro_de_uso(parser, capsys):
+    with pytest.raises(SystemExit) as erro:
+        parser.parse_args(["--ibge", "3550308,35x"])
+    assert erro.value.code == 2
+    assert "codigo_ibge inválido: '35x'" in capsys.readouterr().err
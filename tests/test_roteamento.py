@@ -0,0 +1,95 @@
+# tests/test_roteamento.py
+# Sonda do archive e divisão archive × forecast (src/roteamento.py) contra
+# scripts/fake_open_meteo.py, cujo archive vai até hoje - ATRASO_ARCHIVE_DIAS.
+from datetime import date, timedelta
+
+import pandas as pd
+
+from scripts.fake_open_meteo import ATRASO_ARCHIVE_DIAS
+from src import coleta, estado, roteamento
+from src.recupera_dados_api_hora import get_clima_horario_por_lote
+from src.roteamento import ARCHIVE, FORECAST, ArchiveIndisponivel
+
+TZ = "America/Sao_Paulo"
+ANTIGA = "2024-01-15"
+LIMITE = date.today() - timedelta(days=ATRASO_ARCHIVE_DIAS)  # último dia no archive falso
+CIDADES = pd.DataFrame({
+    "codigo_ibge": [3550308, 3304557],
+    "nome": ["São Paulo", "Rio de Janeiro"],
+    "nome_uf": ["São Paulo", "Rio de Janeiro"],
+    "latitude": [-23.55, -22.91],
+    "longitude": [-46.63, -43.17],
+})
+COORDS = list(zip(CIDADES["latitude"], CIDADES["longitude"]))
+
+
+def _iso(dia: date) -> str:
+    return dia.strftime("%Y-%m-%d")
+
+
+def _requisicoes(servidor) -> dict:
+    return dict(servidor.estatisticas.por_endpoint)
+
+
+def test_data_dentro_do_archive(api_falsa):
+    assert roteamento.rotear(ANTIGA, tz_name=TZ) == [(ARCHIVE, ANTIGA, ANTIGA)]
+    assert roteamento.exigir_archive(ANTIGA, tz_name=TZ) is None
+    assert _requisicoes(api_falsa) == {"archive": 1}  # a segunda consulta usa a sonda guardada
+
+
+def test_data_recente_vai_para_o_forecast(api_falsa):
+    ini, fim = LIMITE - timedelta(days=1), date.today() - timedelta(days=1)
+    assert roteamento.rotear(_iso(ini), _iso(fim), TZ) == [
+        (ARCHIVE, _iso(ini), _iso(LIMITE)),
+        (FORECAST, _iso(LIMITE + timedelta(days=1)), _iso(fim)),
+    ]
+    # só a sonda: o limite veio na mensagem do 400
+    assert api_falsa.estatisticas.resumo()["por_status"] == {"400": 1}
+
+    blocos = get_clima_horario_por_lote(COORDS, _iso(ini), TZ, dia_fim_str=_iso(fim))
+    for bloco in blocos:
+        fontes = {t[:10]: f for t, f in zip(bloco["time"], bloco["fonte"])}
+        assert fontes[_iso(LIMITE)] == ARCHIVE
+        assert fontes[_iso(LIMITE + timedelta(days=1))] == FORECAST
+        assert len(bloco["time"]) == 24 * ((fim - ini).days + 1)
+    # sonda + um lote no archive + um lote no forecast
+    assert _requisicoes(api_falsa) == {"archive": 2, "forecast": 1}
+
+
+def test_sonda_guardada_por_fuso(api_falsa, monkeypatch):
+    recente = _iso(LIMITE + timedelta(days=1))
+    roteamento.rotear(_iso(LIMITE - timedelta(days=1)), recente, TZ)  # confirma até LIMITE
+    roteamento.rotear(recente, tz_name=TZ)  # indisponível há pouco: sem sonda
+    roteamento.rotear(ANTIGA, tz_name=TZ)   # antes da última data confirmada: sem sonda
+    assert _requisicoes(api_falsa) == {"archive": 1}
+
+    roteamento.rotear(recente, tz_name="America/Manaus")
+    assert _requisicoes(api_falsa) == {"archive": 2}
+
+    # a data indisponível volta a ser sondada depois de TTL_INDISPONIVEL
+    monkeypatch.setattr(roteamento, "TTL_INDISPONIVEL", -1.0)
+    roteamento.rotear(recente, tz_name=TZ)
+    assert _requisicoes(api_falsa) == {"archive": 3}
+
+
+def test_diario_recente_fica_adiado_sem_chamar_o_lote(api_falsa, tmp_path):
+    recente = LIMITE + timedelta(days=1)
+    respostas = coleta._blocos_diarios(COORDS, _iso(recente), _iso(recente))
+    assert all(isinstance(r, ArchiveIndisponivel) for r in respostas)
+    assert _requisicoes(api_falsa) == {"archive": 1}  # só a sonda
+
+    tabela, erros = coleta.montar_lote("diario", CIDADES, respostas, 1)
+    assert tabela is None
+    assert erros == dict.fromkeys(CIDADES["codigo_ibge"], estado.MOTIVO_ARCHIVE)
+
+    ledger = estado.conectar(tmp_path)
+    estado.registrar_coleta(ledger, "diario", recente, [], erros, None)
+    assert estado.tem_adiados(ledger, "diario", recente)
+    assert not estado.tem_falhas(ledger, "diario", recente)
+
+
+def test_diario_antigo_vem_do_archive(api_falsa):
+    respostas = coleta._blocos_diarios(COORDS, ANTIGA, ANTIGA)
+    assert [r["time"] for r in respostas] == [[ANTIGA], [ANTIGA]]
+    tabela, erros = coleta.montar_lote("diario", CIDADES, respostas, 1)
+    assert erros == {} and tabela.num_rows == 2
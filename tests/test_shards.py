@@ -0,0 +1,129 @@
+# tests/test_shards.py
+# Coleta em shards (codigo_ibge % N) + consolidação contra a coleta sem shards.
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import main
+from conftest import tabela_bruta
+from src import estado, shards
+from src.coleta import ESPECIFICACOES, GravacaoPeriodo
+
+DIA = date(2025, 1, 15)
+N = 3
+MUNICIPIOS = pd.DataFrame({
+    "codigo_ibge": [1100015, 1100023, 1302603, 1501402, 2304400, 2611606,
+                    3106200, 3304557, 3550308, 4106902, 4314902, 5300108],
+    "nome": ["Alta Floresta D'Oeste", "Ariquemes", "Manaus", "Belém", "Fortaleza", "Recife",
+             "Belo Horizonte", "Rio de Janeiro", "São Paulo", "Curitiba", "Porto Alegre", "Brasília"],
+    "nome_uf": ["Rondônia", "Rondônia", "Amazonas", "Pará", "Ceará", "Pernambuco",
+                "Minas Gerais", "Rio de Janeiro", "São Paulo", "Paraná", "Rio Grande do Sul",
+                "Distrito Federal"],
+})
+FALHOU = 3304557  # município que falha na busca (vai para o ledger como falha)
+
+
+def _linhas(tipo, municipios):
+    linhas = []
+    for m in municipios.itertuples():
+        k = m.Index  # valores dependem só do município, não do lote ou do shard
+        base = {"codigo_ibge": m.codigo_ibge, "latitude": -10.0 - k, "longitude": -50.0 + k}
+        if tipo == "diario":
+            linhas.append({**base, "data": DIA, "nome": m.nome, "nome_uf": m.nome_uf,
+                           "temp_max_c": 25.0 + k, "temp_min_c": 15.0 + k})
+        else:
+            linhas += [{**base, "data_hora": datetime(2025, 1, 15, h), "municipio": m.nome,
+                        "uf": m.nome_uf, "temperatura_c": 20.0 + k + h / 10, "fonte": "archive"}
+                       for h in range(24)]
+    return linhas
+
+
+def _coletar(base_dir, tipo, municipios, ledger=None, shard=None):
+    """O que a etapa de gravação recebe dos lotes, sem rede: 2 municípios por lote."""
+    codigos = municipios["codigo_ibge"].tolist()
+    gravacao = GravacaoPeriodo(base_dir, tipo, DIA, DIA, codigos, municipios_por_grupo=4, shard=shard)
+    for ini in range(0, len(municipios), 2):
+        bloco = municipios.iloc[ini:ini + 2]
+        ok = bloco[bloco["codigo_ibge"] != FALHOU]
+        erros = {FALHOU: "HTTP 500"} if len(ok) < len(bloco) else {}
+        gravacao.adicionar(tabela_bruta(tipo, _linhas(tipo, ok)), erros, len(bloco))
+    return gravacao.finalizar(ledger)
+
+
+def _coletar_shards(base_dir, tipo, shards_feitos=range(1, N + 1)):
+    for i in shards_feitos:
+        _coletar(base_dir, tipo, shards.filtrar_municipios(MUNICIPIOS, (i, N)), shard=(i, N))
+
+
+def _status(ledger, tipo):
+    return sorted(ledger.execute(
+        "SELECT codigo_ibge, status FROM coletas WHERE tipo = ? AND data = ?",
+        (tipo, DIA.isoformat())).fetchall())
+
+
+@pytest.fixture
+def sem_shards(tmp_path):
+    base = tmp_path / "sem_shards"
+    ledger = estado.conectar(base)
+    caminhos = {tipo: _coletar(base, tipo, MUNICIPIOS, ledger)[DIA] for tipo in ESPECIFICACOES}
+    return base, ledger, caminhos
+
+
+def test_particao_cobre_todos_os_municipios_uma_vez():
+    partes = [shards.filtrar_municipios(MUNICIPIOS, (i, N)) for i in range(1, N + 1)]
+    codigos = [c for parte in partes for c in parte["codigo_ibge"]]
+    assert sorted(codigos) == sorted(MUNICIPIOS["codigo_ibge"])
+    assert all(len(parte) for parte in partes)
+
+
+@pytest.mark.parametrize("tipo", list(ESPECIFICACOES))
+def test_consolidado_igual_a_coleta_sem_shards(sem_shards, tmp_path, tipo):
+    base_ref, ledger_ref, caminhos_ref = sem_shards
+    base = tmp_path / "com_shards"
+    ledger = estado.conectar(base)
+    _coletar_shards(base, tipo)
+
+    completo, caminho = shards.consolidar(base, tipo, DIA, N, ledger)
+    assert completo
+    consolidado, referencia = pq.read_table(caminho), pq.read_table(caminhos_ref[tipo])
+    assert consolidado.num_rows == referencia.num_rows
+    chaves = ESPECIFICACOES[tipo]["ordenar_por"]
+    assert consolidado.select(chaves).equals(referencia.select(chaves))
+    assert consolidado.to_pylist() == referencia.to_pylist()  # dicionários podem diferir; valores não
+    assert FALHOU not in consolidado["codigo_ibge"].to_pylist()
+    assert _status(ledger, tipo) == _status(ledger_ref, tipo)
+
+
+def test_shard_faltando_bloqueia_consolidacao(tmp_path):
+    base = tmp_path / "com_shards"
+    ledger = estado.conectar(base)
+    _coletar_shards(base, "diario", shards_feitos=[1, 3])
+
+    assert shards.marcadores(base, "diario", DIA, N) is None
+    assert shards.consolidar(base, "diario", DIA, N, ledger) == (False, None)
+    assert not (base / "data" / "raw").exists()
+    assert _status(ledger, "diario") == []
+
+
+def test_consolidar_shards_so_avanca_com_todos(tmp_path):
+    base = tmp_path / "com_shards"
+    ledger = estado.conectar(base)
+    enviados = []
+
+    def enviar(caminho, tipo, dia):
+        enviados.append((tipo, dia))
+
+    _coletar_shards(base, "diario", shards_feitos=[1, 2])
+    main._consolidar_shards(base, ["diario"], N, [DIA], ledger, enviar)
+    assert enviados == []
+    assert main._carregar_last_run(base) is None
+    assert shards.marcadores(base, "diario", DIA, N) is None  # os shards feitos continuam lá
+    assert len(list((base / "data" / "shards" / "diario").glob("*.json"))) == 2
+
+    _coletar_shards(base, "diario", shards_feitos=[3])
+    main._consolidar_shards(base, ["diario"], N, [DIA], ledger, enviar)
+    assert enviados == [("diario", DIA)]
+    assert main._carregar_last_run(base) == DIA
+    assert list((base / "data" / "shards" / "diario").iterdir()) == []
@@ -0,0 +1,110 @@
+# tests/test_upload_s3.py
+# Upload com pulo de inalterados (src/upload_s3.py) contra um S3 do moto.
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from src import upload_s3
+from src.resumo import caminho_resumo
+
+BUCKET = "bucket-testes"
+MB = 1024 ** 2
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for var, valor in {"AWS_ACCESS_KEY_ID": "teste", "AWS_SECRET_ACCESS_KEY": "teste",
+                       "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(var, valor)
+    monkeypatch.setattr(upload_s3, "S3_ENDPOINT_URL", None)
+    monkeypatch.setattr(upload_s3, "_cliente", None)  # cliente novo dentro do mock
+    with mock_aws():
+        cliente = boto3.client("s3")
+        cliente.create_bucket(Bucket=BUCKET)
+        yield cliente
+    upload_s3._cliente = None
+
+
+def _arquivo(pasta, nome, tamanho, semente=0):
+    caminho = pasta / nome
+    padrao = bytes((i * 31 + semente) % 251 for i in range(251))
+    caminho.write_bytes((padrao * (tamanho // 251 + 1))[:tamanho])
+    return caminho
+
+
+def _inalterado(s3, caminho, chave):
+    md5_hex, etag = upload_s3._md5_e_etag(caminho)
+    return upload_s3._objeto_inalterado(s3, BUCKET, chave, caminho, md5_hex, etag)
+
+
+def test_md5_de_parte_unica(s3, tmp_path):
+    caminho = _arquivo(tmp_path, "pequeno.parquet", 1000)
+    # enviado por outra ferramenta: sem o metadado md5, só o ETag (= md5 do arquivo)
+    s3.put_object(Bucket=BUCKET, Key="k/pequeno.parquet", Body=caminho.read_bytes())
+    assert "-" not in s3.head_object(Bucket=BUCKET, Key="k/pequeno.parquet")["ETag"]
+    assert _inalterado(s3, caminho, "k/pequeno.parquet")
+    assert not _inalterado(s3, caminho, "k/nao-existe.parquet")
+
+
+def test_etag_multipart(s3, tmp_path):
+    caminho = _arquivo(tmp_path, "grande.parquet", 9 * MB)
+    s3.upload_file(str(caminho), BUCKET, "k/grande.parquet", Config=upload_s3.TRANSFER_CONFIG)
+    etag = s3.head_object(Bucket=BUCKET, Key="k/grande.parquet")["ETag"].strip('"')
+    assert etag.endswith("-2")
+    assert upload_s3._md5_e_etag(caminho)[1] == etag
+    assert _inalterado(s3, caminho, "k/grande.parquet")
+
+    # mesmo tamanho, uma parte diferente: o ETag -N muda
+    conteudo = bytearray(caminho.read_bytes())
+    conteudo[-1] ^= 0xFF
+    caminho.write_bytes(bytes(conteudo))
+    assert not _inalterado(s3, caminho, "k/grande.parquet")
+
+
+@pytest.mark.parametrize("tamanho", [1000, 9 * MB], ids=["parte-unica", "multipart"])
+def test_pula_inalterado_e_reenvia_alterado(s3, tmp_path, tamanho):
+    caminho = _arquivo(tmp_path, "dados_climaticos_diarios_20250115.parquet", tamanho)
+    chave = "raw/clima/diario/date=2025-01-15/dados_climaticos_diarios_20250115.parquet"
+
+    assert upload_s3.upload_lote_s3([(caminho, "diario", "2025-01-15")], bucket=BUCKET)[0]["status"] == "enviado"
+    primeiro = s3.head_object(Bucket=BUCKET, Key=chave)
+    [item] = upload_s3.upload_lote_s3([(caminho, "diario", "2025-01-15")], bucket=BUCKET)
+    assert item["status"] == "inalterado"
+    assert s3.head_object(Bucket=BUCKET, Key=chave)["LastModified"] == primeiro["LastModified"]
+
+    novo = _arquivo(tmp_path, caminho.name, tamanho, semente=7)  # mesmo tamanho, outro conteúdo
+    [item] = upload_s3.upload_lote_s3([(novo, "diario", "2025-01-15")], bucket=BUCKET)
+    assert item["status"] == "enviado"
+    assert s3.get_object(Bucket=BUCKET, Key=chave)["Body"].read() == novo.read_bytes()
+
+
+def test_manifesto_na_ordem_de_entrada(s3, tmp_path):
+    arquivos = []
+    for i, dia in enumerate(["2025-01-15", "2025-01-13", "2025-01-14", "2025-01-12"]):
+        nome = f"dados_climaticos_diarios_{dia.replace('-', '')}.parquet"
+        arquivos.append((_arquivo(tmp_path, nome, 500 + i, semente=i), "diario", dia))
+    # dois já estão no S3 com o mesmo conteúdo
+    upload_s3.upload_lote_s3([arquivos[1], arquivos[3]], bucket=BUCKET)
+
+    manifesto = upload_s3.upload_lote_s3(arquivos, bucket=BUCKET, workers=4)
+    assert [m["arquivo"] for m in manifesto] == [str(c) for c, _, _ in arquivos]
+    assert [m["status"] for m in manifesto] == ["enviado", "inalterado", "enviado", "inalterado"]
+    for m, (caminho, tipo, dia) in zip(manifesto, arquivos):
+        assert m["key"] == f"raw/clima/{tipo}/date={dia}/{caminho.name}"
+        assert m["s3_uri"] == f"s3://{BUCKET}/{m['key']}"
+        assert m["bytes"] == os.path.getsize(caminho)
+        assert m["md5"] == upload_s3._md5_e_etag(caminho)[0]
+
+
+def test_resumo_vai_para_o_mesmo_prefixo(s3, tmp_path):
+    caminho = _arquivo(tmp_path, "dados_climaticos_horarios_20250115.parquet", 800)
+    caminho_resumo(caminho).write_text('{"linhas": 24}')
+    upload_s3.upload_lote_s3([(caminho, "horario", "2025-01-15")], bucket=BUCKET)
+
+    objetos = s3.list_objects_v2(Bucket=BUCKET)["Contents"]
+    assert sorted(o["Key"] for o in objetos) == [
+        "raw/clima/horario/date=2025-01-15/dados_climaticos_horarios_20250115.parquet",
+        "raw/clima/horario/date=2025-01-15/dados_climaticos_horarios_20250115.resumo.json",
+    ]